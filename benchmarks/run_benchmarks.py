@@ -0,0 +1,399 @@
+"""
+Reproducible throughput benchmarks for unsilence
+
+The input media is generated locally with ffmpeg's lavfi sources (tone/noise bursts with a controlled silence density
+and testsrc video), so every machine benchmarks the same content. The results are written as JSON and can be compared
+with the results of another commit. The startup time (interpreter, imports, CLI help) and the ffmpeg capability
+probe are tracked as well. Splitting long intervals (max_task_duration) must not change the output duration, a
+mismatch fails the run:
+
+    python benchmarks/run_benchmarks.py -o results.json
+    python benchmarks/run_benchmarks.py -o new.json --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from unsilence.lib.detect_silence.DetectSilence import DETECTION_ENGINES, detect_silence, detection_events, \
+    intervals_from_events
+from unsilence.lib.detect_silence.ShardedSilenceDetection import probe_duration
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.intervals.TimeCalculations import calculate_time
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.tools.ffmpeg_capabilities import ffmpeg_capabilities, probe_capabilities
+
+# name: (duration in seconds, video size or None for audio only, audio source, burst period, audible part of a period)
+MEDIA = {
+    "audio_sparse_silence": (600, None, "sine", 10.0, 0.8),
+    "audio_dense_silence": (600, None, "noise", 1.5, 0.5),
+    "video_240p": (60, "320x240", "sine", 4.0, 0.6),
+    "video_720p": (30, "1280x720", "noise", 3.0, 0.6),
+}
+
+QUICK_DURATION_FACTOR = 0.1
+
+# Startup paths whose wall time is tracked (a fresh interpreter each run), name: python arguments. The interpreter
+# alone is the baseline, the difference to it is the import time
+STARTUP = {
+    "interpreter": ["-c", "pass"],
+    "import_unsilence": ["-c", "import unsilence"],
+    "import_unsilence_class": ["-c", "from unsilence import Unsilence"],
+    "cli_help": ["-m", "unsilence", "--help"],
+}
+
+
+def main():
+    """
+    Runs the benchmarks and writes the results
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks unsilence with generated media")
+    parser.add_argument("-o", "--output", type=Path, default=Path("benchmark_results.json"),
+                        help="Where the JSON results should be saved")
+    parser.add_argument("-m", "--media-dir", type=Path, default=None,
+                        help="Directory for the generated media, it is reused by later runs (default: temp dir)")
+    parser.add_argument("-t", "--threads", type=int, nargs="+", default=[1, 2, 4],
+                        help="Thread counts the render benchmark should be run with")
+    parser.add_argument("-de", "--detection-engines", nargs="+", default=list(DETECTION_ENGINES),
+                        help="Silence detection engines that should be benchmarked")
+    parser.add_argument("-ds", "--detection-shards", type=int, nargs="+", default=[2, 4],
+                        help="Shard counts the parallel silence detection benchmark should be run with")
+    parser.add_argument("-e", "--engines", nargs="+", default=list(MediaRenderer.ENGINES),
+                        help="Render engines that should be benchmarked")
+    parser.add_argument("-mtd", "--max-task-duration", type=float, default=2.0,
+                        help="Longest interval duration of the split render benchmark (in seconds)")
+    parser.add_argument("-dt", "--duration-tolerance", type=float, default=0.05,
+                        help="Largest allowed difference (in seconds) of the split and the unsplit output duration")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="How often every benchmark is run, the fastest run counts")
+    parser.add_argument("-q", "--quick", action="store_true",
+                        help="Use much shorter media (for a quick check, not comparable with full runs)")
+    parser.add_argument("-s", "--skip-render", action="store_true", help="Skip the render benchmarks")
+    parser.add_argument("-c", "--compare", type=Path, default=None,
+                        help="Results of a previous run, regressions against it are reported")
+    parser.add_argument("-tol", "--tolerance", type=float, default=0.1,
+                        help="Relative slowdown that counts as a regression when comparing")
+    parser.add_argument("-ms", "--min-seconds", type=float, default=0.005,
+                        help="Slowdowns smaller than this (in seconds) are treated as noise when comparing")
+    args = parser.parse_args()
+
+    media_dir = args.media_dir or Path(tempfile.mkdtemp(prefix="unsilence_benchmark_"))
+    media_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    duration_mismatches = 0
+
+    for name, arguments in STARTUP.items():
+        print(f"startup: {name}", file=sys.stderr)
+        results.append(benchmark(
+            "startup", name, {},
+            lambda: run_python(arguments),
+            args.repeat
+        ))
+
+    print("ffmpeg_capabilities", file=sys.stderr)
+    capability_cache_file = Path(tempfile.mkdtemp(prefix="unsilence_benchmark_")) / "capabilities.json"
+    results.append(benchmark(
+        "capabilities", "probe", {},
+        lambda: probe_capabilities(shutil.which("ffmpeg")),
+        args.repeat
+    ))
+    ffmpeg_capabilities.__wrapped__(capability_cache_file)
+    results.append(benchmark(
+        "capabilities", "disk_cache", {},
+        lambda: ffmpeg_capabilities.__wrapped__(capability_cache_file),
+        args.repeat
+    ))
+    shutil.rmtree(capability_cache_file.parent)
+
+    try:
+        for name, spec in MEDIA.items():
+            media_file = generate_media(media_dir, name, spec, args.quick)
+            audio_only = spec[1] is None
+
+            for detection_engine in args.detection_engines:
+                print(f"{name}: detect_silence engine={detection_engine}", file=sys.stderr)
+                results.append(benchmark(
+                    "detect_silence", name, {"engine": detection_engine},
+                    lambda: detect_silence(media_file, detection_engine=detection_engine),
+                    args.repeat
+                ))
+
+            for shards in args.detection_shards:
+                print(f"{name}: detect_silence shards={shards}", file=sys.stderr)
+                results.append(benchmark(
+                    "detect_silence", name, {"shards": shards},
+                    lambda: detect_silence(media_file, detection_shards=shards),
+                    args.repeat
+                ))
+
+            raw_intervals = intervals_from_events(detection_events(media_file))
+
+            results.append(benchmark(
+                "optimize", name, {"intervals": len(raw_intervals.intervals)},
+                lambda: raw_intervals.copy().optimize(),
+                args.repeat
+            ))
+
+            intervals = raw_intervals.copy()
+            intervals.optimize()
+
+            results.append(benchmark(
+                "calculate_time", name, {"intervals": len(intervals.intervals)},
+                lambda: calculate_time(intervals, 1, 6),
+                args.repeat
+            ))
+
+            if args.skip_render:
+                continue
+
+            for engine in args.engines:
+                for threads in args.threads:
+                    print(f"{name}: render engine={engine} threads={threads}", file=sys.stderr)
+                    results.append(benchmark(
+                        "render", name, {"engine": engine, "threads": threads},
+                        lambda: render(media_dir, media_file, intervals, audio_only, engine=engine, threads=threads),
+                        args.repeat
+                    ))
+
+            threads = args.threads[0]
+            print(f"{name}: render max_task_duration={args.max_task_duration} threads={threads}", file=sys.stderr)
+            unsplit_duration = render(media_dir, media_file, intervals, audio_only, threads=threads)
+            split_durations = []
+            results.append(benchmark(
+                "render", name, {"max_task_duration": args.max_task_duration, "threads": threads},
+                lambda: split_durations.append(render(media_dir, media_file, intervals, audio_only, threads=threads,
+                                                      max_task_duration=args.max_task_duration)),
+                args.repeat
+            ))
+            results[-1]["output_seconds"] = {"unsplit": unsplit_duration, "split": split_durations[-1]}
+
+            if abs(split_durations[-1] - unsplit_duration) > args.duration_tolerance:
+                print(f"{name}: split output is {split_durations[-1]:.2f}s long, the unsplit output "
+                      f"{unsplit_duration:.2f}s", file=sys.stderr)
+                duration_mismatches += 1
+
+        synthetic_intervals = generate_intervals(200000)
+        results.append(benchmark(
+            "optimize", "synthetic_200k_intervals", {"intervals": 200000},
+            lambda: synthetic_intervals.copy().optimize(),
+            args.repeat
+        ))
+    finally:
+        if args.media_dir is None:
+            shutil.rmtree(media_dir)
+
+    report = {"meta": environment_info(args.quick), "results": results}
+
+    with open(args.output, "w+") as file:
+        json.dump(report, file, indent=2)
+
+    for result in results:
+        print(f"{result['benchmark']:>16} {result['media']:<26} {json.dumps(result['params']):<36} "
+              f"{result['seconds']:.4f}s")
+
+    regressions = 0
+
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+
+        regressions = compare_results(baseline, report, args.tolerance, args.min_seconds)
+
+    if duration_mismatches > 0:
+        print(f"\n{duration_mismatches} split render(s) changed the output duration", file=sys.stderr)
+
+    if regressions > 0 or duration_mismatches > 0:
+        sys.exit(1)
+
+
+def generate_media(media_dir: Path, name: str, spec: tuple, quick: bool):
+    """
+    Generates a benchmark input with ffmpeg's lavfi sources (if it does not exist yet)
+    :param media_dir: Directory of the generated media
+    :param name: Name of the media
+    :param spec: (duration, video size or None, audio source, burst period, audible part of a period)
+    :param quick: Whether the short version should be generated
+    :return: Path of the media file
+    """
+    duration, video_size, audio_source, period, audible_part = spec
+
+    if quick:
+        duration = max(5, duration * QUICK_DURATION_FACTOR)
+
+    media_file = media_dir / f"{name}{'_quick' if quick else ''}{'.m4a' if video_size is None else '.mp4'}"
+
+    if media_file.exists():
+        return media_file
+
+    if audio_source == "sine":
+        audio_filter = "sine=frequency=440:sample_rate=44100"
+    else:
+        audio_filter = "anoisesrc=color=pink:amplitude=0.5:sample_rate=44100:seed=1"
+
+    audio_filter += f",volume='if(lt(mod(t,{period}),{period * audible_part}),1,0)':eval=frame"
+
+    command = ["ffmpeg", "-y", "-loglevel", "error"]
+
+    if video_size is not None:
+        command.extend(["-f", "lavfi", "-i", f"testsrc=size={video_size}:rate=25"])
+
+    command.extend(["-f", "lavfi", "-i", audio_filter, "-t", str(duration)])
+
+    if video_size is not None:
+        command.extend(["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"])
+
+    command.extend(["-c:a", "aac", str(media_file)])
+
+    print(f"Generating {media_file.name}", file=sys.stderr)
+    subprocess.run(command, check=True)
+
+    return media_file
+
+
+def generate_intervals(count: int):
+    """
+    Generates raw intervals with alternating states and random durations (seeded, so always the same)
+    :param count: Number of intervals
+    :return: Intervals
+    """
+    generator = random.Random(0)
+    intervals = Intervals()
+    current_time = 0
+
+    for i in range(count):
+        duration = generator.choice([0.1, 0.2, 0.7, 1.5, 3.0])
+        intervals.add_interval(Interval(current_time, current_time + duration, i % 2 == 1))
+        current_time += duration
+
+    # Collections that buffer added intervals prepare them on first access, which should not be timed
+    len(intervals.intervals)
+
+    return intervals
+
+
+def render(media_dir: Path, media_file: Path, intervals: Intervals, audio_only: bool, **kwargs):
+    """
+    Renders a benchmark input once
+    :param media_dir: Directory of the generated media (the temp files are created in it)
+    :param media_file: The benchmark input
+    :param intervals: Its intervals
+    :param audio_only: Whether the input is audio only
+    :param kwargs: Render options
+    :return: Duration of the output (in seconds)
+    """
+    output_file = media_dir / f"render_output{media_file.suffix}"
+    MediaRenderer(media_dir / "render_temp").render(media_file, output_file, intervals, audio_only=audio_only,
+                                                    **kwargs)
+    duration = probe_duration(output_file)
+    output_file.unlink()
+
+    return duration
+
+
+def run_python(arguments: list):
+    """
+    Runs a fresh interpreter that imports unsilence from this checkout
+    :param arguments: Arguments of the interpreter
+    :return: None
+    """
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).absolute().parent.parent))
+    subprocess.run([sys.executable, *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+                   check=True)
+
+
+def benchmark(name: str, media: str, params: dict, function, repeat: int):
+    """
+    Times a function
+    :param name: Name of the benchmark
+    :param media: Name of the input
+    :param params: Parameters of the benchmark
+    :param function: The function that should be timed
+    :param repeat: How often it should be run
+    :return: Result dict (the fastest run counts)
+    """
+    runs = []
+
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+
+    return {"benchmark": name, "media": media, "params": params, "seconds": min(runs), "runs": runs}
+
+
+def environment_info(quick: bool):
+    """
+    Collects what is needed to judge whether two result files are comparable
+    :param quick: Whether the quick media was used
+    :return: Dict
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                cwd=Path(__file__).absolute().parent, universal_newlines=True).stdout.strip()
+    except FileNotFoundError:
+        commit = None
+
+    ffmpeg_version = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE,
+                                    universal_newlines=True).stdout.split("\n")[0]
+
+    return {
+        "commit": commit or None,
+        "date": datetime.now().isoformat(),
+        "quick": quick,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version
+    }
+
+
+def compare_results(baseline: dict, report: dict, tolerance: float, min_seconds: float):
+    """
+    Prints the speed ratio of every benchmark that exists in both result files
+    :param baseline: Earlier results
+    :param report: Current results
+    :param tolerance: Relative slowdown that counts as a regression
+    :param min_seconds: Absolute slowdown (in seconds) below which no regression is reported
+    :return: Number of regressions
+    """
+    def result_key(result):
+        return result["benchmark"], result["media"], json.dumps(result["params"], sort_keys=True)
+
+    if baseline["meta"].get("quick") != report["meta"].get("quick"):
+        print("Warning: quick and full results are compared", file=sys.stderr)
+
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    regressions = 0
+
+    print(f"\nCompared with {baseline['meta'].get('commit')}:")
+
+    for result in report["results"]:
+        previous = baseline_results.get(result_key(result), None)
+        if previous is None:
+            continue
+
+        ratio = result["seconds"] / previous["seconds"] if previous["seconds"] > 0 else 1
+        regression = ratio > 1 + tolerance and result["seconds"] - previous["seconds"] > min_seconds
+        regressions += regression
+
+        print(f"{result['benchmark']:>16} {result['media']:<26} {json.dumps(result['params']):<36} "
+              f"{previous['seconds']:.4f}s -> {result['seconds']:.4f}s ({ratio:.2f}x){' REGRESSION' if regression else ''}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    main()
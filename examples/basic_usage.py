@@ -11,3 +11,11 @@ u.render_media("[output_file]")  # No options specified
 u.render_media("[output_file]", audible_speed=2, silent_speed=8)  # Speed options
 u.render_media("[output_file]", audible_volume=2, silent_volume=0)  # Volume options
 u.render_media("[output_file]", audio_only=True)  # Audio only specified
+
+# Detect and render at the same time, intervals get rendered as soon as they are detected
+u.detect_and_render("[output_file]", detection_options={"silence_level": -30}, silent_speed=8)
+
+# Decode once, then try many threshold combinations instantly
+envelope = u.loudness_envelope()
+u.set_intervals(envelope.intervals(silence_level=-30, silence_time_threshold=0.8))
+durations = envelope.sweep([-40, -35, -30], [0.3, 0.5, 1], audible_speeds=[1, 1.5], silent_speeds=[4, 8])
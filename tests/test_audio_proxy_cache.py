@@ -0,0 +1,119 @@
+import shutil
+import subprocess
+import wave
+
+import pytest
+
+from unsilence.lib.cache import AudioProxyCache as audio_proxy_cache_module
+from unsilence.lib.cache.AudioProxyCache import AudioProxyCache
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def generate_media(output_file, source: str, duration: float = 3):
+    """
+    Generates a media file from a lavfi source
+    :param output_file: Where the file should be saved
+    :param source: The lavfi source (e.g. "sine=frequency=440")
+    :param duration: Duration of the file (in seconds)
+    :return: The path of the file
+    """
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"{source}:duration={duration}",
+                    str(output_file)], check=True)
+    return output_file
+
+
+def count_extractions(monkeypatch):
+    """
+    Counts the ffmpeg processes the audio proxy cache starts
+    :param monkeypatch: The pytest monkeypatch fixture
+    :return: List that gets one entry per started process
+    """
+    calls = []
+    run_process = audio_proxy_cache_module.run_process
+
+    def counting_run_process(command, *args, **kwargs):
+        """
+        Records a process and runs it
+        :param command: The command
+        :param args: Positional args of run_process
+        :param kwargs: Keyword args of run_process
+        :return: The completed process
+        """
+        calls.append(command)
+        return run_process(command, *args, **kwargs)
+
+    monkeypatch.setattr(audio_proxy_cache_module, "run_process", counting_run_process)
+    return calls
+
+
+def test_audio_proxy_key_changes_with_content_and_settings(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.mp4"
+    input_file.write_bytes(b"video")
+    key = AudioProxyCache.key(input_file)
+
+    assert AudioProxyCache.key(input_file) == key
+
+    monkeypatch.setattr(AudioProxyCache, "PROXY_SETTINGS", AudioProxyCache.PROXY_SETTINGS + ",changed")
+    assert AudioProxyCache.key(input_file) != key
+
+    monkeypatch.undo()
+    input_file.write_bytes(b"other video")
+    assert AudioProxyCache.key(input_file) != key
+
+
+@requires_ffmpeg
+def test_audio_proxy_is_extracted_once(tmp_path, monkeypatch):
+    input_file = generate_media(tmp_path / "input.m4a", "sine=frequency=440")
+    cache = AudioProxyCache(tmp_path / "cache")
+    extractions = count_extractions(monkeypatch)
+
+    cache.fetch(input_file, tmp_path / "proxy_1.wav")
+    cache.fetch(input_file, tmp_path / "proxy_2.wav")
+
+    assert len(extractions) == 1
+    assert (tmp_path / "proxy_1.wav").read_bytes() == (tmp_path / "proxy_2.wav").read_bytes()
+
+    with wave.open(str(tmp_path / "proxy_1.wav")) as proxy:
+        assert proxy.getsampwidth() == 2
+        assert proxy.getnframes() / proxy.getframerate() == pytest.approx(3, abs=0.05)
+
+
+@requires_ffmpeg
+def test_fetched_proxy_outlives_its_cache_entry(tmp_path):
+    input_file = generate_media(tmp_path / "input.m4a", "sine=frequency=440")
+    cache = AudioProxyCache(tmp_path / "cache")
+    destination = tmp_path / "proxy.wav"
+
+    cache.fetch(input_file, destination)
+    proxy_data = destination.read_bytes()
+    cache.clear()
+
+    assert destination.read_bytes() == proxy_data
+
+
+@requires_ffmpeg
+def test_audio_proxy_cache_evicts_the_least_recently_used_proxy(tmp_path):
+    first_input = generate_media(tmp_path / "first.m4a", "sine=frequency=440")
+    second_input = generate_media(tmp_path / "second.m4a", "sine=frequency=880")
+
+    # Room for a single proxy of 3 seconds of 16 bit audio
+    cache = AudioProxyCache(tmp_path / "cache", max_size=400 * 1024)
+
+    cache.fetch(first_input, tmp_path / "first.wav")
+    cache.fetch(second_input, tmp_path / "second.wav")
+
+    assert cache.lookup(AudioProxyCache.key(first_input.absolute()), ".wav") is None
+    assert cache.lookup(AudioProxyCache.key(second_input.absolute()), ".wav") is not None
+
+
+@requires_ffmpeg
+def test_audio_proxy_of_a_file_without_audio(tmp_path):
+    input_file = generate_media(tmp_path / "input.mp4", "testsrc=size=64x64:rate=5", duration=1)
+    cache = AudioProxyCache(tmp_path / "cache")
+
+    with pytest.raises(IOError, match="Could not extract the audio"):
+        cache.fetch(input_file, tmp_path / "proxy.wav")
+
+    assert list(cache.cache_dir.iterdir()) == []
+    assert not (tmp_path / "proxy.wav").exists()
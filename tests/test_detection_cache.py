@@ -0,0 +1,148 @@
+import os
+
+from unsilence.lib.cache.DetectionCache import DetectionCache
+from unsilence.lib.cache.FileCache import FileCache
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+
+
+def write_file(path, data: bytes, mtime: float = None):
+    """
+    Writes a file and optionally sets its modification time
+    :param path: Path of the file
+    :param data: Content of the file
+    :param mtime: Modification time (seconds since the epoch), None keeps the current time
+    :return: The path
+    """
+    path.write_bytes(data)
+
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+    return path
+
+
+def values(intervals: Intervals):
+    """
+    Get the values of an Intervals collection
+    :param intervals: The Intervals
+    :return: List of (start, end, is_silent) tuples
+    """
+    return [(interval.start, interval.end, bool(interval.is_silent)) for interval in intervals.intervals]
+
+
+def test_detection_cache_key_defaults_equal_explicit_values(tmp_path):
+    input_file = write_file(tmp_path / "input.wav", b"audio")
+    cache = DetectionCache(tmp_path / "cache")
+
+    assert cache.key(input_file) == cache.key(input_file, silence_level=-35, silence_time_threshold=0.5,
+                                              detection_engine="silencedetect")
+
+
+def test_detection_cache_key_changes_with_options_and_content(tmp_path):
+    input_file = write_file(tmp_path / "input.wav", b"audio", mtime=1000)
+    cache = DetectionCache(tmp_path / "cache")
+    key = cache.key(input_file)
+
+    assert cache.key(input_file, silence_level=-30) != key
+    assert cache.key(input_file, silence_time_threshold=0.4) != key
+    assert cache.key(input_file, detection_engine="numpy") != key
+    assert cache.key(input_file, detection_engine="numpy", window_size=0.02) != \
+        cache.key(input_file, detection_engine="numpy")
+    assert cache.key(input_file, audio_proxy=tmp_path / "proxy.wav") != key
+
+    # Options that only change the optimization of the raw intervals share the entry
+    assert cache.key(input_file, short_interval_threshold=1, stretch_time=0) == key
+
+    write_file(input_file, b"other", mtime=1000)
+    assert cache.key(input_file) != key
+
+
+def test_detection_cache_round_trip_keeps_raw_intervals(tmp_path):
+    cache = DetectionCache(tmp_path / "cache", memory_entries=1)
+    intervals = Intervals([Interval(0, 1.5, False), Interval(1.5, 2.25, True), Interval(2.25, 4, False)])
+
+    cache.save("key", intervals)
+
+    loaded = cache.load("key")
+    loaded.optimize(1, 0.25)
+
+    # The entry in memory must not be changed by the optimization of a loaded copy
+    assert values(cache.load("key")) == values(intervals)
+    assert values(DetectionCache(tmp_path / "cache").load("key")) == values(intervals)
+
+
+def test_detection_cache_ignores_missing_and_corrupted_entries(tmp_path):
+    cache = DetectionCache(tmp_path / "cache")
+
+    assert cache.load("missing") is None
+
+    cache.store_bytes("corrupted", b"{\"not\": \"intervals\"}", ".json")
+    assert cache.load("corrupted") is None
+
+    cache.store_bytes("truncated", b"{\"starts\": [0", ".json")
+    assert cache.load("truncated") is None
+
+
+def test_detection_cache_memory_entries_are_least_recently_used(tmp_path):
+    cache = DetectionCache(tmp_path / "cache", memory_entries=2)
+
+    for i in range(3):
+        cache.save(f"key{i}", Intervals([Interval(0, i + 1, False)]))
+
+    # Without the entries on disk, only the two most recently used ones are left in memory
+    cache.clear()
+    assert cache.load("key0") is None
+    assert values(cache.load("key1")) == [(0, 2, False)]
+    assert values(cache.load("key2")) == [(0, 3, False)]
+
+
+def test_file_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = FileCache(tmp_path / "cache", max_size=250)
+
+    for i, mtime in enumerate([1000, 3000, 2000]):
+        path = cache.store_bytes(f"key{i}", bytes(100))
+        os.utime(path, (mtime, mtime))
+
+    # Three entries do not fit, the oldest ones are deleted until the cache fits, the new entry is kept
+    assert cache.lookup("key0") is None
+    assert cache.lookup("key1") is not None
+    assert cache.lookup("key2") is not None
+    assert cache.size() == 200
+
+    # A hit marks the entry as recently used
+    os.utime(cache.entry_path("key1"), (1000, 1000))
+    os.utime(cache.entry_path("key2"), (2000, 2000))
+    cache.lookup("key1")
+    cache.store_bytes("key3", bytes(100))
+
+    assert cache.lookup("key1") is not None
+    assert cache.lookup("key2") is None
+    assert cache.lookup("key3") is not None
+
+
+def test_file_cache_keeps_an_entry_larger_than_the_cache(tmp_path):
+    cache = FileCache(tmp_path / "cache", max_size=50)
+    cache.store_bytes("small", bytes(10))
+
+    source = write_file(tmp_path / "source", bytes(100))
+    path = cache.store("large", source)
+
+    assert path.read_bytes() == bytes(100)
+    assert cache.lookup("small") is None
+    assert source.exists()
+
+
+def test_file_cache_ignores_temp_files_and_clears(tmp_path):
+    cache = FileCache(tmp_path / "cache", max_size=1000)
+    cache.store_bytes("entry", bytes(10), ".json")
+    write_file(cache.cache_dir / ".partial.tmp", bytes(5000))
+
+    cache.evict()
+
+    assert (cache.cache_dir / ".partial.tmp").exists()
+    assert cache.lookup("entry", ".json") is not None
+
+    cache.clear()
+    assert cache.size() == 0
+    assert cache.lookup("entry", ".json") is None
@@ -0,0 +1,243 @@
+import random
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+
+
+def optimize_reference(interval_list: list, short_interval_threshold: float, stretch_time: float):
+    """
+    The per-object optimize that Intervals used before it stored its intervals as columns
+    :param interval_list: List of raw intervals
+    :param short_interval_threshold: The shortest allowed interval length (in seconds)
+    :param stretch_time: The time that should be added/removed from a audible/silent interval
+    :return: List of optimized intervals
+    """
+    intervals = []
+    current_interval = Interval(is_silent=None)
+
+    for interval in interval_list:
+        if interval.duration <= short_interval_threshold or current_interval.is_silent == interval.is_silent:
+            current_interval.end = interval.end
+        elif current_interval.is_silent is None:
+            current_interval.is_silent = interval.is_silent
+            current_interval.end = interval.end
+        else:
+            intervals.append(current_interval)
+            current_interval = interval.copy()
+
+    if current_interval.is_silent is None:
+        current_interval.is_silent = False
+
+    intervals.append(current_interval)
+
+    for i, interval in enumerate(intervals):
+        interval.enlarge_audible_interval(stretch_time, is_start_interval=(i == 0),
+                                          is_end_interval=(i == len(intervals) - 1))
+
+    return intervals
+
+
+def random_intervals(generator: random.Random, count: int):
+    """
+    Generates contiguous raw intervals with random durations (many of them short) and random states
+    :param generator: Seeded random generator
+    :param count: Number of intervals
+    :return: List of intervals
+    """
+    interval_list = []
+    current_time = 0.0
+    is_silent = generator.random() < 0.5
+
+    for _ in range(count):
+        duration = generator.choice([0.05, 0.1, 0.3, 0.31, 0.5, 1.0, 2.5]) * generator.uniform(0.5, 1.5)
+        interval_list.append(Interval(current_time, current_time + duration, is_silent))
+        current_time += duration
+
+        # Raw detection results alternate, merged results may repeat a state
+        is_silent = not is_silent if generator.random() < 0.8 else is_silent
+
+    return interval_list
+
+
+def values(interval_list):
+    """
+    Get the values of intervals
+    :param interval_list: Iterable of intervals
+    :return: List of (start, end, is_silent) tuples
+    """
+    return [(interval.start, interval.end, bool(interval.is_silent)) for interval in interval_list]
+
+
+def optimize_or_error(function):
+    """
+    Runs an optimization and returns its result, or the message of the exception it raised
+    :param function: Function without arguments that returns the optimized intervals
+    :return: List of (start, end, is_silent) tuples or the exception message
+    """
+    try:
+        return values(function())
+    except Exception as error:
+        return str(error)
+
+
+def assert_same_result(expected, actual):
+    """
+    Asserts that two optimization results (see optimize_or_error) are equal, up to floating point rounding
+    :param expected: Result of the reference implementation
+    :param actual: Result that is checked
+    :return: None
+    """
+    if isinstance(expected, str) or isinstance(actual, str):
+        assert actual == expected
+        return
+
+    assert len(actual) == len(expected)
+
+    for (start, end, is_silent), (expected_start, expected_end, expected_silent) in zip(actual, expected):
+        assert start == pytest.approx(expected_start, abs=1e-9)
+        assert end == pytest.approx(expected_end, abs=1e-9)
+        assert is_silent == expected_silent
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_optimize_matches_reference(seed):
+    generator = random.Random(seed)
+    interval_list = random_intervals(generator, generator.randint(0, 40))
+    short_interval_threshold = generator.choice([0.0, 0.1, 0.3, 0.5, 1.0])
+    stretch_time = generator.choice([0.0, 0.05, 0.25, 0.5])
+
+    def vectorized():
+        intervals = Intervals([interval.copy() for interval in interval_list])
+        intervals.optimize(short_interval_threshold, stretch_time)
+        return intervals.intervals
+
+    def streaming():
+        return list(Intervals.optimize_iter((interval.copy() for interval in interval_list), short_interval_threshold,
+                                            stretch_time))
+
+    expected = optimize_or_error(
+        lambda: optimize_reference([interval.copy() for interval in interval_list], short_interval_threshold,
+                                   stretch_time)
+    )
+
+    assert_same_result(expected, optimize_or_error(vectorized))
+    assert_same_result(expected, optimize_or_error(streaming))
+
+
+def test_optimize_merges_short_intervals_into_the_previous_one():
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 2.2, True), Interval(2.2, 4, False),
+                           Interval(4, 6, True)])
+    intervals.optimize(0.3, 0)
+
+    assert values(intervals.intervals) == [(0, 4, False), (4, 6, True)]
+
+
+def test_optimize_short_intervals_at_the_start_take_the_state_of_the_first_long_one():
+    intervals = Intervals([Interval(0, 0.2, False), Interval(0.2, 0.4, True), Interval(0.4, 3, True),
+                           Interval(3, 5, False)])
+    intervals.optimize(0.3, 0)
+
+    assert values(intervals.intervals) == [(0, 3, True), (3, 5, False)]
+
+
+def test_optimize_only_short_intervals_gives_one_audible_interval():
+    intervals = Intervals([Interval(0, 0.2, True), Interval(0.2, 0.4, False), Interval(0.4, 0.6, True)])
+    intervals.optimize(0.3, 0.1)
+
+    assert values(intervals.intervals) == [(0, 0.6, False)]
+
+
+def test_optimize_threshold_is_inclusive():
+    intervals = Intervals([Interval(0, 1, False), Interval(1, 1.5, True), Interval(1.5, 3, False)])
+    intervals.optimize(0.5, 0)
+
+    assert values(intervals.intervals) == [(0, 3, False)]
+
+
+def test_optimize_stretches_audible_and_shrinks_silent_intervals():
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 4, True), Interval(4, 6, False)])
+    intervals.optimize(0.3, 0.5)
+
+    assert values(intervals.intervals) == [(0, 2.25, False), (2.25, 3.75, True), (3.75, 6, False)]
+
+
+@pytest.mark.parametrize("stretch_time", [1.0, 1.5])
+def test_optimize_rejects_stretch_time_as_long_as_an_interval(stretch_time):
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 3, True), Interval(3, 6, False)])
+
+    with pytest.raises(Exception, match="Stretch time to large"):
+        intervals.optimize(0.3, stretch_time)
+
+
+def test_intervals_sequence_item_access_writes_through():
+    intervals = Intervals([Interval(0, 1, False), Interval(1, 2, True)])
+
+    intervals.intervals[0].end = 1.5
+    intervals.intervals[1] = Interval(1.5, 3, False)
+
+    assert values(intervals.intervals) == [(0, 1.5, False), (1.5, 3, False)]
+    assert intervals.ends.tolist() == [1.5, 3]
+
+
+def test_intervals_sequence_mutation_like_a_list():
+    reference = [Interval(i, i + 1, i % 2 == 1) for i in range(6)]
+    intervals = Intervals([interval.copy() for interval in reference])
+    sequence = intervals.intervals
+
+    sequence.append(Interval(6, 7, False))
+    reference.append(Interval(6, 7, False))
+    assert values([sequence.pop(0)]) == values([reference.pop(0)])
+
+    sequence.insert(1, Interval(10, 11, True))
+    reference.insert(1, Interval(10, 11, True))
+
+    del sequence[2]
+    del reference[2]
+
+    sequence[1:3] = [Interval(20, 21, False)]
+    reference[1:3] = [Interval(20, 21, False)]
+
+    sequence.extend([Interval(30, 31, True), Interval(31, 32, False)])
+    reference.extend([Interval(30, 31, True), Interval(31, 32, False)])
+
+    sequence.remove(Interval(30, 31, True))
+    reference.remove(next(interval for interval in reference if interval.start == 30))
+
+    sequence.reverse()
+    reference.reverse()
+
+    assert values(intervals.intervals) == values(reference)
+    assert Interval(20, 21, False) in sequence
+    assert Interval(40, 41, False) not in sequence
+    assert sequence.index(Interval(20, 21, False)) == values(reference).index((20, 21, False))
+
+
+def test_intervals_sequence_pop_and_concatenation():
+    intervals = Intervals([Interval(0, 1, False), Interval(1, 2, True), Interval(2, 3, False)])
+    sequence = intervals.intervals
+
+    popped = sequence.pop()
+    assert values([popped]) == [(2, 3, False)]
+    assert len(intervals.intervals) == 2
+
+    combined = sequence + [Interval(5, 6, True)]
+    assert values(combined) == [(0, 1, False), (1, 2, True), (5, 6, True)]
+    assert values([Interval(-1, 0, True)] + sequence) == [(-1, 0, True), (0, 1, False), (1, 2, True)]
+
+    sequence += [Interval(2, 4, False)]
+    assert values(intervals.intervals) == [(0, 1, False), (1, 2, True), (2, 4, False)]
+    assert intervals.intervals == [Interval(0, 1, False), Interval(1, 2, True), Interval(2, 4, False)]
+
+
+def test_intervals_sequence_index_errors():
+    intervals = Intervals([Interval(0, 1, False)])
+
+    with pytest.raises(IndexError):
+        intervals.intervals[1]
+
+    with pytest.raises(ValueError):
+        intervals.intervals.index(Interval(5, 6, False))
+
+    assert values([intervals.intervals[-1]]) == [(0, 1, False)]
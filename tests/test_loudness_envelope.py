@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from unsilence.lib.envelope.LoudnessEnvelope import LoudnessEnvelope
+
+
+def envelope_of(*parts):
+    """
+    Builds an envelope with a window every 10 ms from loud (0 dB) and silent (-60 dB) parts
+    :param parts: Tuples (duration in seconds, whether the part is silent)
+    :return: LoudnessEnvelope
+    """
+    levels = np.concatenate([np.full(round(duration * 100), -60.0 if is_silent else 0.0)
+                             for duration, is_silent in parts])
+    return LoudnessEnvelope(levels, 0.01, len(levels) / 100)
+
+
+def output_duration(envelope: LoudnessEnvelope, stretch_time: float, audible_speed: float, silent_speed: float):
+    """
+    Computes the output duration from the optimized intervals of an envelope
+    :param envelope: The envelope
+    :param stretch_time: Time the intervals are enlarged/shrunken (in seconds)
+    :param audible_speed: Speed of the audible intervals
+    :param silent_speed: Speed of the silent intervals
+    :return: Duration in seconds
+    """
+    intervals = envelope.intervals(-35, 0.2, 0.3, stretch_time)
+    return sum(interval.duration / (silent_speed if interval.is_silent else audible_speed)
+               for interval in intervals.intervals)
+
+
+def test_sweep_matches_the_optimized_intervals():
+    envelope = envelope_of((1, False), (0.6, True), (2, False), (1.5, True), (1, False))
+    durations = envelope.sweep([-35], [0.2], [1, 1.5], [4, 6], [0.3], [0, 0.25])
+
+    assert durations.shape == (1, 1, 1, 2, 2, 2)
+
+    for m, stretch_time in enumerate([0, 0.25]):
+        for a, audible_speed in enumerate([1, 1.5]):
+            for s, silent_speed in enumerate([4, 6]):
+                assert durations[0, 0, 0, m, a, s] == pytest.approx(
+                    output_duration(envelope, stretch_time, audible_speed, silent_speed))
+
+
+def test_sweep_marks_a_too_large_stretch_time_as_nan():
+    envelope = envelope_of((1, False), (0.35, True), (2, False), (1.5, True), (1, False))
+    durations = envelope.sweep([-35], [0.2], [1], [6], [0.3], [0.25, 0.4])
+
+    # The silence of 0.35 seconds is shorter than the stretch time of 0.4 seconds, optimize would raise
+    with pytest.raises(Exception, match="Stretch time to large"):
+        envelope.intervals(-35, 0.2, 0.3, 0.4)
+
+    assert durations[0, 0, 0, 0, 0, 0] == pytest.approx(output_duration(envelope, 0.25, 1, 6))
+    assert np.isnan(durations[0, 0, 0, 1, 0, 0])
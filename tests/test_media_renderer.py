@@ -0,0 +1,50 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+generate_chunk_tasks = MediaRenderer._MediaRenderer__generate_chunk_tasks
+
+
+def test_chunk_tasks_of_no_intervals(tmp_path):
+    assert generate_chunk_tasks([], 4, tmp_path, ".mp4") == []
+
+
+def test_chunk_tasks_split_the_intervals_into_contiguous_chunks(tmp_path):
+    interval_list = [Interval(i, i + 1, i % 2 == 1) for i in range(6)]
+    tasks = generate_chunk_tasks(interval_list, 3, tmp_path, ".mp4")
+
+    assert [(task.interval.start, task.interval.end) for task in tasks] == [(0, 2), (2, 4), (4, 6)]
+    assert [interval for task in tasks for interval in task.intervals] == interval_list
+    assert [task.interval_output_file.name for task in tasks] == ["out_0.mp4", "out_1.mp4", "out_2.mp4"]
+
+
+@requires_ffmpeg
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes are not supported")
+@pytest.mark.parametrize("mode", [{"pipeline": True}, {"max_temp_bytes": 1}])
+def test_muxed_render_reports_the_concat_progress(tmp_path, mode):
+    input_file = tmp_path / "input.m4a"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=8", "-c:a", "aac",
+                    str(input_file)], check=True)
+
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 4, True), Interval(4, 6, False), Interval(6, 8, True)])
+    render_progress = []
+    concat_progress = []
+
+    MediaRenderer(tmp_path / "temp").render(
+        input_file, tmp_path / "output.m4a", intervals, audio_only=True, threads=2,
+        on_render_progress_update=lambda *args: render_progress.append(args),
+        on_concat_progress_update=lambda *args: concat_progress.append(args),
+        **mode
+    )
+
+    assert (tmp_path / "output.m4a").exists()
+    assert sorted(render_progress)[-1] == (4, 4)
+    assert concat_progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
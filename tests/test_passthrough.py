@@ -0,0 +1,98 @@
+import shutil
+import subprocess
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.render_media.Passthrough import probe_passthrough, probe_streams
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.tools.ffmpeg_output import output_seconds
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+                                reason="ffmpeg or ffprobe is not installed")
+
+
+def generate_video(output_file, *encoder_options: str, duration: float = 6):
+    """
+    Generates a video with a keyframe every second
+    :param output_file: Where the video should be saved
+    :param encoder_options: Additional options of the video encoder
+    :param duration: Duration of the video (in seconds)
+    :return: The path of the video
+    """
+    subprocess.run(["ffmpeg", "-v", "error", "-y",
+                    "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=25:duration={duration}",
+                    "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                    "-c:v", "libx264", "-g", "25", *encoder_options, "-c:a", "aac", "-shortest", str(output_file)],
+                   check=True)
+    return output_file
+
+
+def test_probe_streams(tmp_path):
+    streams = probe_streams(generate_video(tmp_path / "input.mp4", "-pix_fmt", "yuv420p"))
+
+    assert streams["video"]["codec_name"] == "h264"
+    assert streams["video"]["pix_fmt"] == "yuv420p"
+    assert (streams["video"]["width"], streams["video"]["height"]) == ("160", "120")
+    assert streams["audio"]["codec_name"] == "aac"
+    assert streams["audio"]["sample_rate"] == "44100"
+
+
+def test_passthrough_needs_the_stream_parameters_of_a_re_encode(tmp_path):
+    matching_input = generate_video(tmp_path / "matching.mp4", "-pix_fmt", "yuv420p")
+    baseline_input = generate_video(tmp_path / "baseline.mp4", "-pix_fmt", "yuv420p", "-profile:v", "baseline")
+
+    supported, keyframes = probe_passthrough(matching_input, ".mp4", False, tmp_path / "temp")
+    assert supported
+    assert keyframes == pytest.approx([0, 1, 2, 3, 4, 5])
+
+    # A re-encoded interval has the High profile, it can not be concatenated with copied baseline intervals
+    assert probe_passthrough(baseline_input, ".mp4", False, tmp_path / "temp") == (False, None)
+
+    # Only the audio is copied for an audio only output
+    assert probe_passthrough(baseline_input, ".m4a", True, tmp_path / "temp")[0]
+
+    # Other default codecs of the output suffix
+    assert probe_passthrough(matching_input, ".mkv", False, tmp_path / "temp") == (False, None)
+
+    # The reference segments are deleted after they were probed
+    assert list((tmp_path / "temp").iterdir()) == []
+
+
+def test_stream_copy_duration_comes_from_its_progress(tmp_path, monkeypatch):
+    input_file = generate_video(tmp_path / "input.mp4", "-pix_fmt", "yuv420p")
+    run_output = RenderIntervalThread.run_output
+    copy_durations = {}
+    stages = []
+
+    def record_stages(command, task, options, metrics=None, stage=None):
+        """
+        Replaces RenderIntervalThread.run_output, records the stage of every process and the duration of stream copies
+        :param command: The ffmpeg command
+        :param task: The task the segment belongs to
+        :param options: The render options
+        :param metrics: Metrics of the render
+        :param stage: Name of the stage
+        :return: The collected output
+        """
+        output = run_output(command, task, options, metrics, stage)
+        stages.append(stage)
+
+        if stage == "stream_copy":
+            copy_durations[task.task_id] = output_seconds(output)
+
+        return output
+
+    monkeypatch.setattr(RenderIntervalThread, "run_output", staticmethod(record_stages))
+
+    intervals = Intervals([Interval(0, 1, False), Interval(1, 3.5, True), Interval(3.5, 6, False)])
+    MediaRenderer(tmp_path / "temp").render(input_file, tmp_path / "output.mp4", intervals, passthrough=True,
+                                            threads=1)
+
+    # The last interval is snapped back to the keyframe at 3 seconds, the audible intervals are copied without a
+    # re-encode (the progress ends at the timestamp of the last packet)
+    assert copy_durations == {0: pytest.approx(1, abs=0.1), 2: pytest.approx(3, abs=0.1)}
+    assert stages.count("render_interval") == 1
+    assert (tmp_path / "output.mp4").exists()
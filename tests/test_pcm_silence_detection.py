@@ -0,0 +1,77 @@
+import shutil
+import subprocess
+
+import pytest
+
+from unsilence.lib.detect_silence import PcmSilenceDetection as pcm_silence_detection_module
+from unsilence.lib.detect_silence.PcmSilenceDetection import pcm_silence_events
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def generate_audio(output_file, silences: list, duration: float):
+    """
+    Generates a sine tone with silences as WAV
+    :param output_file: Where the file should be saved
+    :param silences: List of (start, end) tuples of the silences (in seconds)
+    :param duration: Duration of the file (in seconds)
+    :return: The path of the file
+    """
+    muted = "+".join(f"between(t,{start},{end})" for start, end in silences)
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                    "-af", f"volume=0:enable='{muted}'", str(output_file)], check=True)
+    return output_file
+
+
+def record_processes(monkeypatch):
+    """
+    Records the ffmpeg processes the PCM detection starts
+    :param monkeypatch: The pytest monkeypatch fixture
+    :return: List the started processes are appended to
+    """
+    processes = []
+    popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        """
+        Starts a process and records it
+        :param args: Positional args of subprocess.Popen
+        :param kwargs: Keyword args of subprocess.Popen
+        :return: The started process
+        """
+        process = popen(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(pcm_silence_detection_module.subprocess, "Popen", recording_popen)
+    return processes
+
+
+def test_pcm_silence_events(tmp_path):
+    input_file = generate_audio(tmp_path / "input.wav", [(2, 3), (5, 8)], 10)
+    events = list(pcm_silence_events(input_file, -35, 0.5))
+
+    assert events[0] == ("duration", pytest.approx(10))
+    assert events[1:] == [("start", pytest.approx(2, abs=0.05)), ("end", pytest.approx(3, abs=0.05)),
+                          ("start", pytest.approx(5, abs=0.05)), ("end", pytest.approx(8, abs=0.05))]
+
+
+def test_pcm_silence_events_of_a_file_ffmpeg_can_not_decode(tmp_path):
+    input_file = tmp_path / "input.wav"
+    input_file.write_bytes(b"not a wav file")
+
+    with pytest.raises(IOError, match="Could not decode the audio"):
+        list(pcm_silence_events(input_file, -35, 0.5))
+
+
+def test_closing_pcm_silence_events_stops_ffmpeg(tmp_path, monkeypatch):
+    input_file = generate_audio(tmp_path / "input.wav", [(1, 2)], 600)
+    processes = record_processes(monkeypatch)
+
+    events = pcm_silence_events(input_file, -35, 0.5, block_duration=1)
+    assert next(events)[0] == "duration"
+    events.close()
+
+    # ffmpeg is stopped and reaped long before it decoded the whole file
+    assert len(processes) == 1
+    assert processes[0].returncode is not None and processes[0].returncode != 0
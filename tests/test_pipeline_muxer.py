@@ -0,0 +1,135 @@
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from unsilence.lib.render_media.PipelineMuxer import PipelineMuxer, pipeline_output_options
+
+pytestmark = [
+    pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed"),
+    pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes are not supported"),
+]
+
+
+def render_segment(output_file, frequency: int, duration: float = 1):
+    """
+    Renders an audio segment as NUT, like a render thread in pipeline mode
+    :param output_file: Where the segment should be saved
+    :param frequency: Frequency of the sine tone (to tell segments apart)
+    :param duration: Duration of the segment (in seconds)
+    :return: The path of the segment
+    """
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i",
+                    f"sine=frequency={frequency}:duration={duration}", *pipeline_output_options(".m4a", True),
+                    str(output_file)], check=True)
+    return output_file
+
+
+def media_duration(media_file):
+    """
+    Reads the duration of a media file from ffmpeg's input information
+    :param media_file: The file
+    :return: Duration in seconds
+    """
+    console_output = subprocess.run(["ffmpeg", "-hide_banner", "-i", str(media_file)], stderr=subprocess.PIPE,
+                                    universal_newlines=True).stderr
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", console_output).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def start_muxer(tmp_path, slot_count: int, muxed: list, errors: list):
+    """
+    Starts a muxer that records its callbacks
+    :param tmp_path: The pytest tmp_path fixture
+    :param slot_count: Number of slots
+    :param muxed: List the task IDs of muxed segments are appended to
+    :param errors: List the muxing errors are appended to
+    :return: The started PipelineMuxer
+    """
+    pipe_dir = tmp_path / "pipes"
+    pipe_dir.mkdir()
+
+    muxer = PipelineMuxer(pipe_dir, tmp_path / "output.m4a", slot_count, on_segment_muxed=muxed.append,
+                          on_failed=errors.append)
+    muxer.start()
+    return muxer
+
+
+def test_pipeline_output_options():
+    assert pipeline_output_options(".M4A", True) == ["-c:a", "aac", "-f", "nut"]
+    assert pipeline_output_options(".mkv", False) is None
+    assert pipeline_output_options(".ogg", True) is None
+
+
+def test_segments_are_muxed_in_timeline_order(tmp_path):
+    segments = [render_segment(tmp_path / f"segment_{i}.nut", 300 + 200 * i) for i in range(3)]
+    muxed, errors = [], []
+    muxer = start_muxer(tmp_path, 3, muxed, errors)
+
+    # Segments arrive in any order, as files or in memory
+    muxer.add_segment(2, segments[2])
+    muxer.add_segment(0, segments[0].read_bytes())
+    muxer.add_segment(1, segments[1])
+    muxer.finish(3)
+
+    assert muxed == [0, 1, 2]
+    assert errors == []
+    # Every segment keeps up to two AAC frames of encoder padding
+    assert media_duration(tmp_path / "output.m4a") == pytest.approx(3, abs=3 * 0.05)
+
+    # Segment files are deleted as soon as they are muxed
+    assert not segments[1].exists() and not segments[2].exists()
+
+
+def test_dropped_and_missing_segments_are_skipped(tmp_path):
+    segments = [render_segment(tmp_path / f"segment_{i}.nut", 300 + 200 * i) for i in range(3)]
+    muxed, errors = [], []
+    muxer = start_muxer(tmp_path, 5, muxed, errors)
+
+    muxer.add_segment(0, segments[0])
+    muxer.add_segment(1, None)
+    muxer.add_segment(3, segments[2])
+    # Task 2 was never rendered, task 4 never added (fewer segments than slots)
+    muxer.finish(4)
+
+    assert muxed == [0, 1, 2, 3]
+    assert errors == []
+    assert media_duration(tmp_path / "output.m4a") == pytest.approx(2, abs=2 * 0.05)
+
+
+def test_no_rendered_segment_fails(tmp_path):
+    muxed, errors = [], []
+    muxer = start_muxer(tmp_path, 2, muxed, errors)
+
+    muxer.add_segment(0, None)
+    muxer.add_segment(1, None)
+
+    with pytest.raises(IOError, match="Muxing the rendered segments failed"):
+        muxer.finish(2)
+
+    assert [str(error) for error in errors] == ["No segment was rendered"]
+
+
+def test_invalid_segment_fails_without_blocking(tmp_path):
+    muxed, errors = [], []
+    muxer = start_muxer(tmp_path, 2, muxed, errors)
+
+    muxer.add_segment(0, b"not a nut file")
+    muxer.add_segment(1, render_segment(tmp_path / "segment.nut", 440))
+
+    with pytest.raises(IOError, match="Muxing the rendered segments failed"):
+        muxer.finish(2)
+
+
+def test_abort_stops_the_muxer(tmp_path):
+    muxed, errors = [], []
+    muxer = start_muxer(tmp_path, 3, muxed, errors)
+
+    muxer.add_segment(0, render_segment(tmp_path / "segment.nut", 440))
+    muxer.abort()
+    muxer.join(timeout=10)
+
+    assert not muxer.is_alive()
+    assert errors == []
@@ -0,0 +1,80 @@
+import re
+import shutil
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def render_options(**kwargs):
+    """
+    Builds render options like MediaRenderer.render does
+    :param kwargs: Options that differ from the defaults
+    :return: SimpleNamespace with the render options
+    """
+    options = SimpleNamespace(audio_only=False, audible_speed=1, silent_speed=6, audible_volume=1, silent_volume=0.5,
+                              drop_corrupted_intervals=False, check_intervals=False, minimum_interval_duration=0.25,
+                              ffmpeg_threads=None, filter_threads=None, audio_proxy=False, pipeline_output=None,
+                              segments_in_memory=False)
+    options.__dict__.update(kwargs)
+    return options
+
+
+def media_duration(media_file):
+    """
+    Reads the duration of a media file from ffmpeg's input information
+    :param media_file: The file
+    :return: Duration in seconds
+    """
+    console_output = subprocess.run(["ffmpeg", "-hide_banner", "-i", str(media_file)], stderr=subprocess.PIPE,
+                                    universal_newlines=True).stderr
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", console_output).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+@pytest.mark.parametrize("audio_only", [False, True])
+def test_filtered_render_is_cut_to_the_sped_up_duration(tmp_path, audio_only):
+    command = RenderIntervalThread.generate_command(tmp_path / "input.mp4", tmp_path / "out.mp4", Interval(3, 6, True),
+                                                    render_options(audio_only=audio_only), True, 0.25)
+
+    assert "apad[a]" in command[command.index("-filter_complex") + 1]
+    assert command[command.index("-t") + 1] == str(3 / 6)
+
+
+def test_clamped_render_is_cut_to_the_minimum_duration(tmp_path):
+    command = RenderIntervalThread.generate_command(tmp_path / "input.mp4", tmp_path / "out.mp4",
+                                                    Interval(3, 3.5, True), render_options(), True, 0.25)
+
+    assert float(command[command.index("-t") + 1]) == pytest.approx(0.25)
+
+
+def test_unfiltered_render_is_not_cut(tmp_path):
+    command = RenderIntervalThread.generate_command(tmp_path / "input.mp4", tmp_path / "out.mp4", Interval(3, 6, True),
+                                                    render_options(audio_only=True), False, 0.25)
+
+    assert "-t" not in command
+    assert "-filter_complex" not in command
+
+
+@requires_ffmpeg
+def test_audio_segments_have_the_sped_up_duration(tmp_path):
+    input_file = tmp_path / "input.m4a"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=10", "-c:a", "aac",
+                    str(input_file)], check=True)
+
+    options = render_options(audio_only=True)
+
+    for i, interval in enumerate([Interval(0, 2.01, False), Interval(2.01, 5.37, True), Interval(5.37, 9.9, False)]):
+        output_file = tmp_path / f"out_{i}.m4a"
+        command = RenderIntervalThread.generate_command(input_file, output_file, interval, options, True, 0.25)
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        expected = RenderIntervalThread.output_duration(interval, options)
+
+        # Without the cut, the encoder padding of the last AAC frame makes the segment up to a frame longer
+        assert media_duration(output_file) == pytest.approx(expected, abs=0.011)
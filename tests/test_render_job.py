@@ -0,0 +1,169 @@
+import shutil
+import subprocess
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.render_media.RenderJob import RenderJob
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+OPTIONS = {"audible_speed": 1, "silent_speed": 6, "audio_only": True}
+
+
+def segment_task(job: RenderJob, task_id: int, interval: Interval, data: bytes = None):
+    """
+    Builds a render task whose segment is in the job directory
+    :param job: The render job
+    :param task_id: ID of the task
+    :param interval: Interval of the task
+    :param data: Content of the rendered segment, None if it was not rendered
+    :return: SimpleNamespace task
+    """
+    task = SimpleNamespace(task_id=task_id, interval=interval,
+                           interval_output_file=job.job_dir / f"out_{task_id}.m4a")
+
+    if data is not None:
+        task.interval_output_file.write_bytes(data)
+
+    return task
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    """
+    An input file for jobs that do not render
+    :param tmp_path: The pytest tmp_path fixture
+    :return: Path of the file
+    """
+    path = tmp_path / "input.m4a"
+    path.write_bytes(b"audio")
+    return path
+
+
+def test_render_job_resumes_recorded_segments(tmp_path, input_file):
+    job = RenderJob(tmp_path / "job", input_file, OPTIONS)
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), True)
+    job.record(segment_task(job, 1, Interval(2, 4, True), b"second"), False)
+
+    resumed = RenderJob(tmp_path / "job", input_file, dict(OPTIONS))
+
+    assert resumed.is_completed(segment_task(resumed, 0, Interval(0, 2, False)))
+    # Invalid segments and segments that were never recorded are rendered again
+    assert not resumed.is_completed(segment_task(resumed, 1, Interval(2, 4, True)))
+    assert not resumed.is_completed(segment_task(resumed, 2, Interval(4, 6, False)))
+
+
+def test_render_job_checks_the_segment_of_a_task(tmp_path, input_file):
+    job = RenderJob(tmp_path / "job", input_file, OPTIONS)
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), True)
+    job.record(segment_task(job, 1, Interval(2, 4, True), b"second"), True)
+
+    resumed = RenderJob(tmp_path / "job", input_file, OPTIONS)
+
+    # Changed intervals (e.g. other detection options) do not match the recorded segment
+    assert not resumed.is_completed(segment_task(resumed, 0, Interval(0, 2.5, False)))
+    assert not resumed.is_completed(SimpleNamespace(task_id=0, interval=Interval(0, 2, False), stream_copy=True,
+                                                    interval_output_file=resumed.job_dir / "out_0.m4a"))
+
+    # A segment file that was changed or deleted after it was recorded
+    (resumed.job_dir / "out_1.m4a").write_bytes(b"truncated, longer")
+    assert not resumed.is_completed(segment_task(resumed, 1, Interval(2, 4, True)))
+
+    (resumed.job_dir / "out_0.m4a").unlink()
+    assert not resumed.is_completed(segment_task(resumed, 0, Interval(0, 2, False)))
+
+
+def test_render_job_resets_for_other_options_or_input(tmp_path, input_file):
+    job = RenderJob(tmp_path / "job", input_file, OPTIONS)
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), True)
+
+    job = RenderJob(tmp_path / "job", input_file, dict(OPTIONS, silent_speed=4))
+    assert not job.is_completed(segment_task(job, 0, Interval(0, 2, False)))
+    assert not (job.job_dir / "out_0.m4a").exists()
+
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), True)
+    input_file.write_bytes(b"changed audio")
+
+    job = RenderJob(tmp_path / "job", input_file, dict(OPTIONS, silent_speed=4))
+    assert not job.is_completed(segment_task(job, 0, Interval(0, 2, False)))
+
+
+def test_render_job_journal_survives_an_interrupted_write(tmp_path, input_file):
+    job = RenderJob(tmp_path / "job", input_file, OPTIONS)
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), False)
+    job.record(segment_task(job, 0, Interval(0, 2, False), b"first"), True)
+
+    with open(job.job_dir / "segments.jsonl", "a") as file:
+        file.write("{\"task_id\": 1, \"fi")
+
+    resumed = RenderJob(tmp_path / "job", input_file, OPTIONS)
+
+    # The last complete entry of a segment wins, the incomplete line is ignored
+    assert resumed.is_completed(segment_task(resumed, 0, Interval(0, 2, False)))
+    assert not resumed.is_completed(segment_task(resumed, 1, Interval(2, 4, True)))
+
+
+def test_render_job_records_a_missing_segment_as_invalid(tmp_path, input_file):
+    job = RenderJob(tmp_path / "job", input_file, OPTIONS)
+    job.record(segment_task(job, 0, Interval(0, 2, False)), True)
+
+    assert not RenderJob(tmp_path / "job", input_file, OPTIONS).is_completed(
+        segment_task(job, 0, Interval(0, 2, False), b"")
+    )
+
+
+@requires_ffmpeg
+def test_interrupted_render_resumes_the_missing_segments(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.m4a"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=8", "-c:a", "aac",
+                    str(input_file)], check=True)
+
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 4, True), Interval(4, 6, False), Interval(6, 8, True)])
+    run_output = RenderIntervalThread.run_output
+    rendered_tasks = []
+
+    def fail_task_two(command, task, options, metrics=None, stage=None):
+        """
+        Replaces RenderIntervalThread.run_output, the first render of task 2 fails like an interrupted process
+        :param command: The ffmpeg command
+        :param task: The task the segment belongs to
+        :param options: The render options
+        :param metrics: Metrics of the render
+        :param stage: Name of the stage
+        :return: The collected output
+        """
+        rendered_tasks.append(task.task_id)
+
+        if task.task_id == 2 and rendered_tasks.count(2) == 1:
+            raise OSError("Interrupted")
+
+        return run_output(command, task, options, metrics, stage)
+
+    monkeypatch.setattr(RenderIntervalThread, "run_output", staticmethod(fail_task_two))
+
+    render_options = dict(audio_only=True, job_dir=tmp_path / "job", threads=1, scheduling="timeline")
+
+    with pytest.raises(OSError, match="Interrupted"):
+        MediaRenderer(tmp_path / "temp").render(input_file, tmp_path / "output.m4a", intervals, **render_options)
+
+    assert (tmp_path / "job" / "segments.jsonl").exists()
+    assert not (tmp_path / "output.m4a").exists()
+
+    # The workers finish the task they already started (task 3 may have been taken before the failure was noticed)
+    for thread in threading.enumerate():
+        if isinstance(thread, RenderIntervalThread):
+            thread.join()
+
+    first_run = list(rendered_tasks)
+    MediaRenderer(tmp_path / "temp").render(input_file, tmp_path / "output.m4a", intervals, **render_options)
+
+    # Only the failed task and the task that was not started before the failure are rendered
+    assert rendered_tasks[len(first_run):] == [2] + ([] if 3 in first_run else [3])
+    assert (tmp_path / "output.m4a").exists()
+    assert not (tmp_path / "job").exists()
@@ -0,0 +1,128 @@
+import shutil
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from unsilence.lib.cache.SegmentCache import SegmentCache
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def render_options(**kwargs):
+    """
+    Builds the render options the segment key depends on
+    :param kwargs: Options that differ from the defaults
+    :return: SimpleNamespace with the render options
+    """
+    options = SimpleNamespace(audio_only=False, audible_speed=1, silent_speed=6, audible_volume=1, silent_volume=0.5,
+                              minimum_interval_duration=0.25, audio_proxy=False)
+    options.__dict__.update(kwargs)
+    return options
+
+
+def interval_task(interval: Interval, **kwargs):
+    """
+    Builds an interval render task
+    :param interval: The interval of the task
+    :param kwargs: Additional task attributes
+    :return: SimpleNamespace task
+    """
+    return SimpleNamespace(task_id=0, interval=interval, **kwargs)
+
+
+def test_segment_key_changes_with_everything_that_changes_the_segment():
+    interval = Interval(1, 4, True)
+    key = SegmentCache.key("file", interval_task(interval), render_options(), ".mp4")
+
+    assert SegmentCache.key("file", interval_task(Interval(1, 4, True)), render_options(), ".mp4") == key
+
+    changed_keys = [
+        SegmentCache.key("other file", interval_task(interval), render_options(), ".mp4"),
+        SegmentCache.key("file", interval_task(Interval(1, 4.5, True)), render_options(), ".mp4"),
+        SegmentCache.key("file", interval_task(Interval(1, 4, False)), render_options(), ".mp4"),
+        SegmentCache.key("file", interval_task(interval), render_options(silent_speed=5), ".mp4"),
+        SegmentCache.key("file", interval_task(interval), render_options(silent_volume=1), ".mp4"),
+        SegmentCache.key("file", interval_task(interval), render_options(audio_only=True), ".mp4"),
+        SegmentCache.key("file", interval_task(interval), render_options(audio_proxy=True), ".mp4"),
+        SegmentCache.key("file", interval_task(interval), render_options(), ".mkv"),
+        SegmentCache.key("file", interval_task(interval, stream_copy=True), render_options(), ".mp4"),
+        SegmentCache.key("file", interval_task(Interval(1, 4), intervals=[interval]), render_options(), ".mp4"),
+    ]
+
+    assert len(set(changed_keys + [key])) == len(changed_keys) + 1
+
+
+def test_segment_key_ignores_options_that_do_not_change_the_segment():
+    interval = Interval(1, 1.5, True)
+    key = SegmentCache.key("file", interval_task(interval), render_options(silent_speed=20), ".mp4")
+
+    # Both speeds are clamped to the minimum interval duration
+    assert SegmentCache.key("file", interval_task(interval), render_options(silent_speed=30), ".mp4") == key
+
+    # The volume of audible intervals does not change a silent one
+    assert SegmentCache.key("file", interval_task(interval), render_options(silent_speed=20, audible_volume=2),
+                            ".mp4") == key
+
+
+def test_segment_key_contains_the_encoder_settings(monkeypatch):
+    key = SegmentCache.key("file", interval_task(Interval(1, 4, True)), render_options(), ".mp4")
+    monkeypatch.setattr(SegmentCache, "ENCODER_SETTINGS", SegmentCache.ENCODER_SETTINGS + ",changed")
+
+    assert SegmentCache.key("file", interval_task(Interval(1, 4, True)), render_options(), ".mp4") != key
+
+
+def test_segment_cache_save_and_fetch(tmp_path):
+    cache = SegmentCache(tmp_path / "cache")
+    segment_file = tmp_path / "out_0.mp4"
+    segment_file.write_bytes(b"segment")
+
+    cache.save("key", segment_file, ".mp4")
+
+    destination = tmp_path / "resumed.mp4"
+    destination.write_bytes(b"stale")
+
+    assert cache.fetch("key", destination, ".mp4")
+    assert destination.read_bytes() == b"segment"
+    assert not cache.fetch("missing", tmp_path / "missing.mp4", ".mp4")
+    assert not (tmp_path / "missing.mp4").exists()
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("filter_fails", [False, True])
+def test_unfiltered_fallback_segments_are_not_cached(tmp_path, monkeypatch, filter_fails):
+    input_file = tmp_path / "input.m4a"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=6", "-c:a", "aac",
+                    str(input_file)], check=True)
+
+    run_output = RenderIntervalThread.run_output
+
+    def fail_filtered_renders(command, task, options, metrics=None, stage=None):
+        """
+        Replaces RenderIntervalThread.run_output, filtered renders fail like on a corrupted input part
+        :param command: The ffmpeg command
+        :param task: The task the segment belongs to
+        :param options: The render options
+        :param metrics: Metrics of the render
+        :param stage: Name of the stage
+        :return: The collected output
+        """
+        if filter_fails and "-filter_complex" in command:
+            return SimpleNamespace(progress={}, log=["Invalid data found when processing input"], returncode=1)
+
+        return run_output(command, task, options, metrics, stage)
+
+    monkeypatch.setattr(RenderIntervalThread, "run_output", staticmethod(fail_filtered_renders))
+
+    cache = SegmentCache(tmp_path / "cache")
+    intervals = Intervals([Interval(0, 2, False), Interval(2, 4, True), Interval(4, 6, False)])
+
+    MediaRenderer(tmp_path / "temp").render(input_file, tmp_path / "output.m4a", intervals, audio_only=True,
+                                            segment_cache=cache, threads=1)
+
+    assert (tmp_path / "output.m4a").exists()
+    assert len(list(cache.cache_dir.glob("*.m4a"))) == (0 if filter_fails else 3)
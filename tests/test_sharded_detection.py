@@ -0,0 +1,96 @@
+import shutil
+import subprocess
+
+import pytest
+
+from unsilence.lib.cache.DetectionCache import DetectionCache
+from unsilence.lib.detect_silence import DetectSilence
+from unsilence.lib.detect_silence.DetectSilence import detection_events, detection_shard_count
+from unsilence.lib.detect_silence.ShardedSilenceDetection import MINIMUM_SHARD_DURATION, shard_windows
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def generate_audio(output_file, silences: list, duration: float = 60):
+    """
+    Generates a PCM WAV file with a sine tone that is interrupted by digital silence
+    :param output_file: Where the file should be saved
+    :param silences: List of (start, end) tuples of the silences (in seconds)
+    :param duration: Duration of the file (in seconds)
+    :return: None
+    """
+    silent = "+".join(f"between(t,{start},{end})" for start, end in silences)
+
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"aevalsrc='0.5*sin(2*PI*440*t)*not({silent})':s=44100:d={duration}",
+            "-c:a", "pcm_s16le",
+            str(output_file)
+        ],
+        check=True
+    )
+
+
+def test_shard_windows_have_whole_second_boundaries_and_overlap():
+    windows = shard_windows(95.5, 3, 2)
+
+    assert windows == [(0, 31, 0, 33), (31, 63, 29, 36), (63, None, 61, None)]
+
+
+def test_shard_windows_are_limited_by_the_minimum_shard_duration():
+    assert len(shard_windows(3 * MINIMUM_SHARD_DURATION - 1, 8, 1)) == 2
+    assert shard_windows(MINIMUM_SHARD_DURATION / 2, 4, 1) == [(0, None, 0, None)]
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("silences", [
+    # Silences across the boundaries at 20 and 40 seconds
+    [(5, 6), (18.5, 21.5), (38, 40.5), (57, 60)],
+    # Silences that start or end exactly on a boundary
+    [(20, 22), (35, 40), (45, 46)],
+    # A silence that covers the whole middle shard
+    [(3, 4), (19, 42)],
+    # A silence at the start that is cut by the first boundary, audio until the end
+    [(0, 25), (50, 52)],
+])
+def test_sharded_detection_matches_a_single_run(tmp_path, silences):
+    input_file = tmp_path / "input.wav"
+    generate_audio(input_file, silences)
+
+    single_events = list(detection_events(input_file))
+    sharded_events = list(detection_events(input_file, detection_shards=3))
+
+    # PCM input is decoded the same after every seek, the stitched result is exact
+    assert sharded_events == single_events
+    assert len([event for event, _ in single_events if event == "start"]) == len(silences)
+
+
+def test_detection_shard_count_resolves_auto(monkeypatch):
+    monkeypatch.setattr(DetectSilence, "usable_cpu_count", lambda: 4)
+
+    assert detection_shard_count("auto") == 4
+    assert detection_shard_count(2) == 2
+    assert detection_shard_count(0) == 1
+
+
+def test_detection_cache_key_contains_the_shard_count(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.wav"
+    input_file.write_bytes(b"RIFF" + bytes(100))
+    cache = DetectionCache(tmp_path / "cache")
+
+    monkeypatch.setattr(DetectSilence, "usable_cpu_count", lambda: 1)
+    single_cpu_auto_key = cache.key(input_file, detection_shards="auto")
+
+    assert single_cpu_auto_key == cache.key(input_file, detection_shards=1)
+    assert single_cpu_auto_key == cache.key(input_file)
+
+    monkeypatch.setattr(DetectSilence, "usable_cpu_count", lambda: 4)
+
+    assert cache.key(input_file, detection_shards="auto") == cache.key(input_file, detection_shards=4)
+    assert cache.key(input_file, detection_shards=4) != cache.key(input_file, detection_shards=1)
+    assert cache.key(input_file, detection_shards=4) != cache.key(input_file, detection_shards=2)
+
+    # The numpy engine does not use shards
+    assert cache.key(input_file, detection_engine="numpy", detection_shards=4) == \
+        cache.key(input_file, detection_engine="numpy")
@@ -0,0 +1,65 @@
+from fractions import Fraction
+from types import SimpleNamespace
+
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.render_media.TaskScheduling import interval_speed, probe_frame_duration, split_long_intervals
+
+
+def render_options(**kwargs):
+    """
+    Builds the render options the scheduling depends on
+    :param kwargs: Options that differ from the defaults
+    :return: SimpleNamespace with the render options
+    """
+    options = SimpleNamespace(audible_speed=1, silent_speed=6, minimum_interval_duration=0.25)
+    options.__dict__.update(kwargs)
+    return options
+
+
+def test_probe_frame_duration_without_ffprobe(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    assert probe_frame_duration(tmp_path / "input.mp4", ".mp4", False) is None
+
+
+def test_split_long_intervals_keeps_short_intervals():
+    interval_list = [Interval(0, 2, False), Interval(2, 3, True)]
+
+    assert list(split_long_intervals(interval_list, None)) == interval_list
+    assert list(split_long_intervals(interval_list, 2)) == interval_list
+
+
+def test_split_long_intervals_splits_into_equal_parts():
+    parts = list(split_long_intervals([Interval(10, 20, False)], 3))
+
+    assert [(part.start, part.end) for part in parts] == pytest.approx([(10, 12.5), (12.5, 15), (15, 17.5),
+                                                                       (17.5, 20)])
+    assert all(not part.is_silent for part in parts)
+
+
+def test_split_long_intervals_snaps_to_output_frames():
+    frame_duration = Fraction(1, 25)
+    options = render_options(silent_speed=4)
+    interval = Interval(1, 11.3, True)
+
+    parts = list(split_long_intervals([interval], 3, frame_duration, options))
+
+    assert parts[0].start == interval.start and parts[-1].end == interval.end
+
+    # Every split point is a whole number of output frames after the interval start
+    for part in parts[1:]:
+        output_frames = (part.start - interval.start) / interval_speed(interval, options) / float(frame_duration)
+        assert output_frames == pytest.approx(round(output_frames))
+
+
+def test_split_long_intervals_does_not_clamp_the_speed_of_parts():
+    options = render_options(silent_speed=20)
+    interval = Interval(0, 12, True)
+
+    parts = list(split_long_intervals([interval], 1, Fraction(1, 25), options))
+
+    # 12 parts of 1 second would be 0.05 seconds long at speed 20, they would be slowed down
+    assert 1 < len(parts) < 12
+    assert all(interval_speed(part, options) == 20 for part in parts)
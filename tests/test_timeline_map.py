@@ -0,0 +1,214 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.intervals.TimelineMap import TimelineMap
+from unsilence.lib.render_media.Passthrough import plan_passthrough
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.subtitles.RemapSubtitles import remap_subtitles
+
+
+def render_options(**kwargs):
+    """
+    Builds render options like MediaRenderer.render does, for the options the timeline depends on
+    :param kwargs: Options that differ from the defaults
+    :return: SimpleNamespace with the render options
+    """
+    options = SimpleNamespace(audible_speed=1, silent_speed=6, audible_volume=1, silent_volume=0.5,
+                              minimum_interval_duration=0.25)
+    options.__dict__.update(kwargs)
+    return options
+
+
+def rendered_segments(interval_list: list, options: SimpleNamespace):
+    """
+    Computes the segments a render writes, one interval after the other with its clamped speed
+    :param interval_list: The intervals that get rendered, in timeline order
+    :param options: The render options
+    :return: List of (input start, input end, output start, speed) tuples
+    """
+    segments = []
+    output_time = 0.0
+
+    for interval in interval_list:
+        speed = options.silent_speed if interval.is_silent else options.audible_speed
+        speed = RenderIntervalThread.clamp_speed(interval.duration, speed, options.minimum_interval_duration)
+        segments.append((interval.start, interval.end, output_time, speed))
+        output_time += interval.duration / speed
+
+    return segments
+
+
+def to_output_reference(segments: list, input_time: float):
+    """
+    Maps an input timestamp to the output by walking the segments
+    :param segments: The result of rendered_segments
+    :param input_time: Timestamp in the input (in seconds)
+    :return: Timestamp in the output (in seconds)
+    """
+    if input_time <= segments[0][0]:
+        return 0.0
+
+    for start, end, output_start, speed in segments:
+        if input_time <= end:
+            return output_start + (input_time - start) / speed
+
+    start, end, output_start, speed = segments[-1]
+    return output_start + (end - start) / speed
+
+
+def random_intervals(generator: random.Random, count: int):
+    """
+    Generates contiguous alternating intervals with random durations, some of them too short for their speed
+    :param generator: Seeded random generator
+    :param count: Number of intervals
+    :return: List of intervals
+    """
+    interval_list = []
+    current_time = generator.uniform(0, 2)
+    is_silent = generator.random() < 0.5
+
+    for _ in range(count):
+        duration = generator.choice([0.1, 0.4, 1.0, 3.0]) * generator.uniform(0.5, 1.5)
+        interval_list.append(Interval(current_time, current_time + duration, is_silent))
+        current_time += duration
+        is_silent = not is_silent
+
+    # remove_short_intervals_from_start requires one long interval
+    interval_list.append(Interval(current_time, current_time + 5, False))
+
+    return interval_list
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_timeline_map_matches_the_rendered_segments(seed):
+    generator = random.Random(seed)
+    interval_list = random_intervals(generator, generator.randint(1, 30))
+    options = render_options(audible_speed=generator.choice([1, 1.5]), silent_speed=generator.choice([2, 6, 20]))
+
+    timeline_map = TimelineMap(Intervals([interval.copy() for interval in interval_list]), **vars(options))
+
+    rendered = Intervals([interval.copy() for interval in interval_list])
+    rendered = rendered.remove_short_intervals_from_start(options.audible_speed, options.silent_speed)
+    segments = rendered_segments(rendered.intervals, options)
+
+    last_start, last_end, last_output_start, last_speed = segments[-1]
+    assert timeline_map.output_duration == pytest.approx(last_output_start + (last_end - last_start) / last_speed)
+
+    input_times = [generator.uniform(-1, interval_list[-1].end + 1) for _ in range(100)]
+    expected = [to_output_reference(segments, input_time) for input_time in input_times]
+
+    assert timeline_map.to_output(np.array(input_times)) == pytest.approx(expected)
+    assert [timeline_map.to_output(input_time) for input_time in input_times] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_timeline_map_to_input_inverts_to_output(seed):
+    generator = random.Random(seed)
+    timeline_map = TimelineMap(Intervals(random_intervals(generator, 20)))
+
+    output_times = np.linspace(0, timeline_map.output_duration, 200)
+
+    assert timeline_map.to_output(timeline_map.to_input(output_times)) == pytest.approx(output_times)
+
+
+def test_timeline_map_clamps_speed_of_short_intervals():
+    timeline_map = TimelineMap(Intervals([Interval(0, 2, False), Interval(2, 2.6, True), Interval(2.6, 5, False)]),
+                               silent_speed=6, minimum_interval_duration=0.25)
+
+    # 0.6 s at speed 6 would be 0.1 s, the interval is slowed down to 0.25 s
+    assert timeline_map.to_output(2.6) == pytest.approx(2.25)
+    assert timeline_map.output_duration == pytest.approx(4.65)
+
+
+def test_timeline_map_clips_timestamps_outside_the_intervals():
+    timeline_map = TimelineMap(Intervals([Interval(0, 0.3, True), Interval(0.3, 2, False), Interval(2, 4, True)]),
+                               silent_speed=2)
+
+    # The short silent interval at the start is removed by the render
+    assert timeline_map.to_output(0.1) == 0.0
+    assert timeline_map.to_output(10) == pytest.approx(timeline_map.output_duration)
+    assert timeline_map.to_input(-1) == pytest.approx(0.3)
+    assert timeline_map.to_input(100) == pytest.approx(4)
+
+
+def test_timeline_map_follows_the_passthrough_plan():
+    interval_list = [Interval(0, 4, False), Interval(4, 7, True), Interval(7, 12, False), Interval(12, 15, True),
+                     Interval(15, 20, False)]
+    keyframes = [0, 3, 6, 11.9, 18]
+    options = render_options(silent_speed=2)
+
+    timeline_map = TimelineMap(Intervals([interval.copy() for interval in interval_list]), passthrough=True,
+                               keyframes=keyframes, **vars(options))
+    unplanned_map = TimelineMap(Intervals([interval.copy() for interval in interval_list]), **vars(options))
+
+    planned = [interval for interval, _ in plan_passthrough(interval_list, keyframes, options)]
+    segments = rendered_segments(planned, options)
+
+    # The audible interval at 7 s is copied from the keyframe at 6 s, so the silent interval before it ends there
+    assert [(interval.start, interval.end) for interval in planned][1:3] == [(4, 6), (6, 12)]
+
+    for input_time in [3, 5, 6.5, 9, 12.5, 19]:
+        assert timeline_map.to_output(input_time) == pytest.approx(to_output_reference(segments, input_time))
+
+    assert timeline_map.output_duration == pytest.approx(unplanned_map.output_duration + 0.5)
+
+
+def test_timeline_map_passthrough_keeps_volume_changed_intervals():
+    interval_list = [Interval(0, 4, False), Interval(4, 7, True), Interval(7, 12, False)]
+
+    timeline_map = TimelineMap(Intervals(interval_list), passthrough=True, keyframes=[0, 6], silent_speed=2,
+                               audible_volume=2)
+    unplanned_map = TimelineMap(Intervals(interval_list), silent_speed=2)
+
+    assert timeline_map.output_duration == pytest.approx(unplanned_map.output_duration)
+
+
+def test_remap_subtitles_srt(tmp_path):
+    timeline_map = TimelineMap(Intervals([Interval(0, 10, False), Interval(10, 20, True), Interval(20, 30, False)]),
+                               silent_speed=5)
+
+    input_file = tmp_path / "input.en.srt"
+    input_file.write_text(
+        "1\n00:00:01,000 --> 00:00:02,500\nFirst\n\n"
+        "2\n00:00:25,000 --> 00:00:26,000 X:10%\nSecond\nsecond line\n\n"
+        "3\n00:00:40,000 --> 00:00:41,000\nAfter the end\n",
+        encoding="utf-8"
+    )
+    output_file = tmp_path / "output.en.srt"
+
+    assert remap_subtitles(input_file, output_file, timeline_map) == 2
+    assert output_file.read_text(encoding="utf-8") == (
+        "1\n00:00:01,000 --> 00:00:02,500\nFirst\n\n"
+        "2\n00:00:17,000 --> 00:00:18,000 X:10%\nSecond\nsecond line\n"
+    )
+
+
+def test_remap_subtitles_vtt(tmp_path):
+    timeline_map = TimelineMap(Intervals([Interval(0, 10, True), Interval(10, 20, False)]), silent_speed=2)
+
+    input_file = tmp_path / "input.vtt"
+    input_file.write_text(
+        "\ufeffWEBVTT\n\nNOTE a comment\n\nintro\n00:05.000 --> 00:00:08.000\nIntro\n\n"
+        "01:00:00.000 --> 01:00:01.000\nAfter the end\n",
+        encoding="utf-8"
+    )
+    output_file = tmp_path / "output.vtt"
+
+    assert remap_subtitles(input_file, output_file, timeline_map) == 1
+    assert output_file.read_text(encoding="utf-8") == (
+        "WEBVTT\n\nNOTE a comment\n\nintro\n00:00:02.500 --> 00:00:04.000\nIntro\n"
+    )
+
+
+def test_remap_subtitles_rejects_other_formats(tmp_path):
+    input_file = tmp_path / "input.ass"
+    input_file.write_text("[Script Info]\n", encoding="utf-8")
+    timeline_map = TimelineMap(Intervals([Interval(0, 10, False)]))
+
+    with pytest.raises(ValueError, match="Unsupported subtitle format"):
+        remap_subtitles(input_file, tmp_path / "output.ass", timeline_map)
@@ -0,0 +1,197 @@
+import asyncio
+import shutil
+import sys
+from pathlib import Path
+
+from unsilence.lib.detect_silence.AsyncSilenceDetection import detect_silence_async
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.intervals.TimeCalculations import calculate_time
+from unsilence.lib.metrics.Metrics import Metrics, measure_stage
+from unsilence.lib.render_media.AsyncMediaRenderer import AsyncMediaRenderer
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+from unsilence.lib.tools.ffmpeg_version import is_ffmpeg_usable
+
+
+class AsyncOperation:
+    """
+    A running detection or render of AsyncUnsilence. Await it for the result, or iterate it with async for to receive
+    the progress updates until it finishes (then await it for the result or the exception). Cancelling it (or the task
+    that awaits it) kills its ffmpeg processes
+    """
+
+    __FINISHED = object()
+
+    def __init__(self, operation):
+        """
+        Starts an operation as a task of the running event loop
+        :param operation: Function that takes the progress function (called like func(update)) and returns the
+            coroutine of the operation
+        """
+        self.__updates = asyncio.Queue()
+        self.__task = asyncio.get_running_loop().create_task(operation(self.__updates.put_nowait))
+        self.__task.add_done_callback(lambda _: self.__updates.put_nowait(AsyncOperation.__FINISHED))
+
+    def __await__(self):
+        return self.__task.__await__()
+
+    async def __aiter__(self):
+        """
+        Yields the progress updates until the operation is finished (only one consumer receives them)
+        :return: Async generator of progress updates
+        """
+        while True:
+            update = await self.__updates.get()
+
+            if update is AsyncOperation.__FINISHED:
+                return
+
+            yield update
+
+    def cancel(self):
+        """
+        Cancels the operation, its ffmpeg processes are killed
+        :return: None
+        """
+        self.__task.cancel()
+
+    def done(self):
+        """
+        Returns whether the operation is finished (successfully, failed or cancelled)
+        :return: bool
+        """
+        return self.__task.done()
+
+
+class AsyncUnsilence:
+    """
+    asyncio version of Unsilence for event loop based services: the ffmpeg processes are started with
+    asyncio.create_subprocess_exec instead of blocking threads, their number is limited by a semaphore that can be
+    shared between jobs, and progress is reported by async iteration instead of callbacks
+    """
+
+    def __init__(self, input_file: Path, temp_dir: Path = Path(".tmp"), process_limit: asyncio.Semaphore = None,
+                 metrics: Metrics = None):
+        """
+        :param input_file: The file that should be processed
+        :type input_file: Path
+        :param temp_dir: The temp dir where temporary files can be saved
+        :type temp_dir: Path
+        :param process_limit: Limits how many ffmpeg processes run at the same time, pass the same semaphore to all
+            jobs that should share the limit (default: one slot per usable CPU for this instance)
+        :type process_limit: asyncio.Semaphore
+        :param metrics: Collects the wall time of every stage and every spawned process
+        :type metrics: ~unsilence.lib.metrics.Metrics.Metrics
+        """
+        self.__input_file = Path(input_file)
+        self.__temp_dir = Path(temp_dir)
+        self.__intervals: Intervals = None
+        self.__process_limit = process_limit if process_limit is not None else asyncio.Semaphore(usable_cpu_count())
+        self.__metrics = metrics
+
+        # Runs ffmpeg once per process (the result is cached), like Unsilence
+        ffmpeg_status = is_ffmpeg_usable()
+        if ffmpeg_status == "not_detected":
+            raise EnvironmentError("ffmpeg not found!")
+        elif ffmpeg_status == "requirements_unsatisfied":
+            raise EnvironmentError("ffmpeg version not supported, a version >= 4.2.4 is required!")
+        elif ffmpeg_status == "unknown_version":
+            print("Could not detect ffmpeg version, proceed at your own risk! (version >= 4.2.4 required)",
+                  file=sys.stderr)
+
+    def detect_silence(self, **kwargs):
+        """
+        Starts the silence detection of the file (must be called with a running event loop)
+
+        :param `\**kwargs`: Keyword arguments passed to :func:`~unsilence.lib.detect_silence.AsyncSilenceDetection.detect_silence_async`
+
+        :return: Operation that yields (current, total) progress updates, awaiting it returns the Intervals
+        :rtype: ~unsilence.AsyncUnsilence.AsyncOperation
+        """
+        kwargs.setdefault("metrics", self.__metrics)
+        kwargs.setdefault("process_limit", self.__process_limit)
+
+        async def operation(report_progress):
+            kwargs["on_silence_detect_progress_update"] = lambda current, total: report_progress((current, total))
+
+            with measure_stage(kwargs["metrics"], "detect_silence"):
+                self.__intervals = await detect_silence_async(self.__input_file, **kwargs)
+
+            return self.__intervals
+
+        return AsyncOperation(operation)
+
+    def render_media(self, output_file: Path, **kwargs):
+        """
+        Starts rendering the current intervals (must be called with a running event loop)
+
+        :param output_file: Where the final file should be saved at
+        :type output_file: Path
+        :param `\**kwargs`: Keyword arguments passed to :func:`~unsilence.lib.render_media.AsyncMediaRenderer.AsyncMediaRenderer.render`
+
+        :raises: **ValueError** -- If silence detection was never run
+
+        :return: Operation that yields (stage, current, total) progress updates, stage is "render" or "concat"
+        :rtype: ~unsilence.AsyncUnsilence.AsyncOperation
+        """
+        if self.__intervals is None:
+            raise ValueError("Silence detection was not yet run and no intervals where given manually!")
+
+        kwargs.setdefault("metrics", self.__metrics)
+        intervals = self.__intervals
+
+        async def operation(report_progress):
+            kwargs["on_render_progress_update"] = lambda current, total: report_progress(("render", current, total))
+            kwargs["on_concat_progress_update"] = lambda current, total: report_progress(("concat", current, total))
+
+            renderer = AsyncMediaRenderer(self.__temp_dir, self.__process_limit)
+            await renderer.render(self.__input_file, output_file, intervals, **kwargs)
+
+        return AsyncOperation(operation)
+
+    def set_intervals(self, intervals: Intervals):
+        """
+        Set the intervals so that they do not need to be re-detected
+
+        :param intervals: Intervals collection
+        :type intervals: ~unsilence.lib.intervals.Intervals.Intervals
+
+        :return: None
+        """
+        self.__intervals = intervals
+
+    def get_intervals(self):
+        """
+        Get the current Intervals so they can be reused if wanted
+
+        :return: Intervals collection
+        :rtype: ~unsilence.lib.intervals.Intervals.Intervals
+        """
+        return self.__intervals
+
+    def estimate_time(self, audible_speed: float = 1, silent_speed: float = 6):
+        """
+        Estimates the time (savings) when the current options are applied to the intervals
+
+        :param audible_speed: The speed at which the audible intervals get played back at
+        :type audible_speed: float
+        :param silent_speed: The speed at which the silent intervals get played back at
+        :type silent_speed: float
+
+        :raises: **ValueError** -- If silence detection was never run
+
+        :return: Dictionary of time information
+        :rtype: dict
+        """
+        if self.__intervals is None:
+            raise ValueError("Silence detection was not yet run and no intervals where given manually!")
+
+        return calculate_time(self.__intervals, audible_speed, silent_speed)
+
+    def cleanup(self):
+        """
+        Removes the temp dir
+
+        :return: None
+        """
+        if self.__temp_dir.exists():
+            shutil.rmtree(self.__temp_dir)
@@ -1,11 +1,19 @@
 import atexit
 import shutil
+import uuid
 from pathlib import Path
 
-from unsilence.lib.detect_silence.DetectSilence import detect_silence
+from unsilence.lib.cache.AudioProxyCache import AudioProxyCache
+from unsilence.lib.detect_silence.DetectSilence import detect_silence, detect_silence_iter
+from unsilence.lib.envelope.LoudnessEnvelope import LoudnessEnvelope
 from unsilence.lib.intervals.Intervals import Intervals
 from unsilence.lib.intervals.TimeCalculations import calculate_time
+from unsilence.lib.intervals.TimelineMap import TimelineMap
+from unsilence.lib.metrics.Metrics import Metrics, measure_stage
 from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.render_media.Passthrough import probe_passthrough
+from unsilence.lib.render_media.RenderTimeEstimation import estimate_render_time
+from unsilence.lib.render_media.ThreadCalibration import calibrate
 from unsilence.lib.tools.ffmpeg_version import is_ffmpeg_usable
 import sys
 
@@ -15,16 +23,20 @@ class Unsilence:
     Unsilence Class to remove (or isolate or many other use cases) silence from audible video parts
     """
 
-    def __init__(self, input_file: Path, temp_dir: Path = Path(".tmp")):
+    def __init__(self, input_file: Path, temp_dir: Path = Path(".tmp"), metrics: Metrics = None):
         """
         :param input_file: The file that should be processed
         :type input_file: Path
         :param temp_dir: The temp dir where temporary files can be saved
         :type temp_dir: Path
+        :param metrics: Collects the wall time of every stage and the resource usage of every spawned process
+        :type metrics: ~unsilence.lib.metrics.Metrics.Metrics
         """
         self.__input_file = Path(input_file)
         self.__temp_dir = Path(temp_dir)
         self.__intervals: Intervals = None
+        self.__metrics = metrics
+        self.__audio_proxy: Path = None
 
         ffmpeg_status = is_ffmpeg_usable()
         if ffmpeg_status == "not_detected":
@@ -37,6 +49,31 @@ class Unsilence:
 
         atexit.register(self.cleanup)
 
+    def use_audio_proxy(self, audio_proxy_cache: AudioProxyCache = None):
+        """
+        Extracts the audio of the file once into a PCM WAV proxy (or reuses the cached proxy of the file), the silence
+        detection and audio only renders read the proxy from then on instead of the file
+
+        :param audio_proxy_cache: The cache the proxy is stored in and reused from (default: the user cache directory)
+        :type audio_proxy_cache: ~unsilence.lib.cache.AudioProxyCache.AudioProxyCache
+
+        :raises: **IOError** -- If the audio could not be extracted
+
+        :return: Path of the proxy (inside the temp dir)
+        :rtype: Path
+        """
+        if audio_proxy_cache is None:
+            audio_proxy_cache = AudioProxyCache()
+
+        self.__temp_dir.mkdir(parents=True, exist_ok=True)
+        audio_proxy = self.__temp_dir.absolute() / f"audio_proxy_{uuid.uuid4()}.wav"
+
+        with measure_stage(self.__metrics, "audio_proxy"):
+            audio_proxy_cache.fetch(self.__input_file, audio_proxy, self.__metrics)
+
+        self.__audio_proxy = audio_proxy
+        return self.__audio_proxy
+
     def detect_silence(self, **kwargs):
         """
         Detects silence of the file (Options can be specified in kwargs)
@@ -46,9 +83,26 @@ class Unsilence:
         :return: A generated Intervals object
         :rtype: ~unsilence.lib.intervals.Intervals.Intervals
         """
-        self.__intervals = detect_silence(self.__input_file, **kwargs)
+        kwargs.setdefault("metrics", self.__metrics)
+        kwargs.setdefault("audio_proxy", self.__audio_proxy)
+
+        with measure_stage(kwargs["metrics"], "detect_silence"):
+            self.__intervals = detect_silence(self.__input_file, **kwargs)
+
         return self.__intervals
 
+    def loudness_envelope(self, **kwargs):
+        """
+        Computes (or loads from its cache) the loudness envelope of the file, which can derive Intervals and time
+        estimates for any threshold combination without decoding the file again
+
+        :param `\**kwargs`: Remaining keyword arguments are passed to :func:`~unsilence.lib.envelope.LoudnessEnvelope.LoudnessEnvelope.from_file`
+
+        :return: The loudness envelope
+        :rtype: ~unsilence.lib.envelope.LoudnessEnvelope.LoudnessEnvelope
+        """
+        return LoudnessEnvelope.from_file(self.__input_file, **kwargs)
+
     def set_intervals(self, intervals: Intervals):
         """
         Set the intervals so that they do not need to be re-detected
@@ -88,6 +142,57 @@ class Unsilence:
 
         return calculate_time(self.__intervals, audible_speed, silent_speed)
 
+    def estimate_render_time(self, **kwargs):
+        """
+        Predicts how long rendering the current intervals takes on this machine for every render thread count, by test
+        rendering a few representative intervals
+
+        :param `\**kwargs`: Render options and estimation options, see :func:`~unsilence.lib.render_media.RenderTimeEstimation.estimate_render_time`
+
+        :raises: **ValueError** -- If silence detection was never run
+
+        :return: Estimate dict (threads maps every thread count to the predicted seconds, best_threads is the fastest)
+        :rtype: dict
+        """
+        if self.__intervals is None:
+            raise ValueError("Silence detection was not yet run and no intervals where given manually!")
+
+        kwargs.setdefault("metrics", self.__metrics)
+        kwargs.setdefault("audio_proxy", self.__audio_proxy)
+
+        return estimate_render_time(self.__input_file, self.__intervals, self.__temp_dir, **kwargs)
+
+    def timeline_map(self, **kwargs):
+        """
+        Builds the index that maps timestamps (e.g. of subtitles or chapter markers) between the input and the output
+        of a render with the given options
+
+        :param `\**kwargs`: Render options (audible_speed, silent_speed, minimum_interval_duration, audible_volume, silent_volume, passthrough, engine, audio_only), see :class:`~unsilence.lib.intervals.TimelineMap.TimelineMap` and :func:`~unsilence.lib.render_media.MediaRenderer.MediaRenderer.render`, and output_suffix (suffix of the output file, required for passthrough)
+
+        :raises: **ValueError** -- If silence detection was never run
+
+        :return: The timeline map
+        :rtype: ~unsilence.lib.intervals.TimelineMap.TimelineMap
+        """
+        if self.__intervals is None:
+            raise ValueError("Silence detection was not yet run and no intervals where given manually!")
+
+        audio_only = kwargs.pop("audio_only", False)
+        output_suffix = kwargs.pop("output_suffix", None)
+        engine = kwargs.pop("engine", "interval")
+
+        # Same conditions as in MediaRenderer.render: audio proxy renders and the chunk engine never stream copy
+        uses_audio_proxy = audio_only and self.__audio_proxy is not None
+
+        if kwargs.get("passthrough", False) and engine == "interval" and not uses_audio_proxy:
+            kwargs["passthrough"], kwargs["keyframes"] = probe_passthrough(self.__input_file, output_suffix,
+                                                                           audio_only, self.__temp_dir.absolute(),
+                                                                           self.__metrics)
+        else:
+            kwargs["passthrough"] = False
+
+        return TimelineMap(self.__intervals, **kwargs)
+
     def render_media(self, output_file: Path, **kwargs):
         """
         Renders the current intervals with options specified in the kwargs
@@ -101,9 +206,104 @@ class Unsilence:
         if self.__intervals is None:
             raise ValueError("Silence detection was not yet run and no intervals where given manually!")
 
+        kwargs.setdefault("metrics", self.__metrics)
+        kwargs.setdefault("audio_proxy", self.__audio_proxy)
+
         renderer = MediaRenderer(self.__temp_dir)
         renderer.render(self.__input_file, output_file, self.__intervals, **kwargs)
 
+    def calibrate_threads(self, audio_only: bool = False, sample_duration: float = 60, on_result=None, **kwargs):
+        """
+        Renders the start of the file with different splits of the CPUs between render threads and ffmpeg threads and
+        stores the fastest split for this machine, renders with threads="auto" use it from then on
+
+        :param audio_only: Whether audio only renders should be calibrated
+        :type audio_only: bool
+        :param sample_duration: How much of the file is rendered for every split (in seconds)
+        :type sample_duration: float
+        :param on_result: Function that is called after every split (called like func(budget, seconds))
+        :param `\**kwargs`: Remaining keyword arguments are passed to :func:`~unsilence.lib.render_media.MediaRenderer.MediaRenderer.render`
+
+        :raises: **ValueError** -- If silence detection was never run
+
+        :return: The fastest split (with workers, ffmpeg_threads and filter_threads)
+        :rtype: types.SimpleNamespace
+        """
+        if self.__intervals is None:
+            raise ValueError("Silence detection was not yet run and no intervals where given manually!")
+
+        sample = Intervals()
+        for interval in self.__intervals.intervals:
+            if interval.start >= sample_duration:
+                break
+
+            interval = interval.copy()
+            interval.end = min(interval.end, sample_duration)
+            sample.add_interval(interval)
+
+        sample_output_file = self.__temp_dir.absolute() / f"calibration_{uuid.uuid4()}{self.__input_file.suffix}"
+        renderer = MediaRenderer(self.__temp_dir)
+
+        def render_sample(budget):
+            """
+            Nested function that renders the sample with a split of the CPUs
+            :param budget: The split (with workers, ffmpeg_threads and filter_threads)
+            :return: None
+            """
+            renderer.render(
+                self.__input_file,
+                sample_output_file,
+                sample,
+                audio_only=audio_only,
+                threads=budget.workers,
+                ffmpeg_threads=budget.ffmpeg_threads,
+                filter_threads=budget.filter_threads,
+                **kwargs
+            )
+            sample_output_file.unlink()
+
+        return calibrate(render_sample, audio_only, on_result=on_result)
+
+    def detect_and_render(self, output_file: Path, detection_options: dict = None, **kwargs):
+        """
+        Detects silence and renders the media at the same time: every interval is rendered as soon as the detection
+        has settled its boundaries, so the detection time is mostly hidden behind the rendering
+
+        :param output_file: Where the final file should be saved at
+        :type output_file: Path
+        :param detection_options: Keyword arguments that are passed to :func:`~unsilence.lib.detect_silence.DetectSilence.detect_silence_iter`
+        :type detection_options: dict
+        :param `\**kwargs`: Remaining keyword arguments are passed to :func:`~unsilence.lib.render_media.MediaRenderer.MediaRenderer.render`
+
+        :return: A generated Intervals object
+        :rtype: ~unsilence.lib.intervals.Intervals.Intervals
+        """
+        if detection_options is None:
+            detection_options = {}
+
+        detection_options = dict(detection_options)
+        detection_options.setdefault("metrics", self.__metrics)
+        detection_options.setdefault("audio_proxy", self.__audio_proxy)
+        kwargs.setdefault("metrics", self.__metrics)
+        kwargs.setdefault("audio_proxy", self.__audio_proxy)
+
+        intervals = Intervals()
+
+        def interval_stream():
+            """
+            Nested generator that records the detected intervals while they are passed on to the renderer
+            :return: Generator of intervals
+            """
+            for interval in detect_silence_iter(self.__input_file, **detection_options):
+                intervals.add_interval(interval.copy())
+                yield interval
+
+        renderer = MediaRenderer(self.__temp_dir)
+        renderer.render(self.__input_file, output_file, interval_stream(), **kwargs)
+
+        self.__intervals = intervals
+        return self.__intervals
+
     def cleanup(self):
         """
         Cleans up the temporary directories, called automatically when the program ends
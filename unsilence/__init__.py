@@ -1,3 +1,26 @@
-from unsilence.Unsilence import Unsilence
-from unsilence.lib.intervals.Interval import Interval
-from unsilence.lib.intervals.Intervals import Intervals
+import importlib
+
+# The public classes are imported on first access (PEP 562), so importing unsilence (e.g. by the command line
+# interface before it parsed the arguments) does not load NumPy and asyncio yet
+_EXPORTS = {
+    "Unsilence": "unsilence.Unsilence",
+    "AsyncUnsilence": "unsilence.AsyncUnsilence",
+    "Interval": "unsilence.lib.intervals.Interval",
+    "Intervals": "unsilence.lib.intervals.Intervals",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,389 @@
+from datetime import datetime
+import json
+import signal
+import sys
+
+from rich.console import Console
+from rich.progress import Progress
+from rich.table import Table
+
+from unsilence.Unsilence import Unsilence
+from unsilence.lib.batch.BatchJobs import collect_jobs
+from unsilence.lib.batch.BatchRunner import BatchRunner
+from unsilence.lib.batch.ProcessSlots import ProcessSlots
+from unsilence.lib.cache.AudioProxyCache import AudioProxyCache
+from unsilence.lib.cache.DetectionCache import DetectionCache
+from unsilence.lib.cache.FileCache import default_cache_dir
+from unsilence.lib.cache.SegmentCache import SegmentCache
+from unsilence.lib.metrics.Metrics import Metrics
+from unsilence.lib.metrics.MetricsSinks import JsonLinesSink, PrometheusSink
+from unsilence.lib.render_media.RenderJob import default_job_dir
+from unsilence.lib.render_media.ThreadCalibration import auto_thread_budget
+from unsilence.lib.server.HttpApi import create_http_server
+from unsilence.lib.server.JobServer import JobServer
+from unsilence.lib.subtitles.RemapSubtitles import remap_subtitles
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+from unsilence.command_line.ChoiceDialog import choice_dialog
+from unsilence.command_line.PrettyStats import pretty_stats
+from unsilence.command_line.PrettyTimeEstimate import format_timedelta, pretty_time_estimate
+
+
+def run_unsilence(args):
+    """
+    Run the Console Interface for a single file
+    :param args: The parsed arguments (see ParseArguments.parse_arguments)
+    :return: None
+    """
+    console = Console()
+
+    if args.debug:
+        sys.tracebacklimit = 1000
+
+    detection_cache = DetectionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    segment_cache = SegmentCache(max_size=args.segment_cache_size * 1024 * 1024)
+    audio_proxy_cache = AudioProxyCache(max_size=args.audio_proxy_size * 1024 * 1024)
+
+    if args.clear_cache:
+        detection_cache.clear()
+        segment_cache.clear()
+        audio_proxy_cache.clear()
+        console.print("[green]Detection, segment and audio proxy cache cleared[/green]")
+
+        if args.input_file is None or args.output_file is None:
+            return
+
+    if args.calibrate:
+        calibrate_threads(console, args)
+        return
+
+    if args.output_file.exists() and not args.non_interactive_mode:
+        if not choice_dialog(console, "File already exists. Overwrite?", default=False):
+            return
+
+    args_dict = vars(args)
+
+    argument_list_for_silence_detect = [
+        "silence_level", "silence_time_threshold", "short_interval_threshold", "stretch_time", "detection_engine",
+        "detection_shards"
+    ]
+
+    argument_dict_for_silence_detect = {
+        key: args_dict[key] for key in argument_list_for_silence_detect if key in args_dict.keys()
+    }
+
+    if not args.no_cache:
+        argument_dict_for_silence_detect["detection_cache"] = detection_cache
+
+    argument_list_for_renderer = [
+        "audio_only", "audible_speed", "silent_speed", "audible_volume", "silent_volume",
+        "drop_corrupted_intervals", "threads", "ffmpeg_threads", "check_intervals", "probe_segments",
+        "minimum_interval_duration", "engine", "scheduling", "max_task_duration", "passthrough", "pipeline",
+        "pipeline_window"
+    ]
+
+    argument_dict_for_renderer = {
+        key: args_dict[key] for key in argument_list_for_renderer if key in args_dict.keys()
+    }
+
+    if args.segment_cache:
+        argument_dict_for_renderer["segment_cache"] = segment_cache
+
+    if args.temp_budget is not None:
+        argument_dict_for_renderer["max_temp_bytes"] = args.temp_budget * 1024 * 1024
+
+    if args.resume or args.job_dir is not None:
+        argument_dict_for_renderer["job_dir"] = args.job_dir or default_job_dir(args.input_file, args.output_file)
+
+    if args.debug:
+        def print_schedule_report(report):
+            console.print(
+                f"Predicted makespan: {round(report['makespan'], 1)} (FIFO: {round(report['fifo_makespan'], 1)}, "
+                f"lower bound: {round(report['lower_bound'], 1)}, "
+                f"improvement: {round(report['improvement'] * 100, 1)}%)"
+            )
+
+        argument_dict_for_renderer["on_schedule_report"] = print_schedule_report
+
+    metrics = None
+
+    if args.stats or args.metrics_file is not None:
+        metrics = Metrics()
+
+        if args.metrics_file is not None:
+            if args.metrics_file.suffix == ".prom":
+                metrics.add_sink(PrometheusSink(args.metrics_file))
+            else:
+                metrics.add_sink(JsonLinesSink(args.metrics_file))
+
+    progress = Progress()
+
+    continual = Unsilence(args.input_file, metrics=metrics)
+
+    with progress:
+        def update_task(current_task):
+            def handler(current_val, total):
+                progress.update(current_task, total=total, completed=current_val)
+
+            return handler
+
+        if args.audio_proxy:
+            audio_proxy_task = progress.add_task("Extracting Audio...", total=1)
+            continual.use_audio_proxy(audio_proxy_cache)
+            progress.update(audio_proxy_task, completed=1)
+
+        silence_detect_task = progress.add_task("Calculating Intervals...", total=1)
+
+        start_time = datetime.today()
+
+        if args.stream:
+            rendering_task = progress.add_task("Rendering Intervals...", total=1)
+            concat_task = progress.add_task("Combining Intervals...", total=1)
+
+            continual.detect_and_render(
+                args.output_file,
+                detection_options=dict(
+                    on_silence_detect_progress_update=update_task(silence_detect_task),
+                    **argument_dict_for_silence_detect
+                ),
+                on_render_progress_update=update_task(rendering_task),
+                on_concat_progress_update=update_task(concat_task),
+                **argument_dict_for_renderer
+            )
+
+            progress.stop()
+
+            print()
+
+            estimated_time = continual.estimate_time(args.audible_speed, args.silent_speed)
+            console.print(pretty_time_estimate(estimated_time))
+        else:
+            continual.detect_silence(
+                on_silence_detect_progress_update=update_task(silence_detect_task),
+                **argument_dict_for_silence_detect
+            )
+
+            progress.stop()
+            progress.remove_task(silence_detect_task)
+
+            print()
+
+            estimated_time = continual.estimate_time(args.audible_speed, args.silent_speed)
+            render_estimate = None
+            threads = argument_dict_for_renderer["threads"]
+
+            if args.predict_render_time or args.best_threads:
+                if threads == "auto":
+                    budget = auto_thread_budget(args.audio_only)
+                    threads = budget.workers
+
+                    # The test renders are measured with the ffmpeg threads the render uses
+                    if argument_dict_for_renderer["ffmpeg_threads"] is None:
+                        argument_dict_for_renderer["ffmpeg_threads"] = budget.ffmpeg_threads
+
+                with console.status("Predicting render time..."):
+                    render_estimate = continual.estimate_render_time(output_suffix=args.output_file.suffix,
+                                                                     **argument_dict_for_renderer)
+
+                if args.best_threads:
+                    threads = argument_dict_for_renderer["threads"] = render_estimate["best_threads"]
+
+            console.print(pretty_time_estimate(estimated_time, render_estimate, threads))
+
+            print()
+
+            if not args.non_interactive_mode:
+                if not choice_dialog(console, "Continue with these options?", default=True):
+                    return
+
+            progress.start()
+            rendering_task = progress.add_task("Rendering Intervals...", total=1)
+            concat_task = progress.add_task("Combining Intervals...", total=1)
+
+            continual.render_media(
+                args.output_file,
+                on_render_progress_update=update_task(rendering_task),
+                on_concat_progress_update=update_task(concat_task),
+                **argument_dict_for_renderer
+            )
+
+            progress.stop()
+
+    if len(args.subtitles) > 0:
+        # The map needs the same options as the render, passthrough moves interval boundaries to keyframes
+        timeline_options = dict(argument_dict_for_renderer, output_suffix=args.output_file.suffix)
+
+        if args.stream:
+            # Streamed intervals are never stream copied
+            timeline_options["passthrough"] = False
+
+        timeline_map = continual.timeline_map(**timeline_options)
+
+        for subtitle_file in args.subtitles:
+            subtitle_output_file = args.output_file.with_name(
+                args.output_file.stem + "".join(subtitle_file.suffixes[-2:])
+            )
+            remap_subtitles(subtitle_file, subtitle_output_file, timeline_map)
+            console.print(f"Subtitles saved to {subtitle_output_file}")
+
+    time_passed = datetime.today() - start_time
+    time_passed_str = format_timedelta(time_passed.seconds)
+    console.print(f"\n[green]Finished in {time_passed_str}![/green] :tada:")
+    print()
+
+    if metrics is not None:
+        metrics.close()
+
+        if args.stats:
+            console.print(pretty_stats(metrics.summary()))
+            print()
+
+
+def calibrate_threads(console: Console, args):
+    """
+    Runs the thread calibration of the Console Interface
+    :param console: rich.console.Console
+    :param args: The parsed arguments
+    :return: None
+    """
+    continual = Unsilence(args.input_file)
+    continual.detect_silence(silence_level=args.silence_level, silence_time_threshold=args.silence_time_threshold)
+
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Render Threads", justify="right")
+    table.add_column("ffmpeg Threads", justify="right")
+    table.add_column("Time", justify="right")
+
+    def add_result(budget, seconds):
+        table.add_row(str(budget.workers), str(budget.ffmpeg_threads), f"{seconds:.2f}s")
+        console.print(f"{budget.workers} render threads x {budget.ffmpeg_threads} ffmpeg threads: {seconds:.2f}s")
+
+    best = continual.calibrate_threads(audio_only=args.audio_only, on_result=add_result)
+
+    console.print(table)
+    console.print(f"[green]Calibrated {'audio only' if args.audio_only else 'video'} renders: {best.workers} render "
+                  f"threads x {best.ffmpeg_threads} ffmpeg threads[/green]")
+
+
+def run_batch(args):
+    """
+    Run the batch mode of the Console Interface
+    :param args: The parsed arguments (see ParseArguments.parse_batch_arguments)
+    :return: None
+    """
+    console = Console()
+
+    if args.debug:
+        sys.tracebacklimit = 1000
+
+    jobs = collect_jobs(args.inputs, args.output_dir)
+    args_dict = vars(args)
+
+    argument_list_for_silence_detect = [
+        "silence_level", "silence_time_threshold", "short_interval_threshold", "stretch_time", "detection_engine",
+        "detection_shards"
+    ]
+
+    argument_dict_for_silence_detect = {
+        key: args_dict[key] for key in argument_list_for_silence_detect if key in args_dict.keys()
+    }
+
+    if not args.no_cache:
+        argument_dict_for_silence_detect["detection_cache"] = DetectionCache(args.cache_dir,
+                                                                             args.cache_size * 1024 * 1024)
+
+    argument_list_for_renderer = [
+        "audio_only", "audible_speed", "silent_speed", "audible_volume", "silent_volume",
+        "drop_corrupted_intervals", "ffmpeg_threads", "check_intervals", "probe_segments", "minimum_interval_duration",
+        "engine", "max_task_duration", "passthrough"
+    ]
+
+    argument_dict_for_renderer = {
+        key: args_dict[key] for key in argument_list_for_renderer if key in args_dict.keys()
+    }
+
+    process_slots = ProcessSlots(usable_cpu_count() if args.threads == "auto" else args.threads)
+    runner = BatchRunner(process_slots=process_slots, parallel_files=args.parallel_files)
+
+    console.print(f"Processing {len(jobs)} files, at most {process_slots.capacity} ffmpeg processes run at a time")
+
+    progress = Progress()
+
+    with progress:
+        batch_task = progress.add_task("Processing Files...", total=len(jobs))
+
+        def report_job(result):
+            if result["status"] == "finished":
+                progress.console.print(f"[green]Finished[/green] {result['input']} in "
+                                       f"{format_timedelta(int(result['wall_time']))} "
+                                       f"({result['speed']:.1f}x realtime)")
+            elif result["status"] == "skipped":
+                progress.console.print(f"[yellow]Skipped[/yellow] {result['input']} (output exists)")
+            else:
+                progress.console.print(f"[red]Failed[/red] {result['input']}: {result['error']}")
+
+            progress.advance(batch_task)
+
+        summary = runner.run(
+            jobs,
+            detection_options=argument_dict_for_silence_detect,
+            render_options=argument_dict_for_renderer,
+            overwrite=args.overwrite,
+            on_job_finished=report_job
+        )
+
+    total = summary["total"]
+    console.print(
+        f"\n[green]Finished {total['finished']} files[/green] ({total['failed']} failed, {total['skipped']} skipped) "
+        f"in {format_timedelta(int(total['wall_time']))}, "
+        f"process slot utilization: {round((total['slot_utilization'] or 0) * 100, 1)}%"
+    )
+
+    if args.summary_file is not None:
+        with open(args.summary_file, "w") as file:
+            json.dump(summary, file, indent=2)
+
+        console.print(f"Summary saved to {args.summary_file}")
+
+
+def run_serve(args):
+    """
+    Run the server mode of the Console Interface
+    :param args: The parsed arguments (see ParseArguments.parse_serve_arguments)
+    :return: None
+    """
+    console = Console()
+
+    if args.debug:
+        sys.tracebacklimit = 1000
+
+    detection_cache = None
+    if not args.no_cache:
+        # The server keeps the recently used detection results in memory as well
+        detection_cache = DetectionCache(args.cache_dir, args.cache_size * 1024 * 1024, memory_entries=256)
+
+    state_dir = args.state_dir if args.state_dir is not None else default_cache_dir() / "server"
+    process_slots = ProcessSlots(usable_cpu_count() if args.threads == "auto" else args.threads)
+
+    job_server = JobServer(state_dir, process_slots=process_slots, parallel_jobs=args.parallel_jobs,
+                           detection_cache=detection_cache)
+    http_server = create_http_server(job_server, args.host, args.port, args.unix_socket)
+
+    queue_depth = job_server.metrics()["queue_depth"]
+    if queue_depth > 0:
+        console.print(f"Restored {queue_depth} queued jobs from {state_dir}")
+
+    address = args.unix_socket if args.unix_socket is not None else f"http://{args.host}:{http_server.server_port}"
+    console.print(f"Serving on {address}, at most {process_slots.capacity} ffmpeg processes run at a time")
+
+    job_server.start()
+    # A terminated server shuts down like an interrupted one (the socket is removed, jobs stay checkpointed)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        http_server.serve_forever()
+    finally:
+        job_server.stop()
+        http_server.server_close()
+
+        if args.unix_socket is not None and args.unix_socket.is_socket():
+            args.unix_socket.unlink()
@@ -42,6 +42,18 @@ def number_bigger_than_zero(s):
     return i
 
 
+def threads_or_auto(s):
+    """
+    Returns "auto" or the Number representation of s if it is bigger than zero, else an error occurs
+    :param s: Input string
+    :return: "auto" or Integer
+    """
+    if s == "auto":
+        return s
+
+    return number_bigger_than_zero(s)
+
+
 def parse_arguments():
     """
     Parses console arguments for the Unsilence Console Interface
@@ -52,11 +64,212 @@ def parse_arguments():
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
 
-    parser.add_argument("input_file", type=convert_to_path(should_exist=True),
+    parser.add_argument("input_file", type=convert_to_path(should_exist=True), nargs="?",
                         help="Path to the file that contains silence")
-    parser.add_argument("output_file", type=convert_to_path(should_exist=False, should_parents_exist=True),
+    parser.add_argument("output_file", type=convert_to_path(should_exist=False, should_parents_exist=True), nargs="?",
                         help="Path to where the finished media file should be")
 
+    add_effect_arguments(parser)
+
+    parser.add_argument("-t", "--threads", type=threads_or_auto, default=2,
+                        help="Number of threads to be used while rendering, auto splits the usable CPUs between "
+                             "render threads and ffmpeg threads")
+    parser.add_argument("-ft", "--ffmpeg-threads", type=number_bigger_than_zero, default=None,
+                        help="Number of threads of every ffmpeg process (default: ffmpeg decides, or chosen by -t auto)")
+    parser.add_argument("-cal", "--calibrate", action="store_true",
+                        help="Find the fastest split of the CPUs between render threads and ffmpeg threads by "
+                             "rendering the first minute of the input file, it is used by -t auto from then on "
+                             "(the output file is optional with this flag)")
+    parser.add_argument("-prt", "--predict-render-time", action="store_true",
+                        help="Test render a few intervals after the silence detection and show how long the render "
+                             "will take (interval engine)")
+    parser.add_argument("-bt", "--best-threads", action="store_true",
+                        help="Render with the thread count that has the lowest predicted render time (implies "
+                             "--predict-render-time, overrides -t)")
+    parser.add_argument("-e", "--engine", choices=["interval", "chunk"], default="interval",
+                        help="Render engine: one ffmpeg process per interval, or one filtergraph per thread chunk")
+    parser.add_argument("-sch", "--scheduling", choices=["longest_first", "fifo"], default="longest_first",
+                        help="Order in which intervals are dispatched to the render threads")
+    parser.add_argument("-mtd", "--max-task-duration", type=float, default=None,
+                        help="Split intervals longer than this (seconds) into multiple render tasks")
+    parser.add_argument("-pl", "--pipeline", action="store_true",
+                        help="Keep rendered segments in memory and mux them into the output while rendering, instead of "
+                             "writing every segment to the temp dir (interval engine only)")
+    parser.add_argument("-pw", "--pipeline-window", type=number_bigger_than_zero, default=None,
+                        help="How many segments may be rendered ahead of the muxer with --pipeline (default: 2 x "
+                             "render threads)")
+    parser.add_argument("-tb", "--temp-budget", type=number_bigger_than_zero, default=None,
+                        help="Maximum size of the rendered segments in the temp dir (in MB), segments are muxed into "
+                             "the output and deleted as soon as possible (interval engine only)")
+    add_detection_arguments(parser)
+
+    parser.add_argument("-sm", "--stream", action="store_true",
+                        help="Render intervals while the silence detection is still running (skips the time estimate "
+                             "before rendering)")
+
+    parser.add_argument("-sub", "--subtitles", type=convert_to_path(should_exist=True), nargs="+", default=[],
+                        help="SRT/VTT files whose timings should be adapted to the output, they are saved next to the "
+                             "output file (e.g. input.en.srt -> output.en.srt)")
+
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="Keep rendered segments in a job directory, so that an interrupted render can be "
+                             "resumed by running the same command again")
+    parser.add_argument("-jd", "--job-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        default=None, help="Job directory of a resumable render (default: inside the cache directory)")
+
+    parser.add_argument("-nc", "--no-cache", action="store_true",
+                        help="Bypass the detection cache (neither read nor write cached detection results)")
+    parser.add_argument("-cc", "--clear-cache", action="store_true",
+                        help="Clear the detection, segment and audio proxy cache (input and output file are optional with this flag)")
+    parser.add_argument("-cd", "--cache-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        default=None, help="Directory of the detection cache (default: user cache directory)")
+    parser.add_argument("-cs", "--cache-size", type=number_bigger_than_zero, default=64,
+                        help="Maximum size of the detection cache (MB)")
+    parser.add_argument("-sc", "--segment-cache", action="store_true",
+                        help="Cache rendered segments, so that a render with changed options only re-encodes the "
+                             "segments that changed")
+    parser.add_argument("-scs", "--segment-cache-size", type=number_bigger_than_zero, default=2048,
+                        help="Maximum size of the segment cache (MB)")
+
+    parser.add_argument("-ap", "--audio-proxy", action="store_true",
+                        help="Extract the audio once into a WAV proxy that the silence detection and audio only renders "
+                             "read instead of the input file, it is cached and reused for the same input")
+    parser.add_argument("-aps", "--audio-proxy-size", type=number_bigger_than_zero, default=8192,
+                        help="Maximum size of the audio proxy cache (MB)")
+
+    parser.add_argument("-sts", "--stats", action="store_true",
+                        help="Show where the time went (stages, ffmpeg/ffprobe processes, render workers) at the end")
+    parser.add_argument("-mf", "--metrics-file", type=convert_to_path(should_exist=False), default=None,
+                        help="Write all measured events as JSON lines, or as Prometheus text exposition if the file "
+                             "name ends with .prom")
+
+    parser.add_argument("-y", "--non-interactive-mode", action="store_true",
+                        help="Always answers yes if a dialog would show up")
+
+    parser.add_argument("-d", "--debug", action="store_true",
+                        help="Enable debug output (StackTrace)")
+
+    args = parser.parse_args()
+
+    if args.calibrate and args.input_file is None:
+        parser.error("the following arguments are required: input_file")
+
+    if (args.input_file is None or args.output_file is None) and not (args.clear_cache or args.calibrate):
+        parser.error("the following arguments are required: input_file, output_file")
+
+    if (args.predict_render_time or args.best_threads) and (args.stream or args.engine != "interval"):
+        parser.error("--predict-render-time and --best-threads can not be combined with --stream or the chunk engine")
+
+    if args.pipeline and (args.stream or args.resume or args.job_dir is not None or args.segment_cache
+                          or args.engine != "interval"):
+        parser.error("--pipeline can not be combined with --stream, --resume, --job-dir, --segment-cache or the chunk "
+                     "engine")
+
+    if args.temp_budget is not None and (args.pipeline or args.stream or args.resume or args.job_dir is not None
+                                         or args.segment_cache or args.engine != "interval"):
+        parser.error("--temp-budget can not be combined with --pipeline, --stream, --resume, --job-dir, "
+                     "--segment-cache or the chunk engine")
+
+    if args.probe_segments and (args.pipeline or args.temp_budget is not None):
+        parser.error("--probe-segments can not be combined with --pipeline or --temp-budget")
+
+    return args
+
+
+def parse_batch_arguments(argv: list):
+    """
+    Parses console arguments of the batch mode (unsilence batch ...)
+    :param argv: The arguments after "batch"
+    :return: List of Console Line Arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="unsilence batch",
+        description="Remove silence from many media files with one shared pool of ffmpeg processes",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument("inputs", nargs="+",
+                        help="Directories (their media files), glob patterns, manifests (.json/.jsonl with entries "
+                             "like {\"input\": ..., \"output\": ..., \"priority\": ...}) or files")
+    parser.add_argument("-o", "--output-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        required=True, help="Directory the processed files are saved to (with their input name)")
+    parser.add_argument("-ow", "--overwrite", action="store_true",
+                        help="Overwrite existing output files instead of skipping them")
+
+    add_effect_arguments(parser)
+
+    parser.add_argument("-t", "--threads", type=threads_or_auto, default="auto",
+                        help="Number of ffmpeg processes that run at the same time across all files, auto uses one "
+                             "per usable CPU")
+    parser.add_argument("-pf", "--parallel-files", type=number_bigger_than_zero, default=2,
+                        help="Number of files that are in progress at the same time")
+    parser.add_argument("-ft", "--ffmpeg-threads", type=number_bigger_than_zero, default=1,
+                        help="Number of threads of every ffmpeg process")
+    parser.add_argument("-e", "--engine", choices=["interval", "chunk"], default="interval",
+                        help="Render engine: one ffmpeg process per interval, or one filtergraph per thread chunk")
+    parser.add_argument("-mtd", "--max-task-duration", type=float, default=None,
+                        help="Split intervals longer than this (seconds) into multiple render tasks")
+
+    add_detection_arguments(parser)
+
+    parser.add_argument("-nc", "--no-cache", action="store_true",
+                        help="Bypass the detection cache (neither read nor write cached detection results)")
+    parser.add_argument("-cd", "--cache-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        default=None, help="Directory of the detection cache (default: user cache directory)")
+    parser.add_argument("-cs", "--cache-size", type=number_bigger_than_zero, default=64,
+                        help="Maximum size of the detection cache (MB)")
+    parser.add_argument("-sf", "--summary-file", type=convert_to_path(should_exist=False), default=None,
+                        help="Write a JSON summary with the throughput of every file to this file")
+    parser.add_argument("-d", "--debug", action="store_true",
+                        help="Enable debug output (StackTrace)")
+
+    return parser.parse_args(argv)
+
+
+def parse_serve_arguments(argv: list):
+    """
+    Parses console arguments of the server mode (unsilence serve ...)
+    :param argv: The arguments after "serve"
+    :return: List of Console Line Arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="unsilence serve",
+        description="Run a local job server that accepts detect, estimate and render jobs over HTTP",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument("-ho", "--host", default="127.0.0.1",
+                        help="Address the server binds to")
+    parser.add_argument("-p", "--port", type=int, default=8765,
+                        help="Port the server listens on")
+    parser.add_argument("-us", "--unix-socket", type=convert_to_path(should_exist=False), default=None,
+                        help="Listen on this Unix domain socket instead of host and port")
+    parser.add_argument("-sd", "--state-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        default=None,
+                        help="Directory of the job checkpoints and interrupted renders (default: user cache directory)")
+    parser.add_argument("-t", "--threads", type=threads_or_auto, default="auto",
+                        help="Number of ffmpeg processes that run at the same time across all jobs, auto uses one "
+                             "per usable CPU")
+    parser.add_argument("-pj", "--parallel-jobs", type=number_bigger_than_zero, default=2,
+                        help="Number of jobs that are in progress at the same time")
+    parser.add_argument("-nc", "--no-cache", action="store_true",
+                        help="Bypass the detection cache (neither read nor write cached detection results)")
+    parser.add_argument("-cd", "--cache-dir", type=convert_to_path(should_exist=False, should_parents_exist=False),
+                        default=None, help="Directory of the detection cache (default: user cache directory)")
+    parser.add_argument("-cs", "--cache-size", type=number_bigger_than_zero, default=64,
+                        help="Maximum size of the detection cache (MB)")
+    parser.add_argument("-d", "--debug", action="store_true",
+                        help="Enable debug output (StackTrace)")
+
+    return parser.parse_args(argv)
+
+
+def add_effect_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the arguments that change how the intervals are rendered
+    :param parser: The parser
+    :return: None
+    """
     parser.add_argument("-ao", "--audio-only", action="store_true",
                         help="Whether the output should not contain a video channel")
 
@@ -71,27 +284,35 @@ def parse_arguments():
     parser.add_argument("-dci", "--drop-corrupted-intervals", action="store_true",
                         help="Whether corrupted video intervals should be discarded or tried to recover")
     parser.add_argument("-ci", "--check-intervals", action="store_true",
-                        help="Actively checks for invalid intervals and drops them (Takes longer)")
+                        help="Drops intervals whose render is shorter than expected (ffmpeg reports the rendered "
+                             "duration, no extra processes are started)")
+    parser.add_argument("-ps", "--probe-segments", action="store_true",
+                        help="Opens the rendered intervals again before they are concatenated and drops the "
+                             "unreadable ones (one process per batch of intervals)")
+    parser.add_argument("-pt", "--passthrough", action="store_true",
+                        help="Stream copy intervals with a speed and volume of 1 instead of re-encoding them (cut "
+                             "points are snapped to keyframes)")
     parser.add_argument("-mid", "--minimum-interval-duration", type=float, default=0.25,
                         help="Minimum duration of an interval after speedup to ensure correct concatenation")
 
 
-    parser.add_argument("-t", "--threads", type=number_bigger_than_zero, default=2,
-                        help="Number of threads to be used while rendering")
+def add_detection_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the arguments of the silence detection
+    :param parser: The parser
+    :return: None
+    """
     parser.add_argument("-sl", "--silence-level", type=float, default=-35,
                         help="Minimum volume in decibel to be classified as audible")
     parser.add_argument("-stt", "--silence-time-threshold", type=float, default=0.5,
                         help="Resolution of the silence detection (seconds)")
+    parser.add_argument("-de", "--detection-engine", choices=["silencedetect", "numpy"], default="silencedetect",
+                        help="Silence detection engine: ffmpeg's silencedetect filter, or NumPy analysis of raw PCM")
+    parser.add_argument("-ds", "--detection-shards", type=threads_or_auto, default=1,
+                        help="Number of time shards the silencedetect engine analyzes in parallel (same result as a "
+                             "single shard), auto uses one shard per usable CPU")
     parser.add_argument("-sit", "--short-interval-threshold", type=float, default=0.3,
                         help="Intervals smaller than this value (seconds) get combined into a larger interval")
     parser.add_argument("-st", "--stretch-time", type=float, default=0.25,
                         help="Time (seconds) that should be added to audible intervals and removed from silent "
                              "intervals")
-
-    parser.add_argument("-y", "--non-interactive-mode", action="store_true",
-                        help="Always answers yes if a dialog would show up")
-
-    parser.add_argument("-d", "--debug", action="store_true",
-                        help="Enable debug output (StackTrace)")
-
-    return parser.parse_args()
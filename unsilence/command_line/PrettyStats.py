@@ -0,0 +1,44 @@
+from rich.table import Table
+
+
+def pretty_stats(summary: dict):
+    """
+    Generates a rich.table.Table object from a metrics summary (from lib.metrics.Metrics.Metrics.summary)
+    :param summary: Summary dict (from lib.metrics.Metrics.Metrics.summary)
+    :return: rich.table.Table object
+    """
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Stage")
+    table.add_column("Wall", justify="right")
+    table.add_column("Processes", justify="right")
+    table.add_column("Process Wall", justify="right")
+    table.add_column("CPU User+Sys", justify="right")
+    table.add_column("Peak RSS", justify="right")
+
+    for stage, values in summary["stages"].items():
+        table.add_row(f"[bold]{stage}[/bold]", f"{values['wall_time']:.2f}s", "", "", "", "")
+
+    for stage, values in summary["processes"].items():
+        failed = f" ([red]{values['failed']} failed[/red])" if values["failed"] > 0 else ""
+
+        table.add_row(
+            f"  {stage}",
+            "",
+            f"{values['count']}{failed}",
+            f"{values['wall_time']:.2f}s",
+            f"{values['user_time']:.2f}+{values['system_time']:.2f}s",
+            f"{values['max_rss'] / (1024 * 1024):.1f} MB"
+        )
+
+    tasks = summary["tasks"]
+    if tasks["count"] > 0:
+        utilization = summary["worker_utilization"]
+        utilization_text = f", worker utilization [cyan]{utilization * 100:.1f}%[/cyan]" if utilization is not None \
+            else ""
+
+        table.caption = (
+            f"{tasks['count']} render tasks, queue wait {tasks['queue_wait'] / tasks['count']:.2f}s average / "
+            f"{tasks['max_queue_wait']:.2f}s max{utilization_text}"
+        )
+
+    return table
@@ -15,13 +15,19 @@ def format_timedelta(seconds):
         return str(datetime.timedelta(seconds=seconds))
 
 
-def pretty_time_estimate(time_data: dict):
+def pretty_time_estimate(time_data: dict, render_estimate: dict = None, threads: int = None):
     """
     Generates a rich.table.Table object from the time_data dict (from lib.Intervals.TimeCalculations.calculate_time)
     :param time_data: time_data dict (from lib.Intervals.TimeCalculations.calculate_time)
+    :param render_estimate: Predicted render time, shown below the table (from
+        lib.render_media.RenderTimeEstimation.estimate_render_time, optional)
+    :param threads: The render thread count that will be used (default: the fastest of the render estimate)
     :return: rich.table.Table object
     """
     table = Table(show_header=True, header_style="bold magenta")
+
+    if render_estimate is not None:
+        table.caption = pretty_render_estimate(render_estimate, threads)
     table.add_column("Type")
     table.add_column("Before")
     table.add_column("After")
@@ -55,3 +61,25 @@ def pretty_time_estimate(time_data: dict):
     )
 
     return table
+
+
+def pretty_render_estimate(render_estimate: dict, threads: int = None):
+    """
+    Generates a one line summary of a render time prediction
+    :param render_estimate: Estimate dict (from lib.render_media.RenderTimeEstimation.estimate_render_time)
+    :param threads: The render thread count that will be used (default: the fastest)
+    :return: String representation
+    """
+    best_threads = render_estimate["best_threads"]
+    predictions = render_estimate["threads"]
+
+    if threads not in predictions:
+        threads = best_threads
+
+    summary = f"Predicted render time: [cyan]{format_timedelta(round(predictions[threads]))}[/cyan] with {threads} threads"
+
+    if threads != best_threads:
+        summary += (f" (fastest: {format_timedelta(round(predictions[best_threads]))} with {best_threads} threads, "
+                    f"use --best-threads)")
+
+    return summary
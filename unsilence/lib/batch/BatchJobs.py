@@ -0,0 +1,92 @@
+import glob
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+# Files with these suffixes are picked up from input directories, audio files are rendered audio only
+VIDEO_SUFFIXES = {".mp4", ".m4v", ".mov", ".mkv", ".avi", ".webm", ".flv", ".ts"}
+AUDIO_SUFFIXES = {".m4a", ".aac", ".mp3", ".flac", ".wav", ".ogg", ".opus", ".wma"}
+MEDIA_SUFFIXES = VIDEO_SUFFIXES | AUDIO_SUFFIXES
+
+
+def collect_jobs(sources: list, output_dir: Path):
+    """
+    Collects the files of a batch. A source is a directory (all media files in it, not recursive), a glob pattern,
+    a manifest (.json with a list of entries, or .jsonl with one entry per line) or a single file. A manifest entry is
+    a path or a dict with "input" and optionally "output" and "priority", relative paths are resolved against the
+    directory of the manifest
+    :param sources: List of sources (strings or Paths)
+    :param output_dir: Directory the outputs are saved to if a manifest entry does not name its output
+    :raises: **FileNotFoundError** -- If a source does not exist, **ValueError** -- If two jobs have the same output
+    :return: List of jobs (with input_file, output_file, priority and audio_only)
+    """
+    output_dir = Path(output_dir).absolute()
+    jobs = []
+
+    for source in sources:
+        source_path = Path(source)
+
+        if source_path.is_dir():
+            for input_file in sorted(source_path.iterdir()):
+                if input_file.is_file() and input_file.suffix.lower() in MEDIA_SUFFIXES:
+                    jobs.append(_job(input_file, None, 0, output_dir))
+        elif source_path.suffix.lower() in (".json", ".jsonl") and source_path.is_file():
+            for entry in _read_manifest(source_path):
+                if not isinstance(entry, dict):
+                    entry = {"input": entry}
+
+                input_file = source_path.parent / entry["input"]
+                output_file = source_path.parent / entry["output"] if entry.get("output", None) is not None else None
+                jobs.append(_job(input_file, output_file, int(entry.get("priority", 0)), output_dir))
+        elif source_path.exists():
+            jobs.append(_job(source_path, None, 0, output_dir))
+        elif glob.has_magic(str(source)):
+            for input_file in sorted(glob.glob(str(source), recursive=True)):
+                if Path(input_file).is_file():
+                    jobs.append(_job(Path(input_file), None, 0, output_dir))
+        else:
+            raise FileNotFoundError(f"Batch input {source} does not exist")
+
+    output_files = set()
+
+    for job in jobs:
+        if not job.input_file.exists():
+            raise FileNotFoundError(f"Input file {job.input_file} does not exist!")
+
+        if job.output_file in output_files:
+            raise ValueError(f"More than one batch input would be saved to {job.output_file}")
+
+        output_files.add(job.output_file)
+
+    return jobs
+
+
+def _job(input_file: Path, output_file: Path, priority: int, output_dir: Path):
+    """
+    Creates a batch job
+    :param input_file: The file that should be processed
+    :param output_file: Where the processed file should be saved, None: output_dir / the name of input_file
+    :param priority: Priority of the job, the processes of higher priority jobs get free CPUs first
+    :param output_dir: Default directory of the output
+    :return: The job
+    """
+    input_file = Path(input_file).absolute()
+
+    if output_file is None:
+        output_file = output_dir / input_file.name
+
+    return SimpleNamespace(input_file=input_file, output_file=Path(output_file).absolute(), priority=priority,
+                           audio_only=input_file.suffix.lower() in AUDIO_SUFFIXES)
+
+
+def _read_manifest(manifest_file: Path):
+    """
+    Reads the entries of a manifest
+    :param manifest_file: .json (list of entries) or .jsonl (one entry per line) file
+    :return: List of entries
+    """
+    with open(manifest_file, "r") as file:
+        if manifest_file.suffix.lower() == ".jsonl":
+            return [json.loads(line) for line in file if line.strip()]
+
+        return json.load(file)
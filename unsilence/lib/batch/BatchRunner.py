@@ -0,0 +1,167 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from unsilence.Unsilence import Unsilence
+from unsilence.lib.batch.ProcessSlots import ProcessSlots
+from unsilence.lib.metrics.Metrics import Metrics
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+
+
+class BatchRunner:
+    """
+    Processes many files with one global scheduler: every ffmpeg process of every file (detection, interval renders
+    and concats) takes a slot of a shared lib.batch.ProcessSlots.ProcessSlots, and several files are in progress at the
+    same time, so the detection and concat phases of one file are filled up with the interval renders of others and
+    all CPUs stay busy. Free slots go to the processes of the file with the highest priority first
+    """
+
+    def __init__(self, temp_dir: Path = Path(".tmp"), process_slots: ProcessSlots = None, parallel_files: int = 2):
+        """
+        Initializes a new BatchRunner
+        :param temp_dir: The temp dir where the temporary files of all jobs are saved
+        :param process_slots: The global process limit (default: one slot per usable CPU)
+        :param parallel_files: How many files are in progress at the same time
+        """
+        if process_slots is None:
+            process_slots = ProcessSlots(usable_cpu_count())
+
+        self.__temp_dir = Path(temp_dir)
+        self.__process_slots = process_slots
+        self.__parallel_files = max(1, parallel_files)
+
+    def run(self, jobs: list, detection_options: dict = None, render_options: dict = None, **kwargs):
+        """
+        Processes the jobs, files with a higher priority are started first
+        :param jobs: List of jobs with input_file, output_file, priority and audio_only (see
+            lib.batch.BatchJobs.collect_jobs), audio_only jobs are always rendered audio only
+        :param detection_options: Keyword arguments passed to Unsilence.detect_silence of every file
+        :param render_options: Keyword arguments passed to Unsilence.render_media of every file, threads defaults to
+            the number of process slots, ffmpeg_threads and filter_threads to 1 (every slot is one CPU)
+        :param kwargs: Keyword Args, see below
+        :return: Summary dict with "files" (one result per job, in the order of jobs) and "total"
+
+        kwargs:
+            overwrite: Whether existing output files should be overwritten, they are skipped otherwise (default False)
+            on_job_finished: Function that is called with the result dict of every finished, failed or skipped job
+        """
+        detection_options = dict(detection_options or {})
+        job_render_options = {
+            "threads": self.__process_slots.capacity,
+            "ffmpeg_threads": 1,
+            "filter_threads": 1
+        }
+        job_render_options.update(render_options or {})
+
+        ordered_jobs = sorted(enumerate(jobs), key=lambda x: -x[1].priority)
+        results = [None] * len(jobs)
+
+        start_time = time.perf_counter()
+        start_busy_time = self.__process_slots.busy_time()
+
+        with ThreadPoolExecutor(max_workers=self.__parallel_files) as executor:
+            futures = {
+                index: executor.submit(self.__run_job, job, detection_options, job_render_options, kwargs)
+                for index, job in ordered_jobs
+            }
+
+            for index, future in futures.items():
+                results[index] = future.result()
+
+        wall_time = time.perf_counter() - start_time
+        busy_time = self.__process_slots.busy_time() - start_busy_time
+        finished = [result for result in results if result["status"] == "finished"]
+        media_duration = sum(result["media_duration"] for result in finished)
+
+        return {
+            "files": results,
+            "total": {
+                "files": len(results),
+                "finished": len(finished),
+                "failed": sum(result["status"] == "failed" for result in results),
+                "skipped": sum(result["status"] == "skipped" for result in results),
+                "wall_time": wall_time,
+                "media_duration": media_duration,
+                "speed": media_duration / wall_time if wall_time > 0 else None,
+                "process_slots": self.__process_slots.capacity,
+                "slot_utilization": busy_time / (wall_time * self.__process_slots.capacity) if wall_time > 0 else None
+            }
+        }
+
+    def __run_job(self, job, detection_options: dict, render_options: dict, kwargs: dict):
+        """
+        Detects the silence of a file and renders it
+        :param job: The job
+        :param detection_options: Keyword arguments passed to Unsilence.detect_silence
+        :param render_options: Keyword arguments passed to Unsilence.render_media
+        :param kwargs: Keyword args of run()
+        :return: Result dict of the job
+        """
+        result = {
+            "input": str(job.input_file),
+            "output": str(job.output_file),
+            "priority": job.priority,
+            "status": "finished",
+            "error": None,
+            "media_duration": None,
+            "output_duration": None,
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            "speed": None,
+            "stages": {}
+        }
+
+        if job.output_file.exists() and not kwargs.get("overwrite", False):
+            result["status"] = "skipped"
+            return self.__finish_job(result, kwargs)
+
+        metrics = Metrics(process_slots=self.__process_slots, priority=job.priority)
+        continual = None
+        start_time = time.perf_counter()
+
+        try:
+            continual = Unsilence(job.input_file, temp_dir=self.__temp_dir / f"job_{uuid.uuid4()}", metrics=metrics)
+            continual.detect_silence(**detection_options)
+
+            job.output_file.parent.mkdir(parents=True, exist_ok=True)
+            continual.render_media(job.output_file, **dict(render_options, audio_only=(
+                job.audio_only or render_options.get("audio_only", False)
+            )))
+
+            time_data = continual.estimate_time(render_options.get("audible_speed", 1),
+                                                render_options.get("silent_speed", 6))
+            result["media_duration"] = time_data["before"]["all"][0]
+            result["output_duration"] = time_data["after"]["all"][0]
+        except Exception as error:
+            result["status"] = "failed"
+            result["error"] = str(error) or type(error).__name__
+        finally:
+            if continual is not None:
+                continual.cleanup()
+
+        result["wall_time"] = time.perf_counter() - start_time
+
+        summary = metrics.summary()
+        result["cpu_time"] = sum(values["user_time"] + values["system_time"]
+                                 for values in summary["processes"].values())
+        result["stages"] = {name: values["wall_time"] for name, values in summary["stages"].items()}
+
+        if result["media_duration"] is not None and result["wall_time"] > 0:
+            result["speed"] = result["media_duration"] / result["wall_time"]
+
+        return self.__finish_job(result, kwargs)
+
+    @staticmethod
+    def __finish_job(result: dict, kwargs: dict):
+        """
+        Reports a result to on_job_finished
+        :param result: Result dict of the job
+        :param kwargs: Keyword args of run()
+        :return: The result dict
+        """
+        func = kwargs.get("on_job_finished", None)
+        if func is not None:
+            func(result)
+
+        return result
@@ -0,0 +1,90 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ProcessSlots:
+    """
+    Global limit of concurrently running ffmpeg processes, shared by all jobs of a batch. A process takes a slot before
+    it starts and returns it when it exits, waiting processes get free slots by priority (highest first) and in arrival
+    order within a priority. Jobs use the slots through their lib.metrics.Metrics.Metrics (see process_slots there)
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initializes new ProcessSlots
+        :param capacity: Number of processes that may run at the same time (e.g. the number of usable CPUs)
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be larger than 0")
+
+        self.capacity = capacity
+        self.__condition = threading.Condition()
+        self.__running = 0
+        self.__waiting = []
+        self.__sequence = itertools.count()
+        self.__busy_time = 0.0
+        self.__last_change = time.perf_counter()
+
+    @contextmanager
+    def slot(self, priority: int = 0):
+        """
+        Context manager that holds a slot
+        :param priority: Priority of the process, higher priorities get a free slot first
+        :return: None
+        """
+        self.acquire(priority)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority: int = 0):
+        """
+        Waits for a free slot and takes it
+        :param priority: Priority of the process, higher priorities get a free slot first
+        :return: None
+        """
+        with self.__condition:
+            entry = (-priority, next(self.__sequence))
+            heapq.heappush(self.__waiting, entry)
+
+            self.__condition.wait_for(lambda: self.__running < self.capacity and self.__waiting[0] == entry)
+
+            heapq.heappop(self.__waiting)
+            self.__update_busy_time()
+            self.__running += 1
+
+            # The next waiter may fit into a remaining slot
+            self.__condition.notify_all()
+
+    def release(self):
+        """
+        Returns a slot
+        :return: None
+        """
+        with self.__condition:
+            self.__update_busy_time()
+            self.__running -= 1
+            self.__condition.notify_all()
+
+    def busy_time(self):
+        """
+        Returns the summed up time the slots were taken, divided by capacity and wall time it is the utilization
+        :return: Slot seconds
+        """
+        with self.__condition:
+            self.__update_busy_time()
+            return self.__busy_time
+
+    def __update_busy_time(self):
+        """
+        Adds the slot time since the last change of the running processes (call with the condition held)
+        :return: None
+        """
+        now = time.perf_counter()
+        self.__busy_time += self.__running * (now - self.__last_change)
+        self.__last_change = now
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import uuid
+from pathlib import Path
+
+from unsilence.lib.cache.FileCache import FileCache, default_cache_dir, link_or_copy
+from unsilence.lib.tools.fingerprint import file_fingerprint
+from unsilence.lib.tools.process import run_process
+
+
+class AudioProxyCache(FileCache):
+    """
+    Cache of audio proxies: the first audio stream of an input decoded once into a PCM WAV file. WAV can be seeked
+    without demuxing or decoding, so the silence detection and audio only renders read the proxy instead of the
+    (possibly large video) input. A proxy is keyed by the input fingerprint and reused by every job on the same input
+    """
+
+    # Increase when the extraction command changes in a way that changes the proxy
+    PROXY_SETTINGS = "pcm_s16le,rf64,aresample=async=1:first_pts=0,v1"
+
+    def __init__(self, cache_dir: Path = None, max_size: int = 8 * 1024 * 1024 * 1024):
+        """
+        Initializes a new AudioProxyCache
+        :param cache_dir: Directory where the entries are stored (default: <user cache dir>/unsilence/audio_proxies)
+        :param max_size: Maximum size of all entries (in bytes)
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "audio_proxies"
+
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def key(input_file: Path):
+        """
+        Generates the cache key of the proxy of a file
+        :param input_file: The input file
+        :return: Cache key
+        """
+        key_source = json.dumps({
+            "file": file_fingerprint(input_file),
+            "settings": AudioProxyCache.PROXY_SETTINGS
+        }, sort_keys=True)
+
+        return hashlib.sha1(key_source.encode()).hexdigest()
+
+    def fetch(self, input_file: Path, destination: Path, metrics=None):
+        """
+        Places the proxy of a file at destination (by hard link or copy), the proxy is extracted first if it is not
+        cached yet. The placed file stays usable when the cache entry is evicted by another job
+        :param input_file: The input file
+        :param destination: Where the proxy should be placed, an existing file is replaced
+        :param metrics: lib.metrics.Metrics.Metrics that records the extracting ffmpeg process (optional)
+        :raises: **IOError** -- If ffmpeg could not extract the audio (e.g. the file has no audio stream)
+        :return: None
+        """
+        input_file = Path(input_file).absolute()
+        key = AudioProxyCache.key(input_file)
+
+        try:
+            destination.unlink()
+        except FileNotFoundError:
+            pass
+
+        path = self.lookup(key, ".wav")
+
+        if path is not None:
+            try:
+                link_or_copy(path, destination)
+                return
+            except FileNotFoundError:
+                # The entry was evicted in the meantime
+                pass
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_file = self.cache_dir / f".{uuid.uuid4()}.wav"
+
+        command = [
+            "ffmpeg",
+            "-y",
+            "-i", str(input_file),
+            "-vn",
+            "-map", "0:a:0",
+            # Pads a delayed audio start, so that the proxy has the same timeline as the input
+            "-af", "aresample=async=1:first_pts=0",
+            "-c:a", "pcm_s16le",
+            "-rf64", "auto",
+            str(temp_file)
+        ]
+
+        if run_process(command, metrics, "audio_proxy").returncode != 0:
+            try:
+                temp_file.unlink()
+            except FileNotFoundError:
+                pass
+
+            raise IOError(f"Could not extract the audio of {input_file}")
+
+        path = self.store(key, temp_file, ".wav", move=True)
+        link_or_copy(path, destination)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from unsilence.lib.cache.FileCache import FileCache, default_cache_dir
+from unsilence.lib.detect_silence.DetectSilence import detection_shard_count
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.tools.fingerprint import file_fingerprint
+
+
+class DetectionCache(FileCache):
+    """
+    Persistent cache of raw (not yet optimized) silence detection results, keyed by a fingerprint of the input file
+    and the detection parameters. Optionally the most recently used entries are also kept in memory, so a long running
+    process (e.g. the job server) does not re-read and re-parse them
+    """
+
+    DETECTION_OPTIONS = [
+        "silence_level", "silence_time_threshold", "detection_engine",
+        "window_size", "hop_size", "sample_rate", "sample_format", "level_mode"
+    ]
+
+    def __init__(self, cache_dir: Path = None, max_size: int = 64 * 1024 * 1024, memory_entries: int = 0):
+        """
+        Initializes a new DetectionCache
+        :param cache_dir: Directory where the entries are stored (default: <user cache dir>/unsilence/detection)
+        :param max_size: Maximum size of all entries (in bytes)
+        :param memory_entries: Number of entries that are additionally kept in memory (default 0: none)
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "detection"
+
+        super().__init__(cache_dir, max_size)
+
+        self.__memory_entries = memory_entries
+        self.__memory = OrderedDict()
+        self.__memory_lock = threading.Lock()
+
+    def key(self, input_file: Path, **kwargs):
+        """
+        Generates the cache key for a file and detection parameters
+        :param input_file: File where silence should be detected
+        :param kwargs: Detection parameters, see lib.detect_silence.DetectSilence.detect_silence
+        :return: Cache key
+        """
+        options = {
+            "silence_level": kwargs.get("silence_level", -35),
+            "silence_time_threshold": kwargs.get("silence_time_threshold", 0.5),
+            "detection_engine": kwargs.get("detection_engine", "silencedetect"),
+        }
+        options.update({key: kwargs[key] for key in DetectionCache.DETECTION_OPTIONS if key in kwargs})
+
+        detection_shards = detection_shard_count(kwargs.get("detection_shards", 1))
+
+        # Sharded silencedetect results of compressed audio can differ slightly from a single run (see
+        # lib.detect_silence.ShardedSilenceDetection.SHARD_TOLERANCE). Single shard keys stay the same as before
+        if options["detection_engine"] == "silencedetect" and detection_shards > 1:
+            options["detection_shards"] = detection_shards
+
+        if kwargs.get("audio_proxy", None) is not None:
+            options["audio_proxy"] = True
+
+        key_source = json.dumps({"file": file_fingerprint(input_file), "options": options}, sort_keys=True)
+        return hashlib.sha1(key_source.encode()).hexdigest()
+
+    def load(self, key: str):
+        """
+        Loads the raw intervals of a cache entry
+        :param key: Cache key (see key())
+        :return: Intervals or None if there is no (valid) entry for the key
+        """
+        with self.__memory_lock:
+            if key in self.__memory:
+                self.__memory.move_to_end(key)
+                # The caller optimizes the intervals in place, the kept entry must stay raw
+                return self.__memory[key].copy()
+
+        path = self.lookup(key, ".json")
+        if path is None:
+            return None
+
+        try:
+            with open(path, "r") as file:
+                intervals = Intervals.deserialize(json.load(file))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        self.__remember(key, intervals)
+        return intervals
+
+    def save(self, key: str, intervals: Intervals):
+        """
+        Saves raw intervals as the cache entry for a key
+        :param key: Cache key (see key())
+        :param intervals: The raw (not yet optimized) intervals
+        :return: None
+        """
+        self.store_bytes(key, json.dumps(intervals.serialize()).encode(), ".json")
+        self.__remember(key, intervals)
+
+    def __remember(self, key: str, intervals: Intervals):
+        """
+        Keeps a copy of raw intervals in memory, the least recently used entry is dropped if there are too many
+        :param key: Cache key
+        :param intervals: The raw intervals
+        :return: None
+        """
+        if self.__memory_entries <= 0:
+            return
+
+        with self.__memory_lock:
+            self.__memory[key] = intervals.copy()
+            self.__memory.move_to_end(key)
+
+            while len(self.__memory) > self.__memory_entries:
+                self.__memory.popitem(last=False)
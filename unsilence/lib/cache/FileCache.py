@@ -0,0 +1,176 @@
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+
+def default_cache_dir():
+    """
+    Returns the default base directory for unsilence caches ($XDG_CACHE_HOME/unsilence or ~/.cache/unsilence)
+    :return: Path of the cache directory
+    """
+    base = os.environ.get("XDG_CACHE_HOME")
+    if base:
+        return Path(base) / "unsilence"
+
+    return Path.home() / ".cache" / "unsilence"
+
+
+def link_or_copy(source: Path, destination: Path):
+    """
+    Hard links a file to a new path, or copies it if hard links are not possible (e.g. across file systems)
+    :param source: The existing file
+    :param destination: The new path (must not exist)
+    :return: None
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class FileCache:
+    """
+    A directory of cache entries (one file per key) with a size cap and least recently used eviction. The
+    modification time of an entry is its last use, it is updated on every hit
+    """
+
+    def __init__(self, cache_dir: Path, max_size: int):
+        """
+        Initializes a new FileCache
+        :param cache_dir: Directory where the entries are stored
+        :param max_size: Maximum size of all entries (in bytes)
+        """
+        self.__cache_dir = Path(cache_dir)
+        self.__max_size = max_size
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory where the entries are stored
+        :return: Path of the cache directory
+        """
+        return self.__cache_dir
+
+    def entry_path(self, key: str, suffix: str = ""):
+        """
+        Returns the path of the entry for a key (the entry does not need to exist)
+        :param key: The key of the entry
+        :param suffix: File suffix of the entry
+        :return: Path of the entry
+        """
+        return self.__cache_dir / f"{key}{suffix}"
+
+    def lookup(self, key: str, suffix: str = ""):
+        """
+        Looks up an entry and marks it as recently used
+        :param key: The key of the entry
+        :param suffix: File suffix of the entry
+        :return: Path of the entry or None if there is no entry for the key
+        """
+        path = self.entry_path(key, suffix)
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def store(self, key: str, source: Path, suffix: str = "", move: bool = False, link: bool = False):
+        """
+        Stores a file as the entry for a key and evicts the least recently used entries if the cache is too large
+        :param key: The key of the entry
+        :param source: The file that should be stored
+        :param suffix: File suffix of the entry
+        :param move: Whether the source file should be moved into the cache instead of copied
+        :param link: Whether the source file should be hard linked into the cache instead of copied (falls back to a
+            copy), the source must not be modified afterwards
+        :return: Path of the entry
+        """
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+
+        path = self.entry_path(key, suffix)
+        temp_path = self.__cache_dir / f".{uuid.uuid4()}.tmp"
+
+        if move:
+            shutil.move(str(source), str(temp_path))
+        elif link:
+            link_or_copy(source, temp_path)
+        else:
+            shutil.copyfile(source, temp_path)
+
+        os.replace(temp_path, path)
+
+        self.evict(keep=path)
+        return path
+
+    def store_bytes(self, key: str, data: bytes, suffix: str = ""):
+        """
+        Stores data as the entry for a key and evicts the least recently used entries if the cache is too large
+        :param key: The key of the entry
+        :param data: The data that should be stored
+        :param suffix: File suffix of the entry
+        :return: Path of the entry
+        """
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+
+        path = self.entry_path(key, suffix)
+        temp_path = self.__cache_dir / f".{uuid.uuid4()}.tmp"
+
+        with open(temp_path, "wb") as file:
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path = None):
+        """
+        Deletes the least recently used entries until the cache fits into its size cap
+        :param keep: An entry that should not be deleted
+        :return: None
+        """
+        entries = []
+        total_size = 0
+
+        for path in self.__cache_dir.glob("*"):
+            if path.name.startswith(".") or not path.is_file():
+                continue
+
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.__max_size:
+                break
+
+            if path == keep:
+                continue
+
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+
+    def size(self):
+        """
+        Returns the size of all entries
+        :return: Size in bytes
+        """
+        if not self.__cache_dir.exists():
+            return 0
+
+        return sum(path.stat().st_size for path in self.__cache_dir.glob("*") if path.is_file())
+
+    def clear(self):
+        """
+        Deletes all entries
+        :return: None
+        """
+        if self.__cache_dir.exists():
+            shutil.rmtree(self.__cache_dir)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.cache.FileCache import FileCache, default_cache_dir, link_or_copy
+from unsilence.lib.render_media.TaskScheduling import interval_speed
+
+
+class SegmentCache(FileCache):
+    """
+    Content addressed cache of rendered segments. A segment is keyed by the input fingerprint and everything that
+    influences its encoded output, so a render with changed options only re-encodes the segments that changed
+    """
+
+    # Increase when the ffmpeg commands of the render threads change in a way that changes the output
+    ENCODER_SETTINGS = "vsync=1,async=1,setpts/atempo chain/volume/apad,exact duration,v2"
+
+    def __init__(self, cache_dir: Path = None, max_size: int = 2 * 1024 * 1024 * 1024):
+        """
+        Initializes a new SegmentCache
+        :param cache_dir: Directory where the entries are stored (default: <user cache dir>/unsilence/segments)
+        :param max_size: Maximum size of all entries (in bytes)
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "segments"
+
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def key(input_fingerprint: str, task: SimpleNamespace, render_options: SimpleNamespace, suffix: str):
+        """
+        Generates the cache key of a render task. The key describes the filtered render, segments of the unfiltered
+        fallback for a failed filter (task.unfiltered) must not be saved under it
+        :param input_fingerprint: Fingerprint of the input file (see lib.tools.fingerprint.file_fingerprint)
+        :param task: The render task (an interval task or a chunk task with task.intervals)
+        :param render_options: The render options (see MediaRenderer.render)
+        :param suffix: File suffix of the output
+        :return: Cache key
+        """
+        parts = []
+
+        for interval in getattr(task, "intervals", [task.interval]):
+            parts.append([
+                round(interval.start, 6),
+                round(interval.end, 6),
+                bool(interval.is_silent),
+                round(interval_speed(interval, render_options), 4),
+                render_options.silent_volume if interval.is_silent else render_options.audible_volume
+            ])
+
+        key_parts = {
+            "file": input_fingerprint,
+            "kind": "chunk" if hasattr(task, "intervals") else "interval",
+            "parts": parts,
+            "stream_copy": bool(getattr(task, "stream_copy", False)),
+            "audio_only": bool(render_options.audio_only),
+            "suffix": suffix,
+            "encoder": SegmentCache.ENCODER_SETTINGS
+        }
+
+        # Segments cut from an audio proxy are encoded from different samples (16 bit PCM instead of the source codec)
+        if getattr(render_options, "audio_proxy", False):
+            key_parts["audio_proxy"] = True
+
+        key_source = json.dumps(key_parts, sort_keys=True)
+
+        return hashlib.sha1(key_source.encode()).hexdigest()
+
+    def fetch(self, key: str, destination: Path, suffix: str):
+        """
+        Places the cached segment of a key at destination (by hard link or copy)
+        :param key: Cache key (see key())
+        :param destination: Where the segment should be placed, an existing file is replaced
+        :param suffix: File suffix of the entry
+        :return: Whether there was an entry for the key
+        """
+        path = self.lookup(key, suffix)
+        if path is None:
+            return False
+
+        try:
+            destination.unlink()
+        except FileNotFoundError:
+            pass
+
+        try:
+            link_or_copy(path, destination)
+        except FileNotFoundError:
+            # The entry was evicted in the meantime
+            return False
+
+        return True
+
+    def save(self, key: str, segment_file: Path, suffix: str):
+        """
+        Saves a rendered segment as the entry for a key (by hard link or copy)
+        :param key: Cache key (see key())
+        :param segment_file: The rendered segment, it must not be modified afterwards
+        :param suffix: File suffix of the entry
+        :return: None
+        """
+        self.store(key, segment_file, suffix, link=True)
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from unsilence.lib.detect_silence.DetectSilence import intervals_from_events, parse_silencedetect_line, \
+    silencedetect_command
+from unsilence.lib.tools.async_process import run_process_async
+
+
+async def detect_silence_async(input_file: Path, **kwargs):
+    """
+    asyncio version of lib.detect_silence.DetectSilence.detect_silence (silencedetect engine): the ffmpeg process is
+    started with asyncio.create_subprocess_exec and killed if the awaiting task is cancelled
+    :param input_file: File where silence should be detected
+    :param kwargs: Various Parameters, see below
+    :return: lib.Intervals.Intervals object
+
+    kwargs:
+        silence_level, silence_time_threshold, short_interval_threshold, stretch_time, audio_proxy, detection_cache,
+            metrics, on_silence_detect_progress_update: see lib.detect_silence.DetectSilence.detect_silence
+        process_limit: asyncio.Semaphore that limits the concurrently running ffmpeg processes (default None)
+    """
+    input_file = Path(input_file).absolute()
+
+    if not input_file.exists():
+        raise FileNotFoundError(f"Input file {input_file} does not exist!")
+
+    if kwargs.get("detection_engine", "silencedetect") != "silencedetect":
+        raise ValueError("The asyncio detection only supports the silencedetect engine")
+
+    progress_update = kwargs.get("on_silence_detect_progress_update", None)
+    detection_cache = kwargs.get("detection_cache", None)
+    intervals = None
+
+    if detection_cache is not None:
+        cache_key = detection_cache.key(input_file, **kwargs)
+        intervals = detection_cache.load(cache_key)
+
+    if intervals is None:
+        events = []
+        media_duration = [None]
+
+        def handle_line(line):
+            """
+            Nested function that collects the events of the console output and reports the progress
+            :param line: A line of the console output
+            :return: None
+            """
+            event = parse_silencedetect_line(line)
+
+            if event is None:
+                return
+
+            events.append(event)
+
+            if event[0] == "duration":
+                media_duration[0] = event[1]
+            elif progress_update is not None:
+                progress_update(event[1], media_duration[0])
+
+        command = silencedetect_command(
+            kwargs.get("audio_proxy", None) or input_file,
+            kwargs.get("silence_level", -35),
+            kwargs.get("silence_time_threshold", 0.5)
+        )
+
+        await run_process_async(command, kwargs.get("metrics", None), "silencedetect",
+                                kwargs.get("process_limit", None), on_line=handle_line)
+
+        intervals = intervals_from_events(events)
+
+        if detection_cache is not None:
+            detection_cache.save(cache_key, intervals)
+
+    if progress_update is not None and len(intervals.intervals) > 0:
+        progress_update(intervals.intervals[-1].end, intervals.intervals[-1].end)
+
+    intervals.optimize(
+        kwargs.get('short_interval_threshold', 0.3),
+        kwargs.get('stretch_time', 0.25)
+    )
+
+    return intervals
@@ -1,8 +1,16 @@
 import re
 import subprocess
+import time
 from pathlib import Path
 
+from unsilence.lib.detect_silence.PcmSilenceDetection import pcm_silence_events
+from unsilence.lib.detect_silence.ShardedSilenceDetection import sharded_silencedetect_events
 from unsilence.lib.intervals.Intervals import Intervals, Interval
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+from unsilence.lib.tools.ffmpeg_output import parse_duration
+from unsilence.lib.tools.process import process_slot, wait_process
+
+DETECTION_ENGINES = ("silencedetect", "numpy")
 
 
 def detect_silence(input_file: Path, **kwargs):
@@ -17,6 +25,17 @@ def detect_silence(input_file: Path, **kwargs):
         silence_time_threshold: Resolution of the ffmpeg detection algorithm (default 0.5) (in seconds)
         short_interval_threshold : The shortest allowed interval length (default: 0.3) (in seconds)
         stretch_time: Time the interval should be enlarged/shrunken (default 0.25) (in seconds)
+        detection_engine: "silencedetect" parses the output of ffmpeg's silencedetect filter, "numpy" analyzes raw
+            PCM samples with NumPy (default "silencedetect")
+        detection_shards: Number of time shards the silencedetect engine analyzes concurrently, the result is the
+            same as with a single shard, "auto" uses one shard per usable CPU (default 1)
+        window_size, hop_size, sample_rate, sample_format, level_mode: Options of the numpy detection engine,
+            see lib.detect_silence.PcmSilenceDetection.pcm_silence_events
+        audio_proxy: PCM WAV file with the audio of input_file (see lib.cache.AudioProxyCache.AudioProxyCache), the
+            detection reads it instead of input_file (default None)
+        detection_cache: lib.cache.DetectionCache.DetectionCache that stores the raw detection results, on a cache
+            hit ffmpeg is not run at all (default None)
+        metrics: lib.metrics.Metrics.Metrics that records the spawned ffmpeg process (default None)
         on_silence_detect_progress_update: Function that should be called on progress update
             (called like: func(current, total))
     """
@@ -25,70 +44,266 @@ def detect_silence(input_file: Path, **kwargs):
     if not input_file.exists():
         raise FileNotFoundError(f"Input file {input_file} does not exist!")
 
-    silent_detect_progress_update = kwargs.get("on_silence_detect_progress_update", None)
+    detection_cache = kwargs.get("detection_cache", None)
+    intervals = None
+
+    if detection_cache is not None:
+        cache_key = detection_cache.key(input_file, **kwargs)
+        intervals = detection_cache.load(cache_key)
+
+    if intervals is None:
+        events = detection_events(kwargs.get("audio_proxy", None) or input_file, **kwargs)
+        intervals = intervals_from_events(events, kwargs.get("on_silence_detect_progress_update", None))
+
+        if detection_cache is not None:
+            detection_cache.save(cache_key, intervals)
+    else:
+        _report_cached_progress(intervals, kwargs.get("on_silence_detect_progress_update", None))
+
+    intervals.optimize(
+        kwargs.get('short_interval_threshold', 0.3),
+        kwargs.get('stretch_time', 0.25)
+    )
+
+    return intervals
+
+
+def detect_silence_iter(input_file: Path, **kwargs):
+    """
+    Streaming version of detect_silence: Yields every optimized Interval as soon as its boundaries are final, so that
+    the intervals can be processed while the detection is still running
+    :param input_file: File where silence should be detected
+    :param kwargs: Various Parameters, see detect_silence
+    :return: Generator of lib.Intervals.Interval objects
+    """
+    input_file = Path(input_file).absolute()
+
+    if not input_file.exists():
+        raise FileNotFoundError(f"Input file {input_file} does not exist!")
+
+    detection_cache = kwargs.get("detection_cache", None)
+    cached_intervals = None
+
+    if detection_cache is not None:
+        cache_key = detection_cache.key(input_file, **kwargs)
+        cached_intervals = detection_cache.load(cache_key)
+
+    if cached_intervals is not None:
+        _report_cached_progress(cached_intervals, kwargs.get("on_silence_detect_progress_update", None))
+        raw_interval_stream = iter(cached_intervals.intervals)
+    else:
+        events = detection_events(kwargs.get("audio_proxy", None) or input_file, **kwargs)
+        raw_interval_stream = interval_stream_from_events(events, kwargs.get("on_silence_detect_progress_update", None))
+
+        if detection_cache is not None:
+            raw_interval_stream = _record_for_cache(raw_interval_stream, detection_cache, cache_key)
+
+    yield from Intervals.optimize_iter(
+        raw_interval_stream,
+        kwargs.get('short_interval_threshold', 0.3),
+        kwargs.get('stretch_time', 0.25)
+    )
+
+
+def _record_for_cache(raw_interval_stream, detection_cache, cache_key: str):
+    """
+    Passes raw intervals through and saves copies of them to the detection cache once the stream is complete
+    :param raw_interval_stream: Generator of raw intervals
+    :param detection_cache: lib.cache.DetectionCache.DetectionCache
+    :param cache_key: Cache key of the detection
+    :return: Generator of raw intervals
+    """
+    recorded_intervals = Intervals()
+
+    for interval in raw_interval_stream:
+        recorded_intervals.add_interval(interval.copy())
+        yield interval
+
+    detection_cache.save(cache_key, recorded_intervals)
+
+
+def _report_cached_progress(intervals: Intervals, silent_detect_progress_update):
+    """
+    Reports a finished detection to the progress function when the intervals come from the cache
+    :param intervals: The cached raw intervals
+    :param silent_detect_progress_update: Function that should be called on progress update
+    :return: None
+    """
+    if silent_detect_progress_update is not None and len(intervals.intervals) > 0:
+        media_duration = intervals.intervals[-1].end
+        silent_detect_progress_update(media_duration, media_duration)
+
+
+def detection_events(input_file: Path, **kwargs):
+    """
+    Starts the detection engine selected in the kwargs
+    :param input_file: File where silence should be detected
+    :param kwargs: Various Parameters, see detect_silence
+    :return: Generator of (event, time) tuples, event is one of "duration", "start", "end"
+    """
+    silence_level = kwargs.get("silence_level", -35)
+    silence_time_threshold = kwargs.get("silence_time_threshold", 0.5)
+    detection_engine = kwargs.get("detection_engine", "silencedetect")
+    detection_shards = detection_shard_count(kwargs.get("detection_shards", 1))
+    metrics = kwargs.get("metrics", None)
+
+    if detection_engine == "silencedetect" and detection_shards > 1:
+        return sharded_silencedetect_events(input_file, silence_level, silence_time_threshold, detection_shards, metrics)
+    elif detection_engine == "silencedetect":
+        return silencedetect_events(input_file, silence_level, silence_time_threshold, metrics)
+    elif detection_engine == "numpy":
+        pcm_options = {
+            key: kwargs[key] for key in ["window_size", "hop_size", "sample_rate", "sample_format", "level_mode"]
+            if key in kwargs
+        }
+        return pcm_silence_events(input_file, silence_level, silence_time_threshold, metrics=metrics, **pcm_options)
+    else:
+        raise ValueError(f"Unknown detection engine {detection_engine}, choose one of {', '.join(DETECTION_ENGINES)}")
+
 
-    command = [
-        "ffmpeg",
+def detection_shard_count(detection_shards):
+    """
+    Resolves the detection_shards option to a number of shards
+    :param detection_shards: Number of shards or "auto" (one shard per usable CPU)
+    :return: Number of shards (at least 1)
+    """
+    if detection_shards == "auto":
+        return usable_cpu_count()
+
+    return max(1, int(detection_shards))
+
+
+def silencedetect_events(input_file: Path, silence_level: float, silence_time_threshold: float, metrics=None,
+                         start: float = None, duration: float = None):
+    """
+    Runs ffmpeg's silencedetect filter on a file and yields the detected events
+    :param input_file: File where silence should be detected
+    :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+    :param silence_time_threshold: Resolution of the ffmpeg detection algorithm (in seconds)
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+    :param start: Only analyze the file from this time on (in seconds), the reported times are relative to it
+    :param duration: Only analyze this much of the file (in seconds)
+    :return: Generator of (event, time) tuples, event is one of "duration", "start", "end"
+    """
+    command = silencedetect_command(input_file, silence_level, silence_time_threshold, start, duration)
+
+    with process_slot(metrics):
+        start_time = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True
+        )
+        console_output = process.stdout
+
+        for line in console_output:
+            event = parse_silencedetect_line(line)
+
+            if event is not None:
+                yield event
+
+        console_output.close()
+        wait_process(process, start_time, metrics, "silencedetect")
+
+
+def silencedetect_command(input_file: Path, silence_level: float, silence_time_threshold: float, start: float = None,
+                          duration: float = None):
+    """
+    Generates the ffmpeg command that runs the silencedetect filter on a file
+    :param input_file: File where silence should be detected
+    :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+    :param silence_time_threshold: Resolution of the ffmpeg detection algorithm (in seconds)
+    :param start: Only analyze the file from this time on (in seconds, a start of 0 is left out: even a seek to 0
+        changes how compressed audio is decoded, the output would differ from the one without a start)
+    :param duration: Only analyze this much of the file (in seconds)
+    :return: ffmpeg console command
+    """
+    command = ["ffmpeg"]
+
+    if start:
+        command.extend(["-ss", str(start)])
+
+    if duration is not None:
+        command.extend(["-t", str(duration)])
+
+    command += [
         "-i", str(input_file),
         "-vn",
         "-af",
-        f"silencedetect=noise={kwargs.get('silence_level', -35)}dB:d={kwargs.get('silence_time_threshold', 0.5)}",
+        f"silencedetect=noise={silence_level}dB:d={silence_time_threshold}",
         "-f", "null",
         "-"
     ]
 
-    console_output = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True
-    ).stdout
+    return command
+
 
-    intervals = Intervals()
+def parse_silencedetect_line(line: str):
+    """
+    Parses a line of the console output of the silencedetect command
+    :param line: The line
+    :return: (event, time) tuple, event is one of "duration", "start", "end", or None if the line has no event
+    """
+    if "[silencedetect" in line:
+        capture = re.search("\\[silencedetect @ [0-9xa-f]+] silence_([a-z]+): (-?[0-9]+.?[0-9]*[e-]*[0-9]*)", line)
+
+        if capture is not None:
+            return capture[1], float(capture[2])
+
+    elif "Duration" in line:
+        media_duration = parse_duration(line)
+
+        if media_duration is not None:
+            return "duration", media_duration
+
+    return None
+
+
+def intervals_from_events(events, silent_detect_progress_update=None):
+    """
+    Builds the raw (not yet optimized) Intervals from silence detection events
+    :param events: Iterable of (event, time) tuples, event is one of "duration", "start", "end"
+    :param silent_detect_progress_update: Function that should be called on progress update
+        (called like: func(current, total))
+    :return: lib.Intervals.Intervals object
+    """
+    return Intervals(list(interval_stream_from_events(events, silent_detect_progress_update)))
+
+
+def interval_stream_from_events(events, silent_detect_progress_update=None):
+    """
+    Generates the raw (not yet optimized) intervals from silence detection events, every interval is yielded as soon
+    as it is complete
+    :param events: Iterable of (event, time) tuples, event is one of "duration", "start", "end"
+    :param silent_detect_progress_update: Function that should be called on progress update
+        (called like: func(current, total))
+    :return: Generator of lib.Intervals.Interval objects
+    """
     current_interval = Interval(start=0, end=0, is_silent=False)
     media_duration = None
 
-    for line in console_output:
-        if "[silencedetect" in line:
-            capture = re.search("\\[silencedetect @ [0-9xa-f]+] silence_([a-z]+): (-?[0-9]+.?[0-9]*[e-]*[0-9]*)",
-                                line)
-            if capture is None:
-                continue
-                
-            event = capture[1]
-            time = float(capture[2])
-
-            if silent_detect_progress_update is not None:
-                silent_detect_progress_update(time, media_duration)
-
-            if event == "start":
-                if current_interval.start != time:
-                    current_interval.end = time
-                    intervals.add_interval(current_interval)
-                current_interval = Interval(start=time, is_silent=True)
-
-            if event == "end":
+    for event, time in events:
+        if event == "duration":
+            media_duration = time
+            continue
+
+        if silent_detect_progress_update is not None:
+            silent_detect_progress_update(time, media_duration)
+
+        if event == "start":
+            if current_interval.start != time:
                 current_interval.end = time
-                intervals.add_interval(current_interval)
-                current_interval = Interval(start=time, is_silent=False)
+                yield current_interval
+            current_interval = Interval(start=time, is_silent=True)
 
-        elif "Duration" in line:
-            capture = re.search("Duration: ([0-9:]+.?[0-9]*)", line)
-            if capture is None:
-                continue
-            hour, minute, second_millisecond = capture[1].split(":")
-            second, millisecond = second_millisecond.split(".")
-            media_duration = float(str(int(second) + 60 * (int(minute) + 60 * int(hour))) + "." + millisecond)
+        if event == "end":
+            current_interval.end = time
+            yield current_interval
+            current_interval = Interval(start=time, is_silent=False)
 
     current_interval.end = media_duration
-    intervals.add_interval(current_interval)
+    yield current_interval
 
     if silent_detect_progress_update is not None:
         silent_detect_progress_update(media_duration, media_duration)
-
-    intervals.optimize(
-        kwargs.get('short_interval_threshold', 0.3),
-        kwargs.get('stretch_time', 0.25)
-    )
-
-    return intervals
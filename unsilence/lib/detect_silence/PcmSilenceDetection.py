@@ -0,0 +1,224 @@
+import subprocess
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+
+from unsilence.lib.tools.ffmpeg_output import parse_duration
+from unsilence.lib.tools.process import process_slot, wait_process
+
+SAMPLE_FORMATS = {
+    "s16le": (np.int16, 32768.0),
+    "f32le": (np.float32, 1.0),
+}
+
+
+def pcm_silence_events(input_file: Path, silence_level: float, silence_time_threshold: float, window_size=0.01,
+                       hop_size=None, sample_rate=8000, sample_format="s16le", level_mode="peak",
+                       block_duration=60, metrics=None):
+    """
+    Detects silence by reading mono, downsampled raw PCM from ffmpeg and analyzing it block by block with NumPy.
+    A window counts as silent if its level is below silence_level; a run of silent windows that lasts at least
+    silence_time_threshold seconds is reported as silence (the same semantics as ffmpeg's silencedetect filter)
+    :param input_file: File where silence should be detected
+    :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+    :param silence_time_threshold: Shortest silence that gets reported (in seconds)
+    :param window_size: Length of the analysis window (in seconds)
+    :param hop_size: Distance between the starts of two analysis windows (in seconds), defaults to window_size
+    :param sample_rate: Sample rate the audio gets resampled to before the analysis (a cheap resampler without
+        lowpass filter is used, which is sufficient to measure levels)
+    :param sample_format: "s16le" or "f32le"
+    :param level_mode: "peak" (like silencedetect) or "rms"
+    :param block_duration: How much audio is read from the pipe at once (in seconds)
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+    :raises: **IOError** -- If ffmpeg could not decode the audio (see pcm_level_blocks)
+    :return: Generator of (event, time) tuples, event is one of "duration", "start", "end"
+    """
+    if hop_size is None:
+        hop_size = window_size
+
+    hop_time = max(1, int(round(hop_size * sample_rate))) / sample_rate
+    threshold = 10 ** (silence_level / 20)
+    min_silent_windows = silence_time_threshold / hop_time
+
+    media_info = {}
+    window_offset = 0
+    previous_silent = False
+    run_start = None
+    duration_reported = False
+
+    # Closing this generator early closes the block reader right away, which stops its ffmpeg process
+    with closing(pcm_level_blocks(input_file, window_size, hop_size, sample_rate, sample_format, level_mode,
+                                  block_duration, media_info, metrics)) as level_blocks:
+        for levels in level_blocks:
+            silent = levels < threshold
+
+            if not duration_reported and "duration" in media_info:
+                duration_reported = True
+                yield "duration", media_info["duration"]
+
+            edges = np.flatnonzero(np.diff(np.concatenate(([previous_silent], silent)).astype(np.int8)))
+
+            for edge in edges.tolist():
+                if silent[edge]:
+                    run_start = window_offset + edge
+                else:
+                    run_end = window_offset + edge
+                    if run_end - run_start >= min_silent_windows:
+                        yield "start", run_start * hop_time
+                        yield "end", run_end * hop_time
+                    run_start = None
+
+            previous_silent = bool(silent[-1])
+            window_offset += len(levels)
+
+    if not duration_reported:
+        yield "duration", media_info.get("duration", window_offset * hop_time)
+
+    if run_start is not None and window_offset - run_start >= min_silent_windows:
+        yield "start", run_start * hop_time
+
+
+def pcm_level_blocks(input_file: Path, window_size=0.01, hop_size=None, sample_rate=8000, sample_format="s16le",
+                     level_mode="peak", block_duration=60, media_info: dict = None, metrics=None):
+    """
+    Reads mono, downsampled raw PCM from ffmpeg and yields the levels of consecutive analysis windows block by block
+    :param input_file: File that should be analyzed
+    :param window_size: Length of the analysis window (in seconds)
+    :param hop_size: Distance between the starts of two analysis windows (in seconds), defaults to window_size
+    :param sample_rate: Sample rate the audio gets resampled to before the analysis
+    :param sample_format: "s16le" or "f32le"
+    :param level_mode: "peak" or "rms"
+    :param block_duration: How much audio is read from the pipe at once (in seconds)
+    :param media_info: Optional dict, the media duration is stored in it as "duration" as soon as ffmpeg reports it
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+    :raises: **IOError** -- If ffmpeg exited with an error (e.g. the file has no audio stream or is corrupted), after
+        all levels it decoded were yielded
+    :return: Generator of NumPy arrays with one level (linear amplitude, 1.0 is full scale) per window
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported sample format {sample_format}, choose one of {', '.join(SAMPLE_FORMATS)}")
+
+    if level_mode not in ("peak", "rms"):
+        raise ValueError(f"Unsupported level mode {level_mode}, choose one of peak, rms")
+
+    if hop_size is None:
+        hop_size = window_size
+
+    if media_info is None:
+        media_info = {}
+
+    window = max(1, int(round(window_size * sample_rate)))
+    hop = max(1, int(round(hop_size * sample_rate)))
+
+    if hop > window:
+        raise ValueError("hop_size must not be larger than window_size")
+
+    dtype, full_scale = SAMPLE_FORMATS[sample_format]
+
+    command = [
+        "ffmpeg",
+        "-i", str(input_file),
+        "-vn",
+        "-ac", "1",
+        "-af", f"aresample={sample_rate}:filter_size=1",
+        "-f", sample_format,
+        "-acodec", f"pcm_{sample_format}",
+        "-"
+    ]
+
+    with process_slot(metrics):
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        stderr_thread = threading.Thread(target=_read_duration, args=(process.stderr, media_info), daemon=True)
+        stderr_thread.start()
+
+        block_bytes = int(block_duration * sample_rate / hop) * hop * np.dtype(dtype).itemsize
+        carry = np.zeros(0, dtype=dtype)
+        end_of_stream = False
+
+        try:
+            while not end_of_stream:
+                data = process.stdout.read(block_bytes)
+                end_of_stream = len(data) == 0
+
+                buffer = np.concatenate((carry, np.frombuffer(data, dtype=dtype)))
+
+                if end_of_stream:
+                    window_count = (len(buffer) + hop - 1) // hop if len(buffer) > 0 else 0
+                elif len(buffer) >= window:
+                    window_count = (len(buffer) - window) // hop + 1
+                else:
+                    window_count = 0
+
+                if window_count > 0:
+                    yield _window_levels(buffer, window, hop, window_count, level_mode) / full_scale
+                    carry = buffer[window_count * hop:]
+                else:
+                    carry = buffer
+        finally:
+            # The generator was closed before ffmpeg wrote all of its output (or the analysis failed)
+            if not end_of_stream:
+                process.terminate()
+
+            process.stdout.close()
+            stderr_thread.join()
+            wait_process(process, start_time, metrics, "pcm_decode")
+
+    if process.returncode != 0:
+        raise IOError(f"Could not decode the audio of {input_file} (ffmpeg exited with {process.returncode})")
+
+
+def _window_levels(buffer: np.ndarray, window: int, hop: int, window_count: int, level_mode: str):
+    """
+    Computes the level of window_count windows of a sample buffer, the last windows may be shorter than window
+    :param buffer: The samples
+    :param window: Window length in samples
+    :param hop: Hop length in samples
+    :param window_count: Number of windows that should be computed
+    :param level_mode: "peak" or "rms"
+    :return: Array with one level per window (in sample units)
+    """
+    samples = np.abs(buffer.astype(np.float32))
+    if level_mode == "rms":
+        samples = samples * samples
+
+    full_windows = min(window_count, max(0, (len(samples) - window) // hop + 1))
+
+    if window == hop:
+        framed = samples[:full_windows * window].reshape(full_windows, window)
+    else:
+        framed = np.lib.stride_tricks.sliding_window_view(samples, window)[:full_windows * hop:hop]
+
+    if level_mode == "rms":
+        levels = framed.mean(axis=1)
+    else:
+        levels = framed.max(axis=1, initial=0)
+
+    if full_windows < window_count:
+        rest = [samples[i * hop:i * hop + window] for i in range(full_windows, window_count)]
+        rest_levels = [part.mean() if level_mode == "rms" else part.max() for part in rest]
+        levels = np.concatenate((levels, np.array(rest_levels, dtype=levels.dtype)))
+
+    if level_mode == "rms":
+        levels = np.sqrt(levels)
+
+    return levels
+
+
+def _read_duration(stream, media_info: dict):
+    """
+    Reads the stderr of ffmpeg and stores the media duration in the given dict once it is found
+    :param stream: stderr of the ffmpeg process
+    :param media_info: Dict the duration is stored in (as "duration")
+    :return: None
+    """
+    for line in stream:
+        line = line.decode(errors="replace")
+        if "duration" not in media_info and "Duration" in line:
+            duration = parse_duration(line)
+            if duration is not None:
+                media_info["duration"] = duration
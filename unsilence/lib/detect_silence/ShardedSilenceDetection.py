@@ -0,0 +1,179 @@
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from unsilence.lib.tools.ffmpeg_output import parse_duration
+from unsilence.lib.tools.process import run_process
+
+# Decoded context before and after every shard in addition to silence_time_threshold, so that decoder warm-up after
+# the seek never affects the part of the shard that is used
+SHARD_MARGIN = 1.0
+MINIMUM_SHARD_DURATION = 10
+
+# Largest difference of an event time to a single silencedetect run for compressed input (in seconds): the decoder
+# restarts at the packet before every seek position, the samples around a seek can differ by one codec frame (AAC
+# frames are 1024 samples, about 23 ms at 44.1 kHz). PCM input has no tolerance
+SHARD_TOLERANCE = 0.025
+
+
+def sharded_silencedetect_events(input_file: Path, silence_level: float, silence_time_threshold: float, shards: int,
+                                 metrics=None):
+    """
+    Runs ffmpeg's silencedetect filter on overlapping time shards of a file concurrently and stitches the results.
+    For PCM input the events are the same as the ones of a single silencedetect run over the whole file. Compressed
+    audio (AAC, MP3, ...) is decoded differently after a seek, its event times can differ by up to SHARD_TOLERANCE
+    from a single run (about a millisecond in practice).
+    Every shard owns the time range between two boundaries and is decoded with at least
+    silence_time_threshold + SHARD_MARGIN seconds of context on both sides, so every silence that reaches into the
+    owned range is detected by the shard.
+    The detected silences are clipped to the owned range and silences that touch a boundary are merged
+    :param input_file: File where silence should be detected
+    :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+    :param silence_time_threshold: Resolution of the ffmpeg detection algorithm (in seconds)
+    :param shards: Number of shards (fewer are used if the shards would get shorter than MINIMUM_SHARD_DURATION)
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg processes (optional)
+    :return: Generator of (event, time) tuples, event is one of "duration", "start", "end"
+    """
+    # Imported here, DetectSilence imports this module
+    from unsilence.lib.detect_silence.DetectSilence import silencedetect_events
+
+    media_duration = probe_duration(input_file, metrics)
+
+    if media_duration is None or shards < 2 or media_duration < 2 * MINIMUM_SHARD_DURATION:
+        yield from silencedetect_events(input_file, silence_level, silence_time_threshold, metrics)
+        return
+
+    yield "duration", media_duration
+
+    windows = shard_windows(media_duration, shards, math.ceil(silence_time_threshold + SHARD_MARGIN))
+
+    with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+        futures = [
+            executor.submit(_detect_shard, input_file, silence_level, silence_time_threshold, window, metrics)
+            for window in windows
+        ]
+
+        pending = None
+
+        # Shards are stitched in order, the events of a shard are final as soon as it and all shards before it are done
+        for future in futures:
+            for silence in future.result():
+                if pending is not None and pending[1] == silence[0]:
+                    pending = (pending[0], silence[1])
+                    continue
+
+                if pending is not None:
+                    yield from _silence_events(pending)
+
+                pending = silence
+
+        if pending is not None:
+            yield from _silence_events(pending)
+
+
+def shard_windows(media_duration: float, shards: int, overlap: float):
+    """
+    Splits a file into time shards. All boundaries are whole seconds, which lie on the sample grid of every sample
+    rate, so that the times ffmpeg reports relative to a seek position convert to file times (exactly up to the
+    microsecond rounding of ffmpeg's output). The first shard starts at 0, it is read without a seek
+    :param media_duration: Duration of the file (in seconds)
+    :param shards: Requested number of shards
+    :param overlap: Context that is decoded before and after every shard (whole seconds)
+    :return: List of (owned_start, owned_end, seek_start, seek_duration) tuples, owned_end and seek_duration are None
+        for the last shard (it reads until the end of the file)
+    """
+    shards = max(1, min(shards, int(media_duration // MINIMUM_SHARD_DURATION)))
+    boundaries = [int(media_duration * i // shards) for i in range(shards)] + [None]
+
+    windows = []
+
+    for owned_start, owned_end in zip(boundaries[:-1], boundaries[1:]):
+        seek_start = max(0, owned_start - overlap)
+        seek_duration = None if owned_end is None else owned_end + overlap - seek_start
+        windows.append((owned_start, owned_end, seek_start, seek_duration))
+
+    return windows
+
+
+def probe_duration(input_file: Path, metrics=None):
+    """
+    Reads the duration of a file from ffmpeg's input information
+    :param input_file: The file
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+    :return: Duration in seconds or None if ffmpeg does not report one
+    """
+    console_output = run_process(
+        ["ffmpeg", "-hide_banner", "-i", str(input_file)],
+        metrics, "probe_duration",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True
+    ).stdout
+
+    for line in console_output.split("\n"):
+        if "Duration" in line:
+            return parse_duration(line)
+
+    return None
+
+
+def _detect_shard(input_file: Path, silence_level: float, silence_time_threshold: float, window: tuple,
+                  metrics=None):
+    """
+    Detects the silences of a shard
+    :param input_file: File where silence should be detected
+    :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+    :param silence_time_threshold: Resolution of the ffmpeg detection algorithm (in seconds)
+    :param window: (owned_start, owned_end, seek_start, seek_duration), see shard_windows
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+    :return: List of (start, end) tuples in file time, clipped to the owned range of the shard (end is None for a
+        silence that lasts until the end of the file and is not closed by ffmpeg)
+    """
+    from unsilence.lib.detect_silence.DetectSilence import silencedetect_events
+
+    owned_start, owned_end, seek_start, seek_duration = window
+    silences = []
+    silence_start = None
+
+    for event, time in silencedetect_events(input_file, silence_level, silence_time_threshold, metrics,
+                                            start=seek_start, duration=seek_duration):
+        # ffmpeg reports times relative to the seek position with microsecond precision
+        if event == "start":
+            silence_start = round(seek_start + time, 6)
+        elif event == "end" and silence_start is not None:
+            silences.append((silence_start, round(seek_start + time, 6)))
+            silence_start = None
+
+    if silence_start is not None:
+        silences.append((silence_start, None))
+
+    clipped_silences = []
+
+    for start, end in silences:
+        if owned_end is not None and start >= owned_end:
+            continue
+
+        if end is not None and end <= owned_start and owned_start > 0:
+            continue
+
+        start = max(start, owned_start)
+
+        if owned_end is not None:
+            end = owned_end if end is None else min(end, owned_end)
+
+        clipped_silences.append((start, end))
+
+    return clipped_silences
+
+
+def _silence_events(silence: tuple):
+    """
+    Converts a stitched silence to detection events
+    :param silence: (start, end) tuple, end is None for a silence that is not closed
+    :return: Generator of (event, time) tuples
+    """
+    yield "start", silence[0]
+
+    if silence[1] is not None:
+        yield "end", silence[1]
@@ -0,0 +1,366 @@
+import hashlib
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+
+from unsilence.lib.cache.FileCache import FileCache, default_cache_dir
+from unsilence.lib.detect_silence.DetectSilence import intervals_from_events
+from unsilence.lib.detect_silence.PcmSilenceDetection import pcm_level_blocks
+from unsilence.lib.intervals.TimeCalculations import calculate_time
+from unsilence.lib.tools.fingerprint import file_fingerprint
+
+# Version of the cache entry format (see LoudnessEnvelope.to_bytes), entries of older versions are not read
+CACHE_FORMAT = 2
+
+
+class LoudnessEnvelope:
+    """
+    Compact per-window loudness envelope (in dB) of a media file. It is computed with a single decode and can then
+    derive Intervals and time estimates for any detection threshold without running ffmpeg again
+    """
+
+    def __init__(self, levels: np.ndarray, hop_size: float, media_duration: float):
+        """
+        Initializes a new LoudnessEnvelope
+        :param levels: Level of every analysis window (in dB), may be a memory mapped array
+        :param hop_size: Distance between the starts of two analysis windows (in seconds)
+        :param media_duration: Duration of the media file (in seconds)
+        """
+        self.__levels = levels
+        self.__hop_size = hop_size
+        self.__media_duration = media_duration
+
+    @property
+    def levels(self):
+        """
+        Get the level of every analysis window
+        :return: NumPy array (in dB)
+        """
+        return self.__levels
+
+    @property
+    def hop_size(self):
+        """
+        Get the distance between the starts of two analysis windows
+        :return: hop size in seconds
+        """
+        return self.__hop_size
+
+    @property
+    def media_duration(self):
+        """
+        Get the duration of the media file
+        :return: duration in seconds
+        """
+        return self.__media_duration
+
+    @staticmethod
+    def from_file(input_file: Path, cache_dir: Path = None, window_size=0.01, hop_size=None, sample_rate=8000,
+                  level_mode="peak", max_cache_size: int = 1024 * 1024 * 1024, on_progress_update=None):
+        """
+        Loads the envelope of a file from the cache directory (memory mapped) or computes and stores it
+        :param input_file: The file that should be analyzed
+        :param cache_dir: Where envelopes are stored, e.g. the directory of the input file
+            (default: <user cache dir>/unsilence/envelope)
+        :param window_size: Length of the analysis window (in seconds)
+        :param hop_size: Distance between the starts of two analysis windows (in seconds), defaults to window_size
+        :param sample_rate: Sample rate the audio gets resampled to before the analysis
+        :param level_mode: "peak" (like silencedetect) or "rms"
+        :param max_cache_size: Maximum size of the cache directory (in bytes)
+        :param on_progress_update: Function that should be called on progress update while computing
+            (called like: func(current, total))
+        :return: LoudnessEnvelope
+        """
+        input_file = Path(input_file).absolute()
+
+        if not input_file.exists():
+            raise FileNotFoundError(f"Input file {input_file} does not exist!")
+
+        if hop_size is None:
+            hop_size = window_size
+
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "envelope"
+
+        cache = FileCache(cache_dir, max_cache_size)
+
+        options = {
+            "format": CACHE_FORMAT,
+            "file": file_fingerprint(input_file),
+            "window_size": window_size,
+            "hop_size": hop_size,
+            "sample_rate": sample_rate,
+            "level_mode": level_mode
+        }
+        key = hashlib.sha1(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+        path = cache.lookup(key, ".npy")
+
+        if path is not None:
+            return LoudnessEnvelope.load(path)
+
+        envelope = LoudnessEnvelope.compute(input_file, window_size, hop_size, sample_rate, level_mode,
+                                            on_progress_update)
+        cache.store_bytes(key, envelope.to_bytes(), ".npy")
+
+        return envelope
+
+    @staticmethod
+    def compute(input_file: Path, window_size=0.01, hop_size=None, sample_rate=8000, level_mode="peak",
+                on_progress_update=None):
+        """
+        Computes the envelope of a file with a single ffmpeg decode
+        :param input_file: The file that should be analyzed
+        :param window_size: Length of the analysis window (in seconds)
+        :param hop_size: Distance between the starts of two analysis windows (in seconds), defaults to window_size
+        :param sample_rate: Sample rate the audio gets resampled to before the analysis
+        :param level_mode: "peak" (like silencedetect) or "rms"
+        :param on_progress_update: Function that should be called on progress update
+            (called like: func(current, total))
+        :raises: **IOError** -- If ffmpeg could not decode the audio
+        :return: LoudnessEnvelope
+        """
+        if hop_size is None:
+            hop_size = window_size
+
+        hop_time = max(1, int(round(hop_size * sample_rate))) / sample_rate
+
+        media_info = {}
+        blocks = []
+        window_count = 0
+
+        for levels in pcm_level_blocks(input_file, window_size, hop_size, sample_rate, "s16le", level_mode,
+                                       media_info=media_info):
+            blocks.append((20 * np.log10(np.maximum(levels, 1e-7))).astype(np.float32))
+            window_count += len(levels)
+
+            if on_progress_update is not None:
+                on_progress_update(window_count * hop_time, media_info.get("duration", None))
+
+        levels = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+        media_duration = media_info.get("duration", len(levels) * hop_time)
+
+        if on_progress_update is not None:
+            on_progress_update(media_duration, media_duration)
+
+        return LoudnessEnvelope(levels, hop_time, media_duration)
+
+    def to_bytes(self):
+        """
+        Serializes the envelope into a single file: the levels as .npy data (which can be memory mapped), followed
+        by the envelope information as JSON
+        :return: bytes
+        """
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(self.__levels, dtype=np.float32))
+        buffer.write(json.dumps({"hop_size": self.__hop_size, "media_duration": self.__media_duration}).encode())
+
+        return buffer.getvalue()
+
+    def save(self, path: Path):
+        """
+        Saves the envelope, the levels can be memory mapped when loading it again
+        :param path: Where the envelope should be saved (.npy)
+        :return: None
+        """
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @staticmethod
+    def load(path: Path):
+        """
+        Loads a previously saved envelope (see save), the levels are memory mapped
+        :param path: Where the envelope is saved
+        :return: LoudnessEnvelope
+        """
+        levels = np.load(path, mmap_mode="r")
+
+        with open(path, "rb") as file:
+            file.seek(levels.offset + levels.nbytes)
+            info = json.loads(file.read().decode())
+
+        return LoudnessEnvelope(levels, info["hop_size"], info["media_duration"])
+
+    def silence_runs(self, silence_level=-35, silence_time_threshold=0.5):
+        """
+        Finds the silences (runs of windows below silence_level that last at least silence_time_threshold)
+        :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+        :param silence_time_threshold: Shortest silence that gets reported (in seconds)
+        :return: Tuple of two NumPy arrays with the start and end times of the silences (in seconds)
+        """
+        run_starts, run_ends = self.__window_runs(silence_level)
+        keep = (run_ends - run_starts) >= silence_time_threshold / self.__hop_size
+
+        return run_starts[keep] * self.__hop_size, run_ends[keep] * self.__hop_size
+
+    def __window_runs(self, silence_level):
+        """
+        Finds all runs of windows below silence_level, regardless of their length
+        :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+        :return: Tuple of two NumPy arrays with the first and the (exclusive) last window index of the runs
+        """
+        silent = np.asarray(self.__levels) < silence_level
+        edges = np.diff(np.concatenate(([False], silent, [False])).astype(np.int8))
+
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    def raw_intervals(self, silence_level=-35, silence_time_threshold=0.5):
+        """
+        Derives the raw (not yet optimized) Intervals, like the silence detection would
+        :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+        :param silence_time_threshold: Shortest silence that gets reported (in seconds)
+        :return: lib.Intervals.Intervals object
+        """
+        starts, ends = self.silence_runs(silence_level, silence_time_threshold)
+        window_count = len(self.__levels)
+
+        events = [("duration", self.__media_duration)]
+
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            events.append(("start", start))
+
+            if round(end / self.__hop_size) < window_count:
+                events.append(("end", end))
+
+        return intervals_from_events(events)
+
+    def intervals(self, silence_level=-35, silence_time_threshold=0.5, short_interval_threshold=0.3,
+                  stretch_time=0.25):
+        """
+        Derives the optimized Intervals, like lib.detect_silence.DetectSilence.detect_silence would
+        :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+        :param silence_time_threshold: Shortest silence that gets reported (in seconds)
+        :param short_interval_threshold: The shortest allowed interval length (in seconds)
+        :param stretch_time: Time the interval should be enlarged/shrunken (in seconds)
+        :return: lib.Intervals.Intervals object
+        """
+        intervals = self.raw_intervals(silence_level, silence_time_threshold)
+        intervals.optimize(short_interval_threshold, stretch_time)
+        return intervals
+
+    def estimate_time(self, silence_level=-35, silence_time_threshold=0.5, short_interval_threshold=0.3,
+                      stretch_time=0.25, audible_speed=1, silent_speed=6):
+        """
+        Estimates the time (savings) for a combination of detection and speed options
+        :return: Time calculation dict, see lib.intervals.TimeCalculations.calculate_time
+        """
+        intervals = self.intervals(silence_level, silence_time_threshold, short_interval_threshold, stretch_time)
+        return calculate_time(intervals, audible_speed, silent_speed)
+
+    def sweep(self, silence_levels, silence_time_thresholds, audible_speeds, silent_speeds,
+              short_interval_thresholds=(0.3,), stretch_times=(0.25,)):
+        """
+        Estimates the output duration for every combination of the given options in one call. The silence runs are
+        found once per silence level and all silence time thresholds are evaluated together on them, the speed
+        dimensions are computed by broadcasting, because the output duration is linear in 1/speed
+        :param silence_levels: Values for silence_level (in dB)
+        :param silence_time_thresholds: Values for silence_time_threshold (in seconds)
+        :param audible_speeds: Values for audible_speed
+        :param silent_speeds: Values for silent_speed
+        :param short_interval_thresholds: Values for short_interval_threshold (in seconds)
+        :param stretch_times: Values for stretch_time (in seconds)
+        :return: NumPy array of output durations (in seconds) with the shape
+            (silence_levels, silence_time_thresholds, short_interval_thresholds, stretch_times,
+            audible_speeds, silent_speeds), NaN for the combinations whose stretch time is too large for their
+            intervals (lib.intervals.Intervals.Intervals.optimize raises for them)
+        """
+        audible_speeds = np.asarray(audible_speeds, dtype=np.float64)
+        silent_speeds = np.asarray(silent_speeds, dtype=np.float64)
+
+        totals = np.zeros((len(silence_levels), len(silence_time_thresholds), len(short_interval_thresholds),
+                           len(stretch_times), 2))
+
+        for i, silence_level in enumerate(silence_levels):
+            times, slot_silent = self.__threshold_slots(silence_level, silence_time_thresholds)
+
+            for k, short_interval_threshold in enumerate(short_interval_thresholds):
+                for m, stretch_time in enumerate(stretch_times):
+                    totals[i, :, k, m] = LoudnessEnvelope.__optimized_totals(times, slot_silent,
+                                                                             short_interval_threshold, stretch_time)
+
+        return (totals[..., 0, np.newaxis, np.newaxis] / audible_speeds[:, np.newaxis]
+                + totals[..., 1, np.newaxis, np.newaxis] / silent_speeds[np.newaxis, :])
+
+    def __threshold_slots(self, silence_level, silence_time_thresholds):
+        """
+        Splits the timeline at the edges of all silence runs (like raw_intervals would without a minimum length), so
+        the raw intervals of every silence_time_threshold are runs of equally classified slots
+        :param silence_level: Threshold of what should be classified as silent/audible (in dB)
+        :param silence_time_thresholds: Values for silence_time_threshold (in seconds)
+        :return: Tuple (slot boundary times, boolean array of shape (thresholds, slots) whether a slot is silent)
+        """
+        run_starts, run_ends = self.__window_runs(silence_level)
+
+        edges = np.empty(2 * len(run_starts), dtype=np.float64)
+        edges[0::2] = run_starts * self.__hop_size
+        edges[1::2] = run_ends * self.__hop_size
+
+        # A silence that lasts until the last window is not closed, it ends with the media
+        if len(run_ends) > 0 and run_ends[-1] >= len(self.__levels):
+            edges[-1] = self.__media_duration
+
+        times = np.concatenate(([0.0], edges, [self.__media_duration]))
+
+        keep = (run_ends - run_starts) >= np.asarray(silence_time_thresholds, dtype=np.float64)[:, np.newaxis] \
+            / self.__hop_size
+
+        slot_silent = np.zeros((len(silence_time_thresholds), len(times) - 1), dtype=bool)
+        slot_silent[:, 1::2] = keep
+
+        return times, slot_silent
+
+    @staticmethod
+    def __optimized_totals(times, slot_silent, short_interval_threshold, stretch_time):
+        """
+        Computes the audible and silent duration after lib.intervals.Intervals.Intervals.optimize for every row of
+        slots at once
+        :param times: Slot boundary times (see __threshold_slots)
+        :param slot_silent: Boolean array of shape (rows, slots) whether a slot is silent
+        :param short_interval_threshold: The shortest allowed interval length (in seconds)
+        :param stretch_time: The time that should be added/removed from a audible/silent interval
+        :return: NumPy array of shape (rows, 2) with the audible and the silent duration (in seconds), NaN for the
+            rows whose stretch time is too large
+        """
+        rows, slots = slot_silent.shape
+        index = np.broadcast_to(np.arange(slots), (rows, slots))
+        no_index = np.full((rows, 1), slots)
+
+        # A raw interval starts at every slot whose state differs from the previous slot and ends at the next start
+        heads = np.ones((rows, slots), dtype=bool)
+        heads[:, 1:] = slot_silent[:, 1:] != slot_silent[:, :-1]
+        next_heads = np.minimum.accumulate(np.where(heads, index, slots)[:, ::-1], axis=1)[:, ::-1]
+        next_heads = np.concatenate((next_heads[:, 1:], no_index), axis=1)
+
+        long_heads = heads & (times[next_heads] - times[index] > short_interval_threshold)
+        has_long = long_heads.any(axis=1)
+
+        # Short intervals belong to the group of the last long interval before them (or of the first long interval)
+        last_long = np.maximum.accumulate(np.where(long_heads, index, -1), axis=1)
+        first_long = np.argmax(long_heads, axis=1)[:, np.newaxis]
+        group_silent = np.take_along_axis(slot_silent, np.where(last_long >= 0, last_long, first_long), axis=1)
+        group_silent &= has_long[:, np.newaxis]
+
+        previous_long = np.concatenate((np.full((rows, 1), -1), last_long[:, :-1]), axis=1)
+        group_heads = long_heads & (previous_long >= 0)
+        group_heads &= slot_silent != np.take_along_axis(slot_silent, np.maximum(previous_long, 0), axis=1)
+
+        # Every group ends where the next one starts (the last one with the media)
+        group_starts = np.where(group_heads, index, 0)
+        group_starts[:, 0] = 0
+        previous_group = np.maximum.accumulate(group_starts, axis=1)
+        previous_group = np.concatenate((np.zeros((rows, 1), dtype=previous_group.dtype), previous_group[:, :-1]),
+                                        axis=1)
+        group_durations = np.where(group_heads, times[index] - times[previous_group], np.inf)
+        last_durations = times[-1] - times[np.max(group_starts, axis=1)]
+
+        invalid = np.any(stretch_time >= group_durations, axis=1) | (stretch_time >= last_durations)
+
+        # Every boundary between two groups moves half the stretch time from the silent to the audible group
+        silent = (np.diff(times) * group_silent).sum(axis=1) - group_heads.sum(axis=1) * stretch_time / 2
+
+        totals = np.stack((times[-1] - times[0] - silent, silent), axis=1)
+        totals[invalid] = np.nan
+
+        return totals
@@ -3,6 +3,8 @@ class Interval:
     Represents a section in time where the media file is either silent or audible
     """
 
+    __slots__ = ("__start", "__end", "__is_silent")
+
     def __init__(self, start=0, end=0, is_silent=False):
         """
         Initializes an Interval object
@@ -12,8 +14,7 @@ class Interval:
         """
         self.__start = start
         self.__end = end
-        self.__duration = self.__end - self.__start
-        self.is_silent = is_silent
+        self.__is_silent = is_silent
 
     @property
     def start(self):
@@ -31,7 +32,6 @@ class Interval:
         :return: None
         """
         self.__start = new_start
-        self.__duration = self.__end - self.__start
 
     @property
     def end(self):
@@ -49,7 +49,23 @@ class Interval:
         :return: None
         """
         self.__end = new_end
-        self.__duration = self.__end - self.__start
+
+    @property
+    def is_silent(self):
+        """
+        Get whether the interval is silent
+        :return: Whether the interval is silent or not
+        """
+        return self.__is_silent
+
+    @is_silent.setter
+    def is_silent(self, new_is_silent):
+        """
+        Sets whether the interval is silent
+        :param new_is_silent: Whether the interval is silent or not
+        :return: None
+        """
+        self.__is_silent = new_is_silent
 
     @property
     def duration(self):
@@ -57,7 +73,7 @@ class Interval:
         Returns the duration of the interval
         :return: Duration of the interval
         """
-        return self.__duration
+        return self.end - self.start
 
     def enlarge_audible_interval(self, stretch_time, is_start_interval=False, is_end_interval=False):
         """
@@ -107,3 +123,77 @@ class Interval:
         :return: String representation
         """
         return f"<Interval start={self.start} end={self.end} duration={self.duration} is_silent={self.is_silent}>"
+
+
+class IntervalView(Interval):
+    """
+    An Interval that does not store its values itself, but reads and writes them from/to one row of the columns of a
+    lib.intervals.Intervals.Intervals collection. Views are created on demand when the collection is accessed interval
+    by interval
+    """
+
+    __slots__ = ("__starts", "__ends", "__silent", "__index")
+
+    def __init__(self, starts, ends, silent, index: int):
+        """
+        Initializes a new view on a row of interval columns
+        :param starts: NumPy array of the start times
+        :param ends: NumPy array of the end times
+        :param silent: NumPy bool array of the silent flags
+        :param index: The row this view represents
+        """
+        self.__starts = starts
+        self.__ends = ends
+        self.__silent = silent
+        self.__index = index
+
+    @property
+    def start(self):
+        """
+        Get the start time
+        :return: start time in seconds
+        """
+        return float(self.__starts[self.__index])
+
+    @start.setter
+    def start(self, new_start):
+        """
+        Sets the new start time
+        :param new_start: start time in seconds
+        :return: None
+        """
+        self.__starts[self.__index] = new_start
+
+    @property
+    def end(self):
+        """
+        Get the end time
+        :return: end time in seconds
+        """
+        return float(self.__ends[self.__index])
+
+    @end.setter
+    def end(self, new_end):
+        """
+        Sets the new end time
+        :param new_end: end time in seconds
+        :return: None
+        """
+        self.__ends[self.__index] = new_end
+
+    @property
+    def is_silent(self):
+        """
+        Get whether the interval is silent
+        :return: Whether the interval is silent or not
+        """
+        return bool(self.__silent[self.__index])
+
+    @is_silent.setter
+    def is_silent(self, new_is_silent):
+        """
+        Sets whether the interval is silent
+        :param new_is_silent: Whether the interval is silent or not
+        :return: None
+        """
+        self.__silent[self.__index] = new_is_silent
@@ -1,9 +1,15 @@
-from unsilence.lib.intervals.Interval import Interval
+from collections.abc import MutableSequence, Sequence
+
+import numpy as np
+
+from unsilence.lib.intervals.Interval import Interval, IntervalView
 
 
 class Intervals:
     """
-    Collection of lib.Intervals.Interval
+    Collection of lib.Intervals.Interval, stored column by column (start times, end times and silent flags as NumPy
+    arrays), so that the passes over all intervals are vectorized. Interval objects are only created on demand, as
+    views on the columns
     """
 
     def __init__(self, interval_list: list = None):
@@ -11,10 +17,28 @@ class Intervals:
         Initializes a new Interval Collection
         :param interval_list: list of intervals, optional
         """
-        if interval_list is None:
-            interval_list = []
+        self.__starts = np.zeros(0, dtype=np.float64)
+        self.__ends = np.zeros(0, dtype=np.float64)
+        self.__silent = np.zeros(0, dtype=bool)
+        self.__pending = []
+
+        if interval_list is not None:
+            self.__pending.extend(interval_list)
 
-        self.__interval_list = interval_list
+    @staticmethod
+    def from_columns(starts, ends, silent):
+        """
+        Creates a new collection directly from its columns
+        :param starts: Start times (in seconds)
+        :param ends: End times (in seconds)
+        :param silent: Whether the intervals are silent
+        :return: New instance of Intervals
+        """
+        intervals = Intervals()
+        intervals.__starts = np.asarray(starts, dtype=np.float64)
+        intervals.__ends = np.asarray(ends, dtype=np.float64)
+        intervals.__silent = np.asarray(silent, dtype=bool)
+        return intervals
 
     def add_interval(self, interval):
         """
@@ -22,36 +46,125 @@ class Intervals:
         :param interval: interval to be added
         :return: None
         """
-        self.__interval_list.append(interval)
+        self.__pending.append(interval)
+
+    def __columns(self):
+        """
+        Moves the intervals added since the last access into the columns
+        :return: Tuple of the start, end and silent columns
+        """
+        if len(self.__pending) > 0:
+            pending = self.__pending
+            self.__pending = []
+
+            self.__starts = np.concatenate((self.__starts, [interval.start for interval in pending]))
+            self.__ends = np.concatenate((self.__ends, [interval.end for interval in pending]))
+            self.__silent = np.concatenate(
+                (self.__silent, np.array([bool(interval.is_silent) for interval in pending], dtype=bool))
+            )
+
+        return self.__starts, self.__ends, self.__silent
+
+    def __set_columns(self, starts, ends, silent):
+        """
+        Replaces the columns (the intervals added since the last access are moved into the columns before)
+        :param starts: Start times (in seconds)
+        :param ends: End times (in seconds)
+        :param silent: Whether the intervals are silent
+        :return: None
+        """
+        self.__columns()
+        self.__starts = np.asarray(starts, dtype=np.float64)
+        self.__ends = np.asarray(ends, dtype=np.float64)
+        self.__silent = np.asarray(silent, dtype=bool)
 
     @property
     def intervals(self):
         """
-        Returns the list of intervals
-        :return:
+        Returns the intervals as a mutable sequence of Interval views, like the list the intervals used to be stored
+        in: changes to the views and to the sequence (append, insert, del, item and slice assignment) are written to
+        this collection
+        :return: IntervalSequence
         """
-        return self.__interval_list
+        return IntervalSequence(self, self.__set_columns)
+
+    @property
+    def starts(self):
+        """
+        Get the start times of all intervals
+        :return: NumPy array (in seconds)
+        """
+        return self.__columns()[0]
+
+    @property
+    def ends(self):
+        """
+        Get the end times of all intervals
+        :return: NumPy array (in seconds)
+        """
+        return self.__columns()[1]
+
+    @property
+    def silent_mask(self):
+        """
+        Get whether the intervals are silent
+        :return: NumPy bool array
+        """
+        return self.__columns()[2]
+
+    @property
+    def durations(self):
+        """
+        Get the durations of all intervals
+        :return: NumPy array (in seconds)
+        """
+        starts, ends, _ = self.__columns()
+        return ends - starts
 
     def optimize(self, short_interval_threshold=0.3, stretch_time=0.25):
         """
-        Optimizes the Intervals to be a better fit for media cutting
+        Optimizes the Intervals to be a better fit for media cutting (vectorized version of optimize_iter)
         :param short_interval_threshold: The shortest allowed interval length (in seconds)
         :param stretch_time: The time that should be added/removed from a audible/silent interval
         :return: None
         """
-        self.__combine_intervals(short_interval_threshold)
-        self.__enlarge_audible_intervals(stretch_time)
+        starts, ends, silent = self.__columns()
+
+        # Short intervals are merged into the interval before them, so a new interval only starts at a long
+        # interval whose state differs from the previous long interval
+        long_indices = np.flatnonzero(ends - starts > short_interval_threshold)
+        long_silent = silent[long_indices]
+        group_starts = long_indices[1:][long_silent[1:] != long_silent[:-1]]
+
+        new_starts = np.concatenate(([0.0], starts[group_starts]))
+        new_ends = np.concatenate((ends[group_starts - 1], ends[-1:] if len(ends) > 0 else [0.0]))
+        new_silent = np.concatenate((long_silent[:1] if len(long_silent) > 0 else [False], silent[group_starts]))
+
+        if np.any(stretch_time >= new_ends - new_starts):
+            raise Exception("Stretch time to large, please choose smaller size")
+
+        stretch_time_parts = np.where(new_silent, -1, 1) * stretch_time / 2
 
-    def __combine_intervals(self, short_interval_threshold):
+        new_starts[1:] -= stretch_time_parts[1:]
+        new_ends[:-1] += stretch_time_parts[:-1]
+
+        self.__starts, self.__ends, self.__silent = new_starts, new_ends, new_silent
+
+    @staticmethod
+    def optimize_iter(interval_iterable, short_interval_threshold=0.3, stretch_time=0.25):
         """
-        Combines multiple intervals in order to remove intervals smaller than a threshold
-        :param short_interval_threshold: Threshold for the shortest allowed interval
-        :return: None
+        Streaming version of optimize: Combines intervals smaller than a threshold and enlarges/shrinks them based on
+        if they are silent or audible. An optimized interval is yielded as soon as the next interval that cannot be
+        combined with it arrives, because from then on its boundaries are final
+        :param interval_iterable: Iterable of complete (not yet optimized) intervals, in timeline order
+        :param short_interval_threshold: The shortest allowed interval length (in seconds)
+        :param stretch_time: The time that should be added/removed from a audible/silent interval
+        :return: Generator of optimized intervals
         """
-        intervals = []
         current_interval = Interval(is_silent=None)
+        is_start_interval = True
 
-        for interval in self.__interval_list:
+        for interval in interval_iterable:
             if interval.duration <= short_interval_threshold or current_interval.is_silent == interval.is_silent:
                 current_interval.end = interval.end
 
@@ -60,28 +173,21 @@ class Intervals:
                     current_interval.is_silent = interval.is_silent
                     current_interval.end = interval.end
                 else:
-                    intervals.append(current_interval)
+                    current_interval.enlarge_audible_interval(stretch_time, is_start_interval=is_start_interval)
+                    yield current_interval
+
+                    is_start_interval = False
                     current_interval = interval.copy()
 
         if current_interval.is_silent is None:
             current_interval.is_silent = False
 
-        intervals.append(current_interval)
-
-        self.__interval_list = intervals
-
-    def __enlarge_audible_intervals(self, stretch_time):
-        """
-        Enlarges/Shrinks intervals based on if they are silent or audible
-        :param stretch_time: Time the intervals should be enlarged/shrunken
-        :return: None
-        """
-        for i, interval in enumerate(self.__interval_list):
-            interval.enlarge_audible_interval(
-                stretch_time,
-                is_start_interval=(i == 0),
-                is_end_interval=(i == len(self.__interval_list) - 1)
-            )
+        current_interval.enlarge_audible_interval(
+            stretch_time,
+            is_start_interval=is_start_interval,
+            is_end_interval=True
+        )
+        yield current_interval
 
     def remove_short_intervals_from_start(self, audible_speed=1, silent_speed=2):
         """
@@ -91,32 +197,61 @@ class Intervals:
         :param silent_speed: The speed at which the silent intervals get played back at (float)
         :return: The new, possibly shorter, Intervals object
         """
-        for i, interval in enumerate(self.__interval_list):
-            if interval.is_silent:
-                speed = silent_speed
-            else:
-                speed = audible_speed
+        starts, ends, silent = self.__columns()
+
+        speeds = np.where(silent, silent_speed, audible_speed)
+        long_indices = np.flatnonzero((ends - starts) / speeds > 0.5)
 
-            if interval.duration / speed > 0.5:
-                return Intervals(self.__interval_list[i:])
+        if len(long_indices) == 0:
+            raise Exception("No interval has a length over 0.5 seconds after speed changes! This is required.")
 
-        raise Exception("No interval has a length over 0.5 seconds after speed changes! This is required.")
+        first = long_indices[0]
+        return Intervals.from_columns(starts[first:], ends[first:], silent[first:])
+
+    @staticmethod
+    def remove_short_intervals_from_start_iter(interval_iterable, audible_speed=1, silent_speed=2):
+        """
+        Streaming version of remove_short_intervals_from_start: Skips intervals from start that are shorter than 0.5
+        seconds after speedup and yields all intervals from the first longer one on
+        :param interval_iterable: Iterable of intervals, in timeline order
+        :param audible_speed: The speed at which the audible intervals get played back at (float)
+        :param silent_speed: The speed at which the silent intervals get played back at (float)
+        :return: Generator of intervals
+        """
+        found_long_interval = False
+
+        for interval in interval_iterable:
+            if not found_long_interval:
+                speed = silent_speed if interval.is_silent else audible_speed
+                if interval.duration / speed <= 0.5:
+                    continue
+
+                found_long_interval = True
+
+            yield interval
+
+        if not found_long_interval:
+            raise Exception("No interval has a length over 0.5 seconds after speed changes! This is required.")
 
     def copy(self):
         """
         Creates a deep copy
         :return: Deep copy of Intervals
         """
-        new_interval_list = [interval.copy() for interval in self.__interval_list]
-
-        return Intervals(new_interval_list)
+        starts, ends, silent = self.__columns()
+        return Intervals.from_columns(starts.copy(), ends.copy(), silent.copy())
 
     def serialize(self):
         """
         Serializes this collection
         :return: Serialized list
         """
-        return [interval.serialize() for interval in self.__interval_list]
+        starts, ends, silent = self.__columns()
+
+        return [
+            {"start": start, "end": end, "is_silent": is_silent}
+            for start, end, is_silent in zip(starts.tolist(), ends.tolist(), silent.tolist())
+        ]
 
     @staticmethod
     def deserialize(serialized_obj):
@@ -125,12 +260,227 @@ class Intervals:
         :param serialized_obj: Serialized list
         :return: New instance of Intervals
         """
-        interval_list = [Interval.deserialize(serialized_interval) for serialized_interval in serialized_obj]
-        return Intervals(interval_list)
+        return Intervals.from_columns(
+            [serialized_interval["start"] for serialized_interval in serialized_obj],
+            [serialized_interval["end"] for serialized_interval in serialized_obj],
+            [serialized_interval["is_silent"] for serialized_interval in serialized_obj]
+        )
+
+    def __repr__(self):
+        """
+        String representation
+        :return: String representation
+        """
+        return repr(self.intervals)
+
+
+class IntervalSequence(MutableSequence):
+    """
+    Mutable sequence of the intervals of an Intervals collection, the Interval views are created on access. Views that
+    were created before intervals were inserted or removed keep referring to the previous columns
+    """
+
+    def __init__(self, owner: Intervals, set_columns):
+        """
+        Initializes a new sequence on the columns of a collection
+        :param owner: The Intervals collection
+        :param set_columns: Function that replaces the columns of the collection (called like func(starts, ends,
+            silent))
+        """
+        self.__owner = owner
+        self.__set_columns = set_columns
+
+    def __columns(self):
+        """
+        Get the current columns of the collection
+        :return: Tuple of the start, end and silent columns
+        """
+        return self.__owner.starts, self.__owner.ends, self.__owner.silent_mask
+
+    def __rows(self):
+        """
+        Get the values of all intervals
+        :return: List of (start, end, is_silent) tuples
+        """
+        return list(zip(*(column.tolist() for column in self.__columns())))
+
+    def __set_rows(self, rows: list):
+        """
+        Replaces all intervals of the collection
+        :param rows: List of (start, end, is_silent) tuples
+        :return: None
+        """
+        self.__set_columns([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+    def __len__(self):
+        """
+        Get the number of intervals
+        :return: Number of intervals
+        """
+        return len(self.__owner.starts)
+
+    def __getitem__(self, index):
+        """
+        Get an interval view, or a list of the views of a slice of the intervals (like slicing a list)
+        :param index: Index or slice
+        :return: IntervalView or list of IntervalView
+        """
+        if isinstance(index, slice):
+            columns = self.__columns()
+            return [IntervalView(*columns, i) for i in range(*index.indices(len(self)))]
+
+        index = self.__check_index(index)
+        return IntervalView(*self.__columns(), index)
+
+    def __setitem__(self, index, value):
+        """
+        Replaces an interval, or a slice of the intervals with an iterable of intervals
+        :param index: Index or slice
+        :param value: Interval, or iterable of intervals for a slice
+        :return: None
+        """
+        if isinstance(index, slice):
+            rows = self.__rows()
+            rows[index] = [(interval.start, interval.end, bool(interval.is_silent)) for interval in value]
+            self.__set_rows(rows)
+            return
+
+        index = self.__check_index(index)
+        starts, ends, silent = self.__columns()
+        starts[index], ends[index], silent[index] = value.start, value.end, bool(value.is_silent)
+
+    def __delitem__(self, index):
+        """
+        Removes an interval or a slice of the intervals
+        :param index: Index or slice
+        :return: None
+        """
+        if not isinstance(index, slice):
+            index = self.__check_index(index)
+
+        self.__set_columns(*(np.delete(column, index) for column in self.__columns()))
+
+    def insert(self, index, value):
+        """
+        Inserts an interval before an index (like list.insert)
+        :param index: The index
+        :param value: The interval
+        :return: None
+        """
+        rows = self.__rows()
+        rows.insert(index, (value.start, value.end, bool(value.is_silent)))
+        self.__set_rows(rows)
+
+    def append(self, value):
+        """
+        Appends an interval (the collection collects appended intervals and moves them into its columns on access)
+        :param value: The interval
+        :return: None
+        """
+        self.__owner.add_interval(value)
+
+    def reverse(self):
+        """
+        Reverses the order of the intervals (in place, like list.reverse)
+        :return: None
+        """
+        self.__set_columns(*(column[::-1].copy() for column in self.__columns()))
+
+    def index(self, value, start=0, stop=None):
+        """
+        Get the index of the first interval with the values of an interval (Interval views are created on access, so
+        the intervals are compared by their values instead of their identity)
+        :param value: The interval
+        :param start: Index the search starts at
+        :param stop: Index the search stops before (default: the end)
+        :raises: **ValueError** -- If no interval has these values
+        :return: The index
+        """
+        row = (value.start, value.end, bool(value.is_silent))
+        rows = self.__rows()
+
+        for index in range(*slice(start, stop).indices(len(rows))):
+            if rows[index] == row:
+                return index
+
+        raise ValueError(f"{value} is not in the intervals")
+
+    def count(self, value):
+        """
+        Get how many intervals have the values of an interval
+        :param value: The interval
+        :return: Number of intervals
+        """
+        return self.__rows().count((value.start, value.end, bool(value.is_silent)))
+
+    def __contains__(self, value):
+        """
+        Checks whether an interval has the values of an interval
+        :param value: The interval
+        :return: bool
+        """
+        return self.count(value) > 0
+
+    def __check_index(self, index: int):
+        """
+        Converts a negative index and checks that it is in range
+        :param index: The index
+        :return: The non-negative index
+        """
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("interval index out of range")
+
+        return index
+
+    def __iter__(self):
+        """
+        Iterates over views of all intervals
+        :return: Generator of IntervalView
+        """
+        columns = self.__columns()
+
+        for index in range(len(columns[0])):
+            yield IntervalView(*columns, index)
+
+    def __add__(self, other):
+        """
+        Concatenates the intervals with another sequence (like list +)
+        :param other: Sequence of intervals
+        :return: list
+        """
+        if not isinstance(other, Sequence):
+            return NotImplemented
+
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        """
+        Concatenates another sequence with the intervals (like list +)
+        :param other: Sequence of intervals
+        :return: list
+        """
+        if not isinstance(other, Sequence):
+            return NotImplemented
+
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        """
+        Compares the values of the intervals with the ones of another sequence of intervals
+        :param other: Sequence of intervals
+        :return: bool
+        """
+        if not isinstance(other, Sequence):
+            return NotImplemented
+
+        return self.__rows() == [(interval.start, interval.end, bool(interval.is_silent)) for interval in other]
 
     def __repr__(self):
         """
         String representation
         :return: String representation
         """
-        return str(self.__interval_list)
+        return str(list(self))
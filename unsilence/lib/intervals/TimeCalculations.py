@@ -10,13 +10,11 @@ def calculate_time(intervals: Intervals, audible_speed: float, silent_speed: flo
     :return: Time calculation dict
     """
     time_data = {"before": {}, "after": {}, "delta": {}}
-    audible = 0
-    silent = 0
-    for interval in intervals.intervals:
-        if interval.is_silent:
-            silent += interval.duration
-        else:
-            audible += interval.duration
+    durations = intervals.durations
+    silent_mask = intervals.silent_mask
+
+    audible = float(durations[~silent_mask].sum())
+    silent = float(durations[silent_mask].sum())
 
     time_data["before"]["all"] = (audible + silent, 1)
     time_data["before"]["audible"] = (audible, audible / time_data["before"]["all"][0])
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.render_media.Passthrough import plan_passthrough
+
+
+class TimelineMap:
+    """
+    Index that maps timestamps between the input and the output timeline of a render. Queries are answered by
+    bisection over the interval boundaries and accept single timestamps as well as NumPy arrays of timestamps
+    """
+
+    def __init__(self, intervals: Intervals, **kwargs):
+        """
+        Builds the index for intervals that are rendered with the given options
+        :param intervals: The Intervals that get rendered
+        :param kwargs: Render options, see below
+
+        kwargs:
+            audible_speed: The speed at which the audible intervals get played back at (default 1)
+            silent_speed: The speed at which the silent intervals get played back at (default 6)
+            minimum_interval_duration: The shortest output duration of an interval, faster intervals get slowed
+                down (default 0.25) (see lib.render_media.RenderIntervalThread.RenderIntervalThread.clamp_speed)
+            audible_volume: The volume at which the audible intervals get played back at (default 1)
+            silent_volume: The volume at which the silent intervals get played back at (default 0.5)
+            passthrough: Whether the render stream copies intervals with identity filter parameters, their starts
+                get snapped to keyframes like in the render (see lib.render_media.Passthrough.plan_passthrough)
+                (default False)
+            keyframes: Sorted keyframe times of the input for passthrough, None if every packet is a keyframe
+                (see lib.render_media.Passthrough.probe_passthrough) (default None)
+        """
+        audible_speed = kwargs.get("audible_speed", 1)
+        silent_speed = kwargs.get("silent_speed", 6)
+        minimum_interval_duration = kwargs.get("minimum_interval_duration", 0.25)
+
+        intervals = intervals.remove_short_intervals_from_start(audible_speed, silent_speed)
+
+        if kwargs.get("passthrough", False):
+            render_options = SimpleNamespace(
+                audible_speed=audible_speed,
+                silent_speed=silent_speed,
+                audible_volume=kwargs.get("audible_volume", 1),
+                silent_volume=kwargs.get("silent_volume", 0.5),
+                minimum_interval_duration=minimum_interval_duration
+            )
+            planned = plan_passthrough(intervals.intervals, kwargs.get("keyframes", None), render_options)
+            intervals = Intervals([interval for interval, _ in planned])
+
+        durations = intervals.durations
+        speeds = np.where(intervals.silent_mask, silent_speed, audible_speed).astype(np.float64)
+
+        # Same clamping as RenderIntervalThread.clamp_speed, for all intervals at once
+        too_short = durations / speeds < minimum_interval_duration
+        speeds[too_short] = durations[too_short] / minimum_interval_duration
+
+        self.__input_starts = intervals.starts.copy()
+        self.__input_ends = intervals.ends.copy()
+        self.__speeds = speeds
+
+        output_durations = np.divide(durations, speeds, out=np.zeros_like(durations), where=speeds > 0)
+        self.__output_starts = np.concatenate(([0.0], np.cumsum(output_durations)[:-1]))
+        self.__output_duration = float(output_durations.sum())
+
+    @property
+    def output_duration(self):
+        """
+        Get the duration of the output timeline
+        :return: Duration in seconds
+        """
+        return self.__output_duration
+
+    def to_output(self, input_time):
+        """
+        Maps input timestamps to output timestamps. Timestamps before the first rendered interval are mapped to 0,
+        timestamps after the last one to the end of the output
+        :param input_time: Timestamp or array of timestamps in the input (in seconds)
+        :return: Timestamp (float) or NumPy array of timestamps in the output (in seconds)
+        """
+        times = np.asarray(input_time, dtype=np.float64)
+
+        index = np.clip(np.searchsorted(self.__input_starts, times, side="right") - 1, 0, len(self.__input_starts) - 1)
+        times = np.clip(times, self.__input_starts[index], self.__input_ends[index])
+
+        output_times = self.__output_starts[index] + (times - self.__input_starts[index]) / self.__speeds[index]
+
+        return float(output_times) if output_times.ndim == 0 else output_times
+
+    def to_input(self, output_time):
+        """
+        Maps output timestamps to input timestamps
+        :param output_time: Timestamp or array of timestamps in the output (in seconds)
+        :return: Timestamp (float) or NumPy array of timestamps in the input (in seconds)
+        """
+        times = np.clip(np.asarray(output_time, dtype=np.float64), 0, self.__output_duration)
+
+        index = np.clip(np.searchsorted(self.__output_starts, times, side="right") - 1, 0, len(self.__output_starts) - 1)
+
+        input_times = np.minimum(
+            self.__input_starts[index] + (times - self.__output_starts[index]) * self.__speeds[index],
+            self.__input_ends[index]
+        )
+
+        return float(input_times) if input_times.ndim == 0 else input_times
@@ -0,0 +1,184 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+def measure_stage(metrics, name: str, **attributes):
+    """
+    Returns a context manager that measures a stage if metrics are collected
+    :param metrics: Metrics or None
+    :param name: Name of the stage
+    :param attributes: Additional values that are stored in the event
+    :return: Context manager
+    """
+    if metrics is None:
+        return nullcontext()
+
+    return metrics.stage(name, **attributes)
+
+
+class Metrics:
+    """
+    Collects timing and resource usage events (stages, spawned processes and render tasks), aggregates them and
+    forwards every event to the registered sinks (see lib.metrics.MetricsSinks)
+    """
+
+    def __init__(self, sinks: list = None, process_slots=None, priority: int = 0):
+        """
+        Initializes a new Metrics collector
+        :param sinks: List of sinks the events are forwarded to, optional
+        :param process_slots: lib.batch.ProcessSlots.ProcessSlots, every process of the job these metrics belong to
+            takes a slot before it starts (see lib.tools.process.process_slot), optional
+        :param priority: Priority of the processes of the job for the process slots
+        """
+        self.process_slots = process_slots
+        self.priority = priority
+        self.__sinks = list(sinks) if sinks is not None else []
+        self.__lock = threading.Lock()
+        self.__stages = {}
+        self.__processes = {}
+        self.__tasks = {"count": 0, "queue_wait": 0.0, "max_queue_wait": 0.0, "busy_time": 0.0}
+        self.__worker_busy_time = {}
+        self.__render_time = 0.0
+
+    def add_sink(self, sink):
+        """
+        Registers a sink, it receives all events recorded from now on
+        :param sink: The sink
+        :return: None
+        """
+        with self.__lock:
+            self.__sinks.append(sink)
+
+    def record(self, event: dict):
+        """
+        Timestamps an event and forwards it to the sinks. The sinks are called without holding the lock, so they may
+        call summary (and events of different threads can reach a sink concurrently)
+        :param event: Event dict, event["event"] is its type
+        :return: None
+        """
+        event = dict(event, timestamp=time.time())
+
+        with self.__lock:
+            sinks = list(self.__sinks)
+
+        for sink in sinks:
+            sink.emit(event)
+
+    @contextmanager
+    def stage(self, name: str, **attributes):
+        """
+        Context manager that measures the wall time of a stage
+        :param name: Name of the stage
+        :param attributes: Additional values that are stored in the event
+            (the "render" stage sets workers, the number of render threads)
+        :return: None
+        """
+        start_time = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_time
+
+            with self.__lock:
+                stage = self.__stages.setdefault(name, {"count": 0, "wall_time": 0.0})
+                stage["count"] += 1
+                stage["wall_time"] += wall_time
+
+                if name == "render":
+                    self.__render_time += wall_time * attributes.get("workers", 0)
+
+            self.record(dict(attributes, event="stage", stage=name, wall_time=wall_time))
+
+    def record_process(self, stage: str, command: list, wall_time: float, user_time: float = None,
+                       system_time: float = None, max_rss: int = None, returncode: int = None):
+        """
+        Records a finished ffmpeg/ffprobe process
+        :param stage: Name of the stage the process belongs to
+        :param command: The command of the process
+        :param wall_time: Wall time from start to exit (in seconds)
+        :param user_time: User CPU time of the process (in seconds), None if unknown
+        :param system_time: System CPU time of the process (in seconds), None if unknown
+        :param max_rss: Peak resident set size (in bytes), None if unknown
+        :param returncode: Return code of the process
+        :return: None
+        """
+        with self.__lock:
+            process = self.__processes.setdefault(stage, {
+                "count": 0, "wall_time": 0.0, "user_time": 0.0, "system_time": 0.0, "max_rss": 0, "failed": 0
+            })
+            process["count"] += 1
+            process["wall_time"] += wall_time
+            process["user_time"] += user_time or 0.0
+            process["system_time"] += system_time or 0.0
+            process["max_rss"] = max(process["max_rss"], max_rss or 0)
+            process["failed"] += returncode not in (0, None)
+
+        self.record({
+            "event": "process",
+            "stage": stage,
+            "program": str(command[0]),
+            "command": [str(part) for part in command],
+            "wall_time": wall_time,
+            "user_time": user_time,
+            "system_time": system_time,
+            "max_rss": max_rss,
+            "returncode": returncode
+        })
+
+    def record_task(self, worker, task_id, queue_wait: float, wall_time: float):
+        """
+        Records a render task processed by a worker thread
+        :param worker: ID of the worker thread
+        :param task_id: ID of the task
+        :param queue_wait: Time between queueing the task and a worker taking it (in seconds)
+        :param wall_time: Time the worker spent on the task (in seconds)
+        :return: None
+        """
+        with self.__lock:
+            self.__tasks["count"] += 1
+            self.__tasks["queue_wait"] += queue_wait
+            self.__tasks["max_queue_wait"] = max(self.__tasks["max_queue_wait"], queue_wait)
+            self.__tasks["busy_time"] += wall_time
+            self.__worker_busy_time[worker] = self.__worker_busy_time.get(worker, 0.0) + wall_time
+
+        self.record({
+            "event": "task",
+            "worker": worker,
+            "task_id": task_id,
+            "queue_wait": queue_wait,
+            "wall_time": wall_time
+        })
+
+    def summary(self):
+        """
+        Aggregates all recorded events
+        :return: Summary dict with the keys stages, processes, tasks, worker_busy_time and worker_utilization
+            (busy time of the render workers divided by the time they were available, None if nothing was rendered)
+        """
+        with self.__lock:
+            utilization = None
+            if self.__render_time > 0:
+                utilization = self.__tasks["busy_time"] / self.__render_time
+
+            return {
+                "stages": {name: dict(values) for name, values in self.__stages.items()},
+                "processes": {name: dict(values) for name, values in self.__processes.items()},
+                "tasks": dict(self.__tasks),
+                "worker_busy_time": dict(self.__worker_busy_time),
+                "worker_utilization": utilization
+            }
+
+    def close(self):
+        """
+        Passes the summary to the sinks and closes them
+        :return: None
+        """
+        summary = self.summary()
+
+        with self.__lock:
+            sinks = list(self.__sinks)
+
+        for sink in sinks:
+            sink.close(summary)
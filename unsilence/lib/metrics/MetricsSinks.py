@@ -0,0 +1,157 @@
+import json
+import threading
+from pathlib import Path
+
+
+class MetricsSink:
+    """
+    Base class of the sinks of lib.metrics.Metrics.Metrics
+    """
+
+    def emit(self, event: dict):
+        """
+        Receives a single event
+        :param event: Event dict
+        :return: None
+        """
+        pass
+
+    def close(self, summary: dict):
+        """
+        Receives the summary after the last event
+        :param summary: Summary dict (see lib.metrics.Metrics.Metrics.summary)
+        :return: None
+        """
+        pass
+
+
+class JsonLinesSink(MetricsSink):
+    """
+    Writes every event as one JSON object per line, the summary is the last line
+    """
+
+    def __init__(self, file: Path):
+        """
+        Initializes a new JsonLinesSink
+        :param file: The file the events are appended to
+        """
+        self.__file = open(file, "a")
+        self.__lock = threading.Lock()
+
+    def emit(self, event: dict):
+        """
+        Appends the event as a JSON line
+        :param event: Event dict
+        :return: None
+        """
+        with self.__lock:
+            self.__file.write(json.dumps(event) + "\n")
+
+    def close(self, summary: dict):
+        """
+        Appends the summary as the last JSON line and closes the file
+        :param summary: Summary dict (see lib.metrics.Metrics.Metrics.summary)
+        :return: None
+        """
+        with self.__lock:
+            self.__file.write(json.dumps({"event": "summary", **summary}) + "\n")
+            self.__file.close()
+
+
+class CallbackSink(MetricsSink):
+    """
+    Calls a function for every event (and for the summary, as an event of the type "summary")
+    """
+
+    def __init__(self, callback):
+        """
+        Initializes a new CallbackSink
+        :param callback: Function that is called like func(event)
+        """
+        self.__callback = callback
+
+    def emit(self, event: dict):
+        """
+        Calls the callback with the event (possibly from several threads at once)
+        :param event: Event dict
+        :return: None
+        """
+        self.__callback(event)
+
+    def close(self, summary: dict):
+        """
+        Calls the callback with the summary as an event of the type "summary"
+        :param summary: Summary dict (see lib.metrics.Metrics.Metrics.summary)
+        :return: None
+        """
+        self.__callback({"event": "summary", **summary})
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Writes the summary in the Prometheus text exposition format (e.g. for the textfile collector of node_exporter)
+    """
+
+    def __init__(self, file: Path, prefix: str = "unsilence"):
+        """
+        Initializes a new PrometheusSink
+        :param file: The file the metrics are written to
+        :param prefix: Prefix of all metric names
+        """
+        self.__file = Path(file)
+        self.__prefix = prefix
+
+    def close(self, summary: dict):
+        """
+        Writes the summary to the file
+        :param summary: Summary dict (see lib.metrics.Metrics.Metrics.summary)
+        :return: None
+        """
+        with open(self.__file, "w+") as file:
+            file.write(prometheus_text(summary, self.__prefix))
+
+
+def prometheus_text(summary: dict, prefix: str = "unsilence"):
+    """
+    Formats a summary in the Prometheus text exposition format
+    :param summary: Summary dict (see lib.metrics.Metrics.Metrics.summary)
+    :param prefix: Prefix of all metric names
+    :return: String
+    """
+    lines = []
+
+    def add_metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+    stages = summary["stages"].items()
+    processes = summary["processes"].items()
+
+    add_metric("stage_seconds_total", "counter", "Wall time spent in a stage",
+               [({"stage": stage}, values["wall_time"]) for stage, values in stages])
+    add_metric("processes_total", "counter", "Number of spawned ffmpeg/ffprobe processes",
+               [({"stage": stage}, values["count"]) for stage, values in processes])
+    add_metric("processes_failed_total", "counter", "Number of processes with a non-zero exit status",
+               [({"stage": stage}, values["failed"]) for stage, values in processes])
+    add_metric("process_wall_seconds_total", "counter", "Wall time of the spawned processes",
+               [({"stage": stage}, values["wall_time"]) for stage, values in processes])
+    add_metric("process_cpu_seconds_total", "counter", "CPU time of the spawned processes",
+               [({"stage": stage, "mode": mode}, values[f"{mode}_time"])
+                for stage, values in processes for mode in ("user", "system")])
+    add_metric("process_max_rss_bytes", "gauge", "Peak resident set size of a single spawned process",
+               [({"stage": stage}, values["max_rss"]) for stage, values in processes])
+    add_metric("render_tasks_total", "counter", "Number of processed render tasks",
+               [({}, summary["tasks"]["count"])])
+    add_metric("render_task_queue_wait_seconds_total", "counter", "Time render tasks waited in the queue",
+               [({}, summary["tasks"]["queue_wait"])])
+    add_metric("render_worker_busy_seconds_total", "counter", "Time the render workers spent on tasks",
+               [({"worker": worker}, busy_time) for worker, busy_time in summary["worker_busy_time"].items()])
+
+    if summary["worker_utilization"] is not None:
+        add_metric("render_worker_utilization_ratio", "gauge", "Busy time of the render workers divided by the time "
+                   "they were available", [({}, summary["worker_utilization"])])
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,233 @@
+import asyncio
+import shutil
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.metrics.Metrics import measure_stage
+from unsilence.lib.render_media.MediaRenderer import MediaRenderer
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.render_media.TaskScheduling import order_tasks, probe_frame_duration, split_long_intervals
+from unsilence.lib.tools.async_process import run_process_async
+from unsilence.lib.tools.ffmpeg_output import is_complete_output, is_filter_error, output_collector, with_progress
+
+
+class AsyncMediaRenderer:
+    """
+    asyncio version of the MediaRenderer (interval engine): every interval is rendered by its own ffmpeg process
+    started with asyncio.create_subprocess_exec, as many at the same time as the process limit allows, then the
+    segments are concatenated. Cancelling the render kills all running ffmpeg processes
+    """
+
+    def __init__(self, temp_path: Path, process_limit: asyncio.Semaphore = None):
+        """
+        Initializes a new AsyncMediaRenderer Object
+        :param temp_path: The temp path where all temporary files should be stored
+        :param process_limit: Semaphore that limits the concurrently running ffmpeg processes, share it between
+            renderers to limit them together (default None: no limit)
+        """
+        self.__temp_path = Path(temp_path).absolute()
+        self.__process_limit = process_limit
+
+    async def render(self, input_file: Path, output_file: Path, intervals: Intervals, **kwargs):
+        """
+        Renders an input_file and writes the final output to output_file
+        :param input_file: The file that should be processed
+        :param output_file: Where the processed file should be saved
+        :param intervals: The Intervals that should be processed
+        :param kwargs: Keyword Args, see below
+        :return: None
+
+        kwargs:
+            audio_only, audible_speed, silent_speed, audible_volume, silent_volume, drop_corrupted_intervals,
+                check_intervals, minimum_interval_duration, ffmpeg_threads, filter_threads, max_task_duration,
+                audio_proxy, metrics, on_render_progress_update, on_concat_progress_update:
+                see lib.render_media.MediaRenderer.MediaRenderer.render
+        """
+        input_file = Path(input_file).absolute()
+        output_file = Path(output_file).absolute()
+
+        if not input_file.exists():
+            raise FileNotFoundError(f"Input file {input_file} does not exist!")
+
+        render_options = SimpleNamespace(
+            audio_only=kwargs.get("audio_only", False),
+            audible_speed=kwargs.get("audible_speed", 1),
+            silent_speed=kwargs.get("silent_speed", 6),
+            audible_volume=kwargs.get("audible_volume", 1),
+            silent_volume=kwargs.get("silent_volume", 0.5),
+            drop_corrupted_intervals=kwargs.get("drop_corrupted_intervals", False),
+            check_intervals=kwargs.get("check_intervals", False),
+            minimum_interval_duration=kwargs.get("minimum_interval_duration", 0.25),
+            ffmpeg_threads=kwargs.get("ffmpeg_threads", None),
+            filter_threads=kwargs.get("filter_threads", None),
+            audio_proxy=False,
+            pipeline_output=None,
+            segments_in_memory=False
+        )
+
+        source_file = input_file
+
+        if render_options.audio_only and kwargs.get("audio_proxy", None) is not None:
+            source_file = Path(kwargs["audio_proxy"]).absolute()
+            render_options.audio_proxy = True
+
+        interval_list = intervals.remove_short_intervals_from_start(
+            render_options.audible_speed,
+            render_options.silent_speed
+        ).intervals
+
+        video_temp_path = self.__temp_path / str(uuid.uuid4())
+        video_temp_path.mkdir(parents=True)
+
+        metrics = kwargs.get("metrics", None)
+        on_render_progress_update = kwargs.get("on_render_progress_update", None)
+
+        max_task_duration = kwargs.get("max_task_duration", None)
+        frame_duration = None
+        if max_task_duration is not None:
+            frame_duration = probe_frame_duration(input_file, output_file.suffix, render_options.audio_only, metrics)
+
+        tasks = [
+            SimpleNamespace(task_id=i, interval_output_file=video_temp_path / f"out_{i}{output_file.suffix}",
+                            interval=interval)
+            for i, interval in enumerate(
+                split_long_intervals(interval_list, max_task_duration, frame_duration, render_options)
+            )
+        ]
+        completed_tasks = []
+
+        async def render_task(task):
+            """
+            Nested coroutine that renders a task and reports the progress
+            :param task: The task
+            :return: None
+            """
+            if await self.__render_interval(source_file, task, render_options, metrics):
+                completed_tasks.append(task)
+
+            if on_render_progress_update is not None:
+                on_render_progress_update(len(completed_tasks), len(tasks))
+
+        try:
+            with measure_stage(metrics, "render"):
+                # Started in longest first order, the process limit then runs the most expensive tasks first
+                await AsyncMediaRenderer.__gather([render_task(task) for task in order_tasks(tasks, render_options)])
+
+            final_output = video_temp_path / f"out_final{output_file.suffix}"
+
+            with measure_stage(metrics, "concat"):
+                await self.__concat_intervals(
+                    [task.interval_output_file for task in sorted(completed_tasks, key=lambda x: x.task_id)],
+                    video_temp_path / "concat_list.txt",
+                    final_output,
+                    kwargs.get("on_concat_progress_update", None),
+                    metrics
+                )
+
+            MediaRenderer.move_output(final_output, output_file)
+        finally:
+            shutil.rmtree(video_temp_path, ignore_errors=True)
+
+    async def __render_interval(self, input_file: Path, task: SimpleNamespace, render_options: SimpleNamespace,
+                                metrics=None):
+        """
+        Renders the interval of a task, like RenderIntervalThread.process_task
+        :param input_file: The file that should be processed
+        :param task: The task
+        :param render_options: The render options
+        :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg processes (optional)
+        :return: Whether the task was completed successfully
+        """
+        for apply_filter in (True, False):
+            command = RenderIntervalThread.generate_command(input_file, task.interval_output_file, task.interval,
+                                                            render_options, apply_filter,
+                                                            render_options.minimum_interval_duration)
+            handle_line, output = output_collector()
+            output.returncode = (await run_process_async(with_progress(command), metrics, "render_interval",
+                                                         self.__process_limit, on_line=handle_line)).returncode
+
+            if is_filter_error(output):
+                raise ValueError("Invalid render options")
+
+            if output.returncode == 0:
+                break
+
+            if render_options.drop_corrupted_intervals:
+                return False
+        else:
+            raise IOError(f"Input file is corrupted between {task.interval.start} and {task.interval.end} "
+                          f"(in seconds): {RenderIntervalThread.last_error(output)}")
+
+        if render_options.check_intervals:
+            return is_complete_output(
+                output,
+                RenderIntervalThread.output_duration(task.interval, render_options, apply_filter),
+                not render_options.audio_only
+            )
+
+        return True
+
+    async def __concat_intervals(self, file_list: list, concat_file: Path, output_file: Path, update_concat_progress,
+                                 metrics=None):
+        """
+        Concatenates all interval files to create a finished file
+        :param file_list: List of interval files
+        :param concat_file: Where the ffmpeg concat filter file should be saved
+        :param output_file: Where the final output file should be saved
+        :param update_concat_progress: A function that is called when a step is finished
+            (called like function(current, total))
+        :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
+        :return: None
+        """
+        total_files = len(file_list)
+        current_file = [0]
+
+        with open(str(concat_file), "w+") as file:
+            file.writelines(f"file {interval_file.name}\n" for interval_file in file_list)
+
+        def handle_line(line):
+            """
+            Nested function that reports the progress of the concat
+            :param line: A line of the console output
+            :return: None
+            """
+            if "Auto-inserting" in line and update_concat_progress is not None:
+                current_file[0] += 1
+                update_concat_progress(current_file[0], total_files)
+
+        command = [
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", f"{concat_file.as_posix()}",
+            "-c", "copy",
+            "-y",
+            "-loglevel", "verbose",
+            f"{output_file.as_posix()}"
+        ]
+
+        console_output = await run_process_async(command, metrics, "concat", self.__process_limit,
+                                                 on_line=handle_line)
+
+        if console_output.returncode != 0:
+            raise IOError("Concatenating the rendered intervals failed")
+
+    @staticmethod
+    async def __gather(coroutines: list):
+        """
+        Runs coroutines concurrently, if one fails the others are cancelled (which kills their ffmpeg processes)
+        :param coroutines: List of coroutines
+        :return: None
+        """
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
@@ -1,3 +1,5 @@
+import functools
+import os
 import queue
 import shutil
 import subprocess
@@ -7,8 +9,19 @@ import uuid
 from pathlib import Path
 from types import SimpleNamespace
 
+from unsilence.lib.intervals.Interval import Interval
 from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.metrics.Metrics import measure_stage
+from unsilence.lib.render_media.Passthrough import plan_passthrough, probe_passthrough
+from unsilence.lib.render_media.PipelineMuxer import PipelineMuxer, pipeline_output_options
+from unsilence.lib.render_media.RenderChunkThread import RenderChunkThread
 from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.render_media.RenderJob import RenderJob
+from unsilence.lib.render_media.ThreadCalibration import auto_thread_budget
+from unsilence.lib.render_media.TaskScheduling import makespan_report, order_tasks, probe_frame_duration, \
+    split_long_intervals
+from unsilence.lib.tools.fingerprint import file_fingerprint
+from unsilence.lib.tools.process import process_slot, wait_process
 
 
 class MediaRenderer:
@@ -17,6 +30,11 @@ class MediaRenderer:
     the different intervals at the end
     """
 
+    ENGINES = ("interval", "chunk")
+
+    # How often a waiting render checks that its worker threads are still alive (in seconds)
+    WORKER_CHECK_INTERVAL = 1.0
+
     def __init__(self, temp_path: Path):
         """
         Initializes a new MediaRenderer Object
@@ -29,7 +47,8 @@ class MediaRenderer:
         Renders an input_file and writes the final output to output_file
         :param input_file: The file that should be processed
         :param output_file: Where the processed file should be saved
-        :param intervals: The Intervals that should be processed
+        :param intervals: The Intervals that should be processed, or an iterable of Interval objects in timeline order
+            (e.g. from lib.detect_silence.DetectSilence.detect_silence_iter), which is rendered while it is consumed
         :param kwargs: Keyword Args, see below
         :return: None
 
@@ -40,7 +59,54 @@ class MediaRenderer:
             audible_volume: The volume at which the audible intervals get played back at (float)
             silent_volume: The volume at which the silent intervals get played back at (float)
             drop_corrupted_intervals: Whether corrupted video intervals should be discarded or tried to recover (bool)
-            threads: Number of threads to render simultaneously (int > 0)
+            check_intervals: Whether rendered segments that are shorter than expected should be dropped, the output
+                duration and frame count are reported by the render process itself (see
+                lib.tools.ffmpeg_output.is_complete_output, default False)
+            probe_segments: Whether the rendered segments should be opened again before they are concatenated and the
+                unreadable ones dropped, with one process per batch of segments (see
+                RenderIntervalThread.probe_output_files, default False; can not be combined with pipeline or
+                max_temp_bytes, which mux the segments while rendering)
+            threads: Number of threads to render simultaneously (int > 0), or "auto" to split the usable CPUs
+                (respecting cgroup quotas and the CPU affinity) between render threads and the threads of every ffmpeg
+                process, using the calibrated split of this machine if there is one
+                (see lib.render_media.ThreadCalibration) (default 2)
+            ffmpeg_threads: Number of threads of every ffmpeg process (passed as -threads, default None: ffmpeg
+                decides, set automatically for threads="auto")
+            filter_threads: Number of filter threads of every ffmpeg process (passed as -filter_complex_threads,
+                default None: ffmpeg decides, set automatically for threads="auto")
+            engine: "interval" renders every interval with its own ffmpeg process, "chunk" splits the timeline into
+                one contiguous chunk per thread and renders each chunk with a single filtergraph (default "interval")
+            scheduling: "longest_first" dispatches the intervals with the highest predicted encode cost first,
+                "fifo" dispatches them in timeline order (default "longest_first", streamed intervals are always
+                dispatched in timeline order)
+            max_task_duration: Intervals longer than this are split into sub-intervals, so that no single task
+                dominates the render time (in seconds, default None)
+            passthrough: Whether intervals whose filter would not change anything (speed and volume of 1) should be
+                stream copied instead of re-encoded, their cut points get snapped to keyframes (default False, only
+                used if the source streams match a re-encoded interval, see lib.render_media.Passthrough, and no audio
+                proxy is used)
+            audio_proxy: PCM WAV file with the audio of input_file (see lib.cache.AudioProxyCache.AudioProxyCache),
+                audio only renders cut the intervals from it instead of seeking in input_file (default None)
+            job_dir: Stable directory for a resumable render, it keeps a manifest and the rendered segments, so that a
+                restarted render with the same input and options only renders the missing segments (default None)
+            segment_cache: lib.cache.SegmentCache.SegmentCache, rendered segments are reused from it instead of
+                rendered again and newly rendered segments are added to it (default None)
+            pipeline: Whether the segments should be kept in memory and muxed into the output while rendering,
+                instead of being written to the temp dir and concatenated afterwards (see
+                lib.render_media.PipelineMuxer), the intervals are then dispatched in timeline order (default False,
+                requires the interval engine, complete Intervals, an output suffix with known default codecs and
+                named pipes; can not be combined with job_dir or segment_cache, which keep segment files)
+            max_temp_bytes: Budget for the segment files in the temp dir (in bytes). The segments are muxed into a
+                growing partial output next to output_file as soon as the timeline prefix before them is complete and
+                deleted right away, dispatching new intervals pauses while the finished and the estimated size of the
+                running segments reach the budget (default None: no budget, the segments are concatenated after the
+                render; has the same requirements as pipeline and can not be combined with it)
+            pipeline_window: How many segments may be rendered ahead of the muxer in pipeline mode, this bounds the
+                memory used for finished segments that wait for an earlier one (default 2 * threads)
+            metrics: lib.metrics.Metrics.Metrics that records the render and concat stages, every spawned process and
+                the queue wait and processing time of every task (default None)
+            on_schedule_report: Function that is called with the predicted makespan report
+                (see lib.render_media.TaskScheduling.makespan_report) before rendering starts
             on_render_progress_update: Function that should be called on render progress update
                 (called like: func(current, total))
             on_concat_progress_update: Function that should be called on concat progress update
@@ -52,6 +118,10 @@ class MediaRenderer:
         if not input_file.exists():
             raise FileNotFoundError(f"Input file {input_file} does not exist!")
 
+        engine = kwargs.get("engine", "interval")
+        if engine not in MediaRenderer.ENGINES:
+            raise ValueError(f"Unknown render engine {engine}, choose one of {', '.join(MediaRenderer.ENGINES)}")
+
         render_options = SimpleNamespace(
             audio_only=kwargs.get("audio_only", False),
             audible_speed=kwargs.get("audible_speed", 1),
@@ -60,86 +130,574 @@ class MediaRenderer:
             silent_volume=kwargs.get("silent_volume", 0.5),
             drop_corrupted_intervals=kwargs.get("drop_corrupted_intervals", False),
             check_intervals=kwargs.get("check_intervals", False),
-            minimum_interval_duration=kwargs.get("minimum_interval_duration", 0.25)
+            minimum_interval_duration=kwargs.get("minimum_interval_duration", 0.25),
+            ffmpeg_threads=kwargs.get("ffmpeg_threads", None),
+            filter_threads=kwargs.get("filter_threads", None),
+            audio_proxy=False,
+            pipeline_output=None,
+            segments_in_memory=False
         )
 
-        intervals = intervals.remove_short_intervals_from_start(
-            render_options.audible_speed,
-            render_options.silent_speed
-        )
-
-        video_temp_path = self.__temp_path / str(uuid.uuid4())
-        video_temp_path.mkdir(parents=True)
+        source_file = input_file
+
+        if render_options.audio_only and kwargs.get("audio_proxy", None) is not None:
+            source_file = Path(kwargs["audio_proxy"]).absolute()
+            render_options.audio_proxy = True
+
+        threads = kwargs.get("threads", 2)
+
+        if threads == "auto":
+            budget = auto_thread_budget(render_options.audio_only)
+            threads = budget.workers
+
+            if render_options.ffmpeg_threads is None:
+                render_options.ffmpeg_threads = budget.ffmpeg_threads
+            if render_options.filter_threads is None:
+                render_options.filter_threads = budget.filter_threads
+
+        if isinstance(intervals, Intervals):
+            interval_stream = intervals.remove_short_intervals_from_start(
+                render_options.audible_speed,
+                render_options.silent_speed
+            ).intervals
+        else:
+            interval_stream = Intervals.remove_short_intervals_from_start_iter(
+                intervals,
+                render_options.audible_speed,
+                render_options.silent_speed
+            )
+
+        pipeline = kwargs.get("pipeline", False)
+        max_temp_bytes = kwargs.get("max_temp_bytes", None)
+
+        if pipeline and max_temp_bytes is not None:
+            raise ValueError("max_temp_bytes can not be combined with pipeline mode, which keeps no segment files")
+
+        if kwargs.get("probe_segments", False) and (pipeline or max_temp_bytes is not None):
+            raise ValueError("probe_segments can not be combined with pipeline mode or max_temp_bytes, which mux the "
+                             "segments while rendering")
+
+        if pipeline or max_temp_bytes is not None:
+            render_options.pipeline_output = MediaRenderer.__check_pipeline(
+                output_file, intervals, engine, render_options, kwargs,
+                "Pipeline mode" if pipeline else "A temp budget (max_temp_bytes)"
+            )
+            render_options.segments_in_memory = pipeline
+
+        # Muxed renders write the output while rendering, segments are NUT files (if they are not kept in memory)
+        muxed = render_options.pipeline_output is not None
+        segment_suffix = ".nut" if muxed else output_file.suffix
+
+        render_job = None
+
+        if kwargs.get("job_dir", None) is not None:
+            render_job = RenderJob(kwargs["job_dir"], input_file, dict(
+                vars(render_options),
+                engine=engine,
+                suffix=output_file.suffix,
+                passthrough=kwargs.get("passthrough", False),
+                max_task_duration=kwargs.get("max_task_duration", None),
+                threads=threads if engine == "chunk" else None
+            ))
+            video_temp_path = render_job.job_dir
+        else:
+            video_temp_path = self.__temp_path / str(uuid.uuid4())
+            video_temp_path.mkdir(parents=True)
 
         concat_file = video_temp_path / "concat_list.txt"
         final_output = video_temp_path / f"out_final{output_file.suffix}"
 
-        file_list = []
-
-        thread_lock = threading.Lock()
+        metrics = kwargs.get("metrics", None)
+        segment_cache = kwargs.get("segment_cache", None)
+
+        if segment_cache is not None:
+            input_fingerprint = file_fingerprint(input_file)
+
+        # Everything the render loop shares with the callbacks of the worker threads and the muxer, the lists and
+        # counters are guarded by state.condition
+        state = SimpleNamespace(
+            condition=threading.Condition(),
+            render_options=render_options,
+            output_suffix=output_file.suffix,
+            render_job=render_job,
+            segment_cache=segment_cache,
+            segment_keys={},
+            tasks=[],
+            completed_tasks=[],
+            corrupted_intervals=[],
+            task_errors=[],
+            thread_list=[],
+            worker_count=threads,
+            muxer=None,
+            segment_count=None,
+            muxed_segments=0,
+            pipeline_window=None,
+            max_temp_bytes=max_temp_bytes,
+            # Segment files that are finished but not yet muxed (in bytes) and the estimate for the running ones
+            pending_bytes=0,
+            segment_sizes={},
+            running=0,
+            rendered=0,
+            rendered_bytes=0,
+            on_render_progress_update=kwargs.get("on_render_progress_update", None),
+            on_concat_progress_update=kwargs.get("on_concat_progress_update", None)
+        )
         task_queue = queue.Queue()
-        thread_list = []
-        completed_tasks = []
-        corrupted_intervals = []
 
-        def handle_thread_completed_task(completed_task, corrupted):
-            """
-            Nested function that is called when a thread completes it current task
-            :param completed_task: The completed task
-            :param corrupted: If the task contained a corrupted media part
-            :return: None
-            """
-            func = kwargs.get("on_render_progress_update", None)
+        if engine == "chunk":
+            task_generator = MediaRenderer.__generate_chunk_tasks(
+                list(interval_stream), threads, video_temp_path, output_file.suffix
+            )
+            thread_class = RenderChunkThread
+        else:
+            task_generator = MediaRenderer.__generate_interval_tasks(
+                MediaRenderer.__plan_intervals(
+                    input_file,
+                    output_file,
+                    interval_stream,
+                    render_options,
+                    passthrough=(kwargs.get("passthrough", False) and isinstance(intervals, Intervals)
+                                 and not render_options.audio_proxy),
+                    max_task_duration=kwargs.get("max_task_duration", None),
+                    temp_path=video_temp_path,
+                    metrics=metrics
+                ),
+                video_temp_path,
+                segment_suffix
+            )
+            thread_class = RenderIntervalThread
+
+            if isinstance(intervals, Intervals):
+                timeline_tasks = list(task_generator)
+
+                if kwargs.get("scheduling", "longest_first") == "longest_first" and not muxed:
+                    ordered_tasks = order_tasks(timeline_tasks, render_options)
+                else:
+                    ordered_tasks = timeline_tasks
+
+                if kwargs.get("on_schedule_report", None) is not None:
+                    kwargs["on_schedule_report"](
+                        makespan_report(timeline_tasks, ordered_tasks, render_options, threads)
+                    )
+
+                # Muxed renders always have complete Intervals (see __check_pipeline)
+                state.segment_count = len(ordered_tasks)
+                task_generator = iter(ordered_tasks)
+
+        if muxed:
+            # The output grows next to output_file, so that the final move is a rename
+            partial_output = output_file.with_name(f".{output_file.stem}.{uuid.uuid4().hex[:8]}.partial"
+                                                   f"{output_file.suffix}")
+            state.muxer = PipelineMuxer(video_temp_path, partial_output, state.segment_count,
+                                        on_segment_muxed=functools.partial(MediaRenderer.__handle_segment_muxed,
+                                                                           state),
+                                        on_failed=functools.partial(MediaRenderer.__handle_failed_task, state, None),
+                                        metrics=metrics)
+            state.muxer.start()
+            state.pipeline_window = kwargs.get("pipeline_window", None) or 2 * threads
+
+        for i in range(threads):
+            thread = thread_class(i, source_file, render_options, task_queue,
+                                  on_task_completed=functools.partial(MediaRenderer.__handle_completed_task, state),
+                                  on_task_failed=functools.partial(MediaRenderer.__handle_failed_task, state),
+                                  metrics=metrics)
+            thread.start()
+            state.thread_list.append(thread)
+
+        rendered = False
+
+        with measure_stage(metrics, "render", workers=len(state.thread_list)):
+            try:
+                for task in task_generator:
+                    with state.condition:
+                        if len(state.task_errors) > 0:
+                            break
+
+                        state.tasks.append(task)
+
+                    if render_job is not None and render_job.is_completed(task):
+                        MediaRenderer.__handle_completed_task(state, task, False, reused=True)
+                        continue
+
+                    if segment_cache is not None:
+                        state.segment_keys[task.task_id] = segment_cache.key(input_fingerprint, task, render_options,
+                                                                             output_file.suffix)
+
+                        if segment_cache.fetch(state.segment_keys[task.task_id], task.interval_output_file,
+                                               output_file.suffix):
+                            if render_job is not None:
+                                with state.condition:
+                                    render_job.record(task, True)
+
+                            MediaRenderer.__handle_completed_task(state, task, False, reused=True)
+                            continue
+
+                        try:
+                            # The file may be a hard link to a cache entry (left by an interrupted resumable render),
+                            # ffmpeg must not overwrite it in place
+                            task.interval_output_file.unlink()
+                        except FileNotFoundError:
+                            pass
+
+                    if state.muxer is not None:
+                        with state.condition:
+                            MediaRenderer.__wait_for_workers(
+                                state, functools.partial(MediaRenderer.__dispatch_allowed, state, task)
+                            )
+                            state.running += 1
+
+                    task.queued_at = time.perf_counter()
+                    task_queue.put(task)
+
+                with state.condition:
+                    MediaRenderer.__wait_for_workers(
+                        state, lambda: len(state.completed_tasks) + len(state.corrupted_intervals) == len(state.tasks)
+                    )
+
+                rendered = True
+            finally:
+                MediaRenderer.__drain_queue(task_queue)
+
+                for thread in state.thread_list:
+                    thread.stop()
+
+                if state.muxer is not None and (len(state.task_errors) > 0 or not rendered):
+                    state.muxer.abort()
+                    MediaRenderer.__remove_file(partial_output)
+
+        if len(state.task_errors) > 0:
+            raise state.task_errors[0]
+
+        completed_tasks = state.completed_tasks
+
+        if state.muxer is not None:
+            try:
+                with measure_stage(metrics, "concat"):
+                    state.muxer.finish(len(state.tasks))
+            except Exception:
+                MediaRenderer.__remove_file(partial_output)
+                raise
+
+            os.replace(partial_output, output_file)
+        else:
+            if kwargs.get("probe_segments", False):
+                with measure_stage(metrics, "probe_segments"):
+                    invalid_files = RenderIntervalThread.probe_output_files(
+                        [task.interval_output_file for task in sorted(completed_tasks, key=lambda x: x.task_id)],
+                        metrics
+                    )
+
+                state.corrupted_intervals.extend(task for task in completed_tasks
+                                                 if task.interval_output_file in invalid_files)
+                completed_tasks = [task for task in completed_tasks if task.interval_output_file not in invalid_files]
+
+            completed_file_list = [
+                task.interval_output_file for task in sorted(completed_tasks, key=lambda x: x.task_id)
+            ]
+
+            with measure_stage(metrics, "concat"):
+                MediaRenderer.__concat_intervals(
+                    completed_file_list,
+                    concat_file,
+                    final_output,
+                    state.on_concat_progress_update,
+                    metrics
+                )
+
+            MediaRenderer.move_output(final_output, output_file)
+
+        if render_job is not None:
+            render_job.remove()
+        else:
+            shutil.rmtree(video_temp_path)
 
-            thread_lock.acquire()
+    @staticmethod
+    def __handle_completed_task(state: SimpleNamespace, completed_task: SimpleNamespace, corrupted: bool,
+                                reused=False):
+        """
+        Is called when a thread completes its current task, or for a segment that was not rendered again
+        :param state: The state of the render (see render)
+        :param completed_task: The completed task
+        :param corrupted: If the task contained a corrupted media part
+        :param reused: If the segment was not rendered, but reused from a previous resumable render or the segment
+            cache
+        :return: None
+        """
+        muxer = state.muxer
+
+        if state.segment_cache is not None and not corrupted and not reused and \
+                not getattr(completed_task, "unfiltered", False):
+            state.segment_cache.save(state.segment_keys[completed_task.task_id], completed_task.interval_output_file,
+                                     state.output_suffix)
+
+        if muxer is not None and state.render_options.segments_in_memory:
+            muxer.add_segment(completed_task.task_id, None if corrupted else completed_task.segment_data)
+            # The muxer holds the segment until it is written, the task must not keep it alive afterwards
+            completed_task.segment_data = None
+        elif muxer is not None:
+            segment_size = 0
+
+            if corrupted:
+                MediaRenderer.__remove_file(completed_task.interval_output_file)
+            else:
+                segment_size = completed_task.interval_output_file.stat().st_size
+
+            with state.condition:
+                state.running -= 1
+                state.pending_bytes += segment_size
+                state.segment_sizes[completed_task.task_id] = segment_size
+
+                if not corrupted:
+                    state.rendered += 1
+                    state.rendered_bytes += segment_size
+
+            muxer.add_segment(completed_task.task_id, None if corrupted else completed_task.interval_output_file)
+
+        with state.condition:
+            if state.render_job is not None and not reused:
+                state.render_job.record(completed_task, not corrupted)
 
             if not corrupted:
-                completed_tasks.append(completed_task)
-                if func is not None:
-                    func(len(completed_tasks), len(intervals.intervals))
+                state.completed_tasks.append(completed_task)
+                if state.on_render_progress_update is not None:
+                    state.on_render_progress_update(len(state.completed_tasks), len(state.tasks))
             else:
-                corrupted_intervals.append(completed_task)
+                state.corrupted_intervals.append(completed_task)
 
-            thread_lock.release()
+            state.condition.notify_all()
 
-        for i in range(kwargs.get("threads", 2)):
-            thread = RenderIntervalThread(i, input_file, render_options, task_queue, thread_lock,
-                                          on_task_completed=handle_thread_completed_task)
-            thread.start()
-            thread_list.append(thread)
+    @staticmethod
+    def __handle_failed_task(state: SimpleNamespace, failed_task: SimpleNamespace, error: Exception):
+        """
+        Is called when processing a task raised an exception in a thread, or when the muxer failed
+        :param state: The state of the render (see render)
+        :param failed_task: The failed task (None for the muxer)
+        :param error: The raised exception
+        :return: None
+        """
+        with state.condition:
+            state.task_errors.append(error)
+            state.condition.notify_all()
+
+    @staticmethod
+    def __handle_segment_muxed(state: SimpleNamespace, task_id: int):
+        """
+        Is called when the muxer has written a segment to the output
+        :param state: The state of the render (see render)
+        :param task_id: ID of the task of the segment
+        :return: None
+        """
+        with state.condition:
+            state.muxed_segments += 1
+            state.pending_bytes -= state.segment_sizes.pop(task_id, 0)
+            muxed_segments = state.muxed_segments
+            state.condition.notify_all()
+
+        if state.on_concat_progress_update is not None:
+            state.on_concat_progress_update(muxed_segments, state.segment_count)
+
+    @staticmethod
+    def __dispatch_allowed(state: SimpleNamespace, task: SimpleNamespace):
+        """
+        Decides whether a task may be dispatched to the threads of a muxed render (call with state.condition held): in
+        pipeline mode at most state.pipeline_window segments ahead of the muxer, with a temp budget while the pending
+        segment files and the estimated size of the running and the new segment fit into it. The segment the muxer
+        waits for is always dispatched, so that the render can not stall
+        :param state: The state of the render (see render)
+        :param task: The task
+        :return: Whether the task may be dispatched
+        """
+        if state.render_options.segments_in_memory:
+            return task.task_id < state.muxed_segments + state.pipeline_window
 
-        for i, interval in enumerate(intervals.intervals):
-            current_file_name = f"out_{i}{output_file.suffix}"
-            current_path = video_temp_path / current_file_name
+        if task.task_id == state.muxed_segments:
+            return True
 
-            file_list.append(current_path)
+        if state.rendered == 0:
+            # Nothing to estimate the segment size from yet
+            return state.running < state.worker_count
 
-            task = SimpleNamespace(task_id=i, interval_output_file=current_path, interval=interval)
+        average_size = state.rendered_bytes / state.rendered
+        return state.pending_bytes + (state.running + 1) * average_size <= state.max_temp_bytes
 
-            thread_lock.acquire()
-            task_queue.put(task)
-            thread_lock.release()
+    @staticmethod
+    def __wait_for_workers(state: SimpleNamespace, predicate):
+        """
+        Waits until the predicate is true or a task failed (call with state.condition held). A worker thread that died
+        without reporting its task counts as a failed task, so the render can not wait forever for it
+        :param state: The state of the render (see render)
+        :param predicate: Function that returns whether the waiting is over
+        :return: None
+        """
+        while not state.condition.wait_for(lambda: len(state.task_errors) > 0 or predicate(),
+                                           timeout=MediaRenderer.WORKER_CHECK_INTERVAL):
+            if not all(thread.is_alive() for thread in state.thread_list):
+                state.task_errors.append(RuntimeError("A render thread stopped unexpectedly"))
+                return
 
-        while len(completed_tasks) < (len(intervals.intervals) - len(corrupted_intervals)):
-            time.sleep(0.5)
+    @staticmethod
+    def __check_pipeline(output_file: Path, intervals, engine: str, render_options: SimpleNamespace, kwargs: dict,
+                         mode: str):
+        """
+        Checks whether a render can mux the segments while rendering (pipeline mode or a temp budget)
+        :param output_file: Where the processed file should be saved
+        :param intervals: The intervals that should be processed
+        :param engine: The render engine
+        :param render_options: The render options
+        :param kwargs: The keyword args of render()
+        :param mode: Name of the mode for error messages
+        :raises: **ValueError** -- If the segments can not be muxed while rendering
+        :return: The output options of the render threads (see lib.render_media.PipelineMuxer.pipeline_output_options)
+        """
+        if engine != "interval":
+            raise ValueError(f"{mode} requires the interval engine")
 
-        for thread in thread_list:
-            thread.stop()
+        if not isinstance(intervals, Intervals):
+            raise ValueError(f"{mode} requires complete Intervals, streamed intervals are not supported")
 
-        completed_file_list = [task.interval_output_file for task in sorted(completed_tasks, key=lambda x: x.task_id)]
+        if kwargs.get("job_dir", None) is not None or kwargs.get("segment_cache", None) is not None:
+            raise ValueError(f"{mode} can not be combined with job_dir or segment_cache")
 
-        MediaRenderer.__concat_intervals(
-            completed_file_list,
-            concat_file,
-            final_output,
-            kwargs.get("on_concat_progress_update", None)
-        )
+        if not hasattr(os, "mkfifo"):
+            raise ValueError(f"{mode} requires named pipes, which this platform does not support")
 
-        shutil.move(final_output, output_file)
-        shutil.rmtree(video_temp_path)
+        pipeline_output = pipeline_output_options(output_file.suffix, render_options.audio_only)
+
+        if pipeline_output is None:
+            raise ValueError(f"{mode} does not support {output_file.suffix} outputs (with this ffmpeg build)")
+
+        return pipeline_output
 
     @staticmethod
-    def __concat_intervals(file_list: list, concat_file: Path, output_file: Path, update_concat_progress):
+    def move_output(source: Path, destination: Path):
+        """
+        Moves the finished output to its destination, by rename if both are on the same filesystem
+        :param source: The finished output
+        :param destination: Where the output should be saved
+        :return: None
+        """
+        try:
+            os.replace(source, destination)
+        except OSError:
+            # Different filesystems
+            shutil.move(source, destination)
+
+    @staticmethod
+    def __remove_file(file: Path):
+        """
+        Removes a file if it exists
+        :param file: The file
+        :return: None
+        """
+        try:
+            file.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __drain_queue(task_queue: queue.Queue):
+        """
+        Removes all tasks that were not yet taken by a worker
+        :param task_queue: The task queue
+        :return: None
+        """
+        while True:
+            try:
+                task_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def __plan_intervals(input_file: Path, output_file: Path, interval_stream, render_options: SimpleNamespace,
+                         passthrough: bool, max_task_duration: float, temp_path: Path, metrics=None):
+        """
+        Decides which intervals are stream copied (see lib.render_media.Passthrough) and splits the remaining long
+        intervals into sub-intervals
+        :param input_file: The file that should be processed
+        :param output_file: Where the processed file should be saved
+        :param interval_stream: Iterable of the intervals that should be processed
+        :param render_options: The render options
+        :param passthrough: Whether intervals with identity filter parameters should be stream copied
+        :param max_task_duration: Longest allowed interval duration (in seconds), None disables splitting
+        :param temp_path: Where the passthrough reference segment is saved while it is probed
+        :param metrics: lib.metrics.Metrics.Metrics that records the probe processes (optional)
+        :return: Generator of (interval, stream_copy) tuples
+        """
+        if passthrough:
+            passthrough, keyframes = probe_passthrough(input_file, output_file.suffix, render_options.audio_only,
+                                                       temp_path, metrics)
+
+        if passthrough:
+            plan = plan_passthrough(list(interval_stream), keyframes, render_options)
+        else:
+            plan = ((interval, False) for interval in interval_stream)
+
+        frame_duration = None
+        if max_task_duration is not None:
+            frame_duration = probe_frame_duration(input_file, output_file.suffix, render_options.audio_only, metrics)
+
+        for interval, stream_copy in plan:
+            if stream_copy:
+                yield interval, True
+            else:
+                for part in split_long_intervals([interval], max_task_duration, frame_duration, render_options):
+                    yield part, False
+
+    @staticmethod
+    def __generate_interval_tasks(planned_intervals, video_temp_path: Path, suffix: str):
+        """
+        Generates one render task per interval, while the intervals are consumed
+        :param planned_intervals: Iterable of (interval, stream_copy) tuples that should be processed
+        :param video_temp_path: Where the rendered intervals should be saved
+        :param suffix: File suffix of the output
+        :return: Generator of tasks
+        """
+        for i, (interval, stream_copy) in enumerate(planned_intervals):
+            current_path = video_temp_path / f"out_{i}{suffix}"
+            yield SimpleNamespace(task_id=i, interval_output_file=current_path, interval=interval,
+                                  stream_copy=stream_copy)
+
+    @staticmethod
+    def __generate_chunk_tasks(interval_list: list, chunk_count: int, video_temp_path: Path, suffix: str):
+        """
+        Splits the intervals into contiguous chunks of roughly equal input duration and generates one task per chunk
+        :param interval_list: List of the intervals that should be processed
+        :param chunk_count: How many chunks should be generated (at most)
+        :param video_temp_path: Where the rendered chunks should be saved
+        :param suffix: File suffix of the output
+        :return: List of tasks
+        """
+        if len(interval_list) == 0:
+            return []
+
+        total_duration = sum(interval.duration for interval in interval_list)
+        chunk_duration = total_duration / max(1, min(chunk_count, len(interval_list)))
+
+        chunks = [[]]
+        current_duration = 0
+
+        for interval in interval_list:
+            if current_duration >= chunk_duration * len(chunks) and len(chunks) < chunk_count:
+                chunks.append([])
+
+            chunks[-1].append(interval)
+            current_duration += interval.duration
+
+        tasks = []
+
+        for i, chunk in enumerate(chunks):
+            tasks.append(SimpleNamespace(
+                task_id=i,
+                interval_output_file=video_temp_path / f"out_{i}{suffix}",
+                interval=Interval(start=chunk[0].start, end=chunk[-1].end),
+                intervals=chunk
+            ))
+
+        return tasks
+
+    @staticmethod
+    def __concat_intervals(file_list: list, concat_file: Path, output_file: Path, update_concat_progress,
+                           metrics=None):
         """
         Concatenates all interval files to create a finished file
         :param file_list: List of interval files
@@ -147,6 +705,7 @@ class MediaRenderer:
         :param output_file: Where the final output file should be saved
         :param update_concat_progress: A function that is called when a step is finished
             (called like function(current, total))
+        :param metrics: lib.metrics.Metrics.Metrics that records the ffmpeg process (optional)
         :return: None
         """
         total_files = len(file_list)
@@ -166,16 +725,21 @@ class MediaRenderer:
             f"{output_file.as_posix()}"
         ]
 
-        console_output = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True
-        )
-
-        current_file = 0
-        for line in console_output.stdout:
-            if "Auto-inserting" in line:
-                if update_concat_progress is not None:
-                    current_file += 1
-                    update_concat_progress(current_file, total_files)
+        with process_slot(metrics):
+            start_time = time.perf_counter()
+            console_output = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True
+            )
+
+            current_file = 0
+            for line in console_output.stdout:
+                if "Auto-inserting" in line:
+                    if update_concat_progress is not None:
+                        current_file += 1
+                        update_concat_progress(current_file, total_files)
+
+            console_output.stdout.close()
+            wait_process(console_output, start_time, metrics, "concat")
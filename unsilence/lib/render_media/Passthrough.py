@@ -0,0 +1,252 @@
+import subprocess
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.render_media.TaskScheduling import interval_speed
+from unsilence.lib.tools.process import run_process
+
+# Codecs ffmpeg chooses by default for an output suffix, stream copied intervals are only concatenable with the
+# re-encoded ones if the source already uses these codecs
+DEFAULT_VIDEO_CODECS = {
+    ".mp4": ("h264", "aac"),
+    ".m4v": ("h264", "aac"),
+    ".mov": ("h264", "aac"),
+}
+
+DEFAULT_AUDIO_CODECS = {
+    ".mp4": "aac",
+    ".m4a": "aac",
+    ".aac": "aac",
+    ".mp3": "mp3",
+    ".flac": "flac",
+    ".wav": "pcm_s16le",
+}
+
+# Stream parameters a stream copied interval has to share with the re-encoded ones, the concat demuxer takes them from
+# the first segment for all segments
+STREAM_PARAMETERS = {
+    "video": ["codec_name", "profile", "pix_fmt", "width", "height", "time_base"],
+    "audio": ["codec_name", "profile", "sample_rate", "channel_layout", "time_base"],
+}
+
+# Duration of the re-encoded reference segment the stream parameters are compared with (in seconds)
+REFERENCE_DURATION = 0.5
+
+
+def probe_streams(input_file: Path, metrics=None):
+    """
+    Reads the STREAM_PARAMETERS of the first video and first audio stream with ffprobe
+    :param input_file: The file that should be probed
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffprobe processes (optional)
+    :return: Dict with the parameter dicts of the "video" and "audio" stream (None if the file has no such stream)
+    """
+    streams = {}
+
+    for stream_type, stream in [("video", "v:0"), ("audio", "a:0")]:
+        console_output = run_process(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", stream,
+                "-show_entries", "stream=" + ",".join(STREAM_PARAMETERS[stream_type]),
+                "-of", "default=noprint_wrappers=1",
+                str(input_file)
+            ],
+            metrics,
+            "probe_streams",
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        ).stdout
+
+        parameters = {}
+
+        for line in console_output.splitlines():
+            name, separator, value = line.strip().partition("=")
+            if separator and name in STREAM_PARAMETERS[stream_type] and name not in parameters:
+                parameters[name] = value
+
+        streams[stream_type] = parameters if "codec_name" in parameters else None
+
+    return streams
+
+
+def render_reference(input_file: Path, output_suffix: str, audio_only: bool, temp_dir: Path, metrics=None):
+    """
+    Re-encodes the start of the input like an interval with a speed and volume of 1 (see
+    RenderIntervalThread.generate_command) and probes the streams of the rendered segment
+    :param input_file: The input file
+    :param output_suffix: Suffix of the output file
+    :param audio_only: Whether the output is audio only
+    :param temp_dir: Where the segment is saved while it is probed
+    :param metrics: lib.metrics.Metrics.Metrics that records the processes (optional)
+    :return: The stream parameters of the segment (see probe_streams), None if it could not be rendered
+    """
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    reference_file = temp_dir / f"passthrough_reference_{uuid.uuid4()}{output_suffix}"
+
+    render_options = SimpleNamespace(audio_only=audio_only, audible_speed=1, silent_speed=1, audible_volume=1,
+                                     silent_volume=1, ffmpeg_threads=None, filter_threads=None, pipeline_output=None,
+                                     segments_in_memory=False)
+
+    command = RenderIntervalThread.generate_command(input_file, reference_file, Interval(0, REFERENCE_DURATION, False),
+                                                    render_options, True, 0)
+
+    try:
+        if run_process(command, metrics, "passthrough_reference").returncode != 0:
+            return None
+
+        return probe_streams(reference_file, metrics)
+    finally:
+        try:
+            reference_file.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def probe_keyframes(input_file: Path, metrics=None):
+    """
+    Reads the timestamps of all video keyframes (from the packet flags, nothing gets decoded)
+    :param input_file: The file that should be probed
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffprobe process (optional)
+    :return: Sorted list of keyframe times (in seconds)
+    """
+    console_output = run_process(
+        [
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            str(input_file)
+        ],
+        metrics,
+        "probe_keyframes",
+        stdout=subprocess.PIPE,
+        universal_newlines=True
+    ).stdout
+
+    keyframes = []
+
+    for line in console_output.splitlines():
+        values = line.strip().split(",")
+        if len(values) >= 2 and "K" in values[1]:
+            try:
+                keyframes.append(float(values[0]))
+            except ValueError:
+                continue
+
+    return sorted(keyframes)
+
+
+def passthrough_supported(input_file: Path, output_suffix: str, audio_only: bool, temp_dir: Path, metrics=None,
+                          streams: dict = None):
+    """
+    Checks whether stream copied intervals can be concatenated with re-encoded ones for this input and output: the
+    source has to use the codecs ffmpeg chooses for the output suffix, and its streams the same parameters (profile,
+    pixel format, resolution, time base, sample rate, channel layout) as a re-encoded interval (see render_reference)
+    :param input_file: The input file
+    :param output_suffix: Suffix of the output file
+    :param audio_only: Whether the output is audio only
+    :param temp_dir: Where the reference segment is saved while it is probed
+    :param metrics: lib.metrics.Metrics.Metrics that records the processes (optional)
+    :param streams: The result of probe_streams, if it is already known (optional)
+    :return: Whether passthrough can be used
+    """
+    streams = streams if streams is not None else probe_streams(input_file, metrics)
+    codecs = tuple(None if streams[stream_type] is None else streams[stream_type]["codec_name"]
+                   for stream_type in ["video", "audio"])
+    output_suffix = output_suffix.lower()
+
+    if audio_only:
+        stream_types = ["audio"]
+        supported = codecs[1] is not None and DEFAULT_AUDIO_CODECS.get(output_suffix, None) == codecs[1]
+    else:
+        stream_types = ["video", "audio"]
+        supported = codecs == DEFAULT_VIDEO_CODECS.get(output_suffix, None)
+
+    # The reference is only rendered if the codecs already match
+    if not supported:
+        return False
+
+    reference = render_reference(input_file, output_suffix, audio_only, temp_dir, metrics)
+
+    return reference is not None and all(streams[stream_type] == reference[stream_type]
+                                         for stream_type in stream_types)
+
+
+def probe_passthrough(input_file: Path, output_suffix: str, audio_only: bool, temp_dir: Path, metrics=None):
+    """
+    Probes everything plan_passthrough needs for an input and output
+    :param input_file: The input file
+    :param output_suffix: Suffix of the output file
+    :param audio_only: Whether the output is audio only
+    :param temp_dir: Where the reference segment is saved while it is probed (see passthrough_supported)
+    :param metrics: lib.metrics.Metrics.Metrics that records the processes (optional)
+    :return: Tuple (whether passthrough can be used, sorted keyframe times or None if every packet is a keyframe)
+    """
+    streams = probe_streams(input_file, metrics)
+
+    if not passthrough_supported(input_file, output_suffix, audio_only, temp_dir, metrics, streams=streams):
+        return False, None
+
+    # A stream copy seeks to the video keyframe before the cut, even if only the audio of a video is copied
+    return True, None if streams["video"] is None else probe_keyframes(input_file, metrics)
+
+
+def is_identity_interval(interval: Interval, render_options: SimpleNamespace):
+    """
+    Checks whether the filter of an interval would not change anything (speed and volume of 1)
+    :param interval: The interval
+    :param render_options: The render options (see MediaRenderer.render)
+    :return: Whether the interval can be stream copied
+    """
+    volume = render_options.silent_volume if interval.is_silent else render_options.audible_volume
+    return interval_speed(interval, render_options) == 1 and volume == 1
+
+
+def plan_passthrough(interval_list: list, keyframes: list, render_options: SimpleNamespace):
+    """
+    Decides which intervals get stream copied. Their start is snapped back to the previous keyframe (a stream copy can
+    only start there) and the preceding interval is shortened by the same amount. If that would make the preceding
+    interval too short, the interval is re-encoded instead
+    :param interval_list: The intervals in timeline order
+    :param keyframes: Sorted keyframe times, None if every packet is a keyframe (input without video)
+    :param render_options: The render options (see MediaRenderer.render)
+    :return: List of (interval, stream_copy) tuples with adjusted copies of the intervals
+    """
+    planned = [[interval.copy(), False] for interval in interval_list]
+    keyframe_index = 0
+
+    for i, entry in enumerate(planned):
+        interval = entry[0]
+
+        if not is_identity_interval(interval, render_options):
+            continue
+
+        if keyframes is None or i == 0:
+            entry[1] = keyframes is None or interval.start in keyframes
+            continue
+
+        while keyframe_index < len(keyframes) - 1 and keyframes[keyframe_index + 1] <= interval.start:
+            keyframe_index += 1
+
+        if len(keyframes) == 0 or keyframes[keyframe_index] > interval.start:
+            continue
+
+        keyframe = keyframes[keyframe_index]
+        previous_interval = planned[i - 1][0]
+        previous_speed = interval_speed(previous_interval, render_options)
+
+        if keyframe <= previous_interval.start:
+            continue
+
+        if planned[i - 1][1] or \
+                (keyframe - previous_interval.start) / previous_speed >= render_options.minimum_interval_duration:
+            previous_interval.end = keyframe
+            interval.start = keyframe
+            entry[1] = True
+
+    return [(interval, stream_copy) for interval, stream_copy in planned]
@@ -0,0 +1,253 @@
+import errno
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from unsilence.lib.render_media.Passthrough import DEFAULT_AUDIO_CODECS, DEFAULT_VIDEO_CODECS
+from unsilence.lib.tools.ffmpeg_capabilities import has_encoder
+from unsilence.lib.tools.process import wait_process
+
+# Encoders that produce the codecs ffmpeg chooses by default for an output suffix (see Passthrough), segments that are
+# piped through NUT need them set explicitly, NUT's own defaults differ
+ENCODERS = {
+    "h264": "libx264",
+    "aac": "aac",
+    "mp3": "libmp3lame",
+    "flac": "flac",
+    "pcm_s16le": "pcm_s16le",
+}
+
+
+def pipeline_output_options(output_suffix: str, audio_only: bool):
+    """
+    Generates the output options that make a render thread write its segment as NUT, encoded with the codecs the
+    output file would get by default (the render thread appends the target, stdout or a segment file)
+    :param output_suffix: Suffix of the output file
+    :param audio_only: Whether the output is audio only
+    :return: List of command line options, None if the muxer does not support the output suffix (or ffmpeg lacks
+        one of its encoders)
+    """
+    output_suffix = output_suffix.lower()
+
+    if audio_only:
+        if output_suffix not in DEFAULT_AUDIO_CODECS:
+            return None
+
+        encoders = {"-c:a": ENCODERS[DEFAULT_AUDIO_CODECS[output_suffix]]}
+    else:
+        if output_suffix not in DEFAULT_VIDEO_CODECS:
+            return None
+
+        video_codec, audio_codec = DEFAULT_VIDEO_CODECS[output_suffix]
+        encoders = {"-c:v": ENCODERS[video_codec], "-c:a": ENCODERS[audio_codec]}
+
+    if not all(has_encoder(encoder) for encoder in encoders.values()):
+        return None
+
+    return [part for option in encoders.items() for part in option] + ["-f", "nut"]
+
+
+class PipelineMuxer(threading.Thread):
+    """
+    Muxes rendered segments into the output file while the render is still running. A long-lived ffmpeg process reads
+    the segments with the concat demuxer from a list of named pipes (slots), this thread writes the segments into the
+    slots in timeline order. A segment is either held in memory by the renderer or a segment file, which is deleted as
+    soon as it is written, so the output grows from the completed prefix of the timeline. Dropped segments are skipped,
+    unused slots at the end are closed empty, which ends the input of the muxing process
+    """
+
+    def __init__(self, pipe_dir: Path, output_file: Path, slot_count: int, **kwargs):
+        """
+        Creates the named pipes and starts the muxing process (is run in daemon mode)
+        :param pipe_dir: Existing directory where the named pipes and the concat list are created
+        :param output_file: Where the muxed file should be saved
+        :param slot_count: Number of segments that will be added (the highest task_id + 1)
+        :param kwargs: Keyword Args, see below
+
+        kwargs:
+            on_segment_muxed: Function that is called after a segment was written to the muxing process or skipped
+                (called like: func(task_id))
+            on_failed: Function that is called when the muxing process could not take a segment
+                (called like: func(exception))
+            metrics: lib.metrics.Metrics.Metrics that records the muxing process
+        """
+        super().__init__()
+        self.daemon = True
+        self.__slot_count = slot_count
+        self.__on_segment_muxed = kwargs.get("on_segment_muxed", None)
+        self.__on_failed = kwargs.get("on_failed", None)
+        self.__metrics = kwargs.get("metrics", None)
+        self.__condition = threading.Condition()
+        self.__segments = {}
+        self.__segment_count = None
+        self.__aborted = False
+        self.__log = deque(maxlen=20)
+
+        self.__slots = [pipe_dir / f"slot_{i}.nut" for i in range(slot_count)]
+
+        for slot in self.__slots:
+            os.mkfifo(slot)
+
+        concat_file = pipe_dir / "concat_list.txt"
+
+        with open(concat_file, "w+") as file:
+            file.writelines(f"file {slot.name}\n" for slot in self.__slots)
+
+        command = [
+            "ffmpeg",
+            "-nostdin",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", f"{concat_file.as_posix()}",
+            "-c", "copy",
+            "-y",
+            "-loglevel", "error",
+            f"{output_file.as_posix()}"
+        ]
+
+        self.__start_time = time.perf_counter()
+        self.__process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                          universal_newlines=True)
+
+        self.__log_thread = threading.Thread(target=self.__read_log, daemon=True)
+        self.__log_thread.start()
+
+    def add_segment(self, task_id: int, data):
+        """
+        Hands a rendered segment to the muxer
+        :param task_id: Position of the segment in the timeline
+        :param data: The segment (NUT) as bytes or as a Path of a segment file, which is deleted after it is muxed,
+            None if the segment was dropped
+        :return: None
+        """
+        with self.__condition:
+            self.__segments[task_id] = data
+            self.__condition.notify_all()
+
+    def finish(self, segment_count: int):
+        """
+        Tells the muxer how many segments there are and waits until they are muxed
+        :param segment_count: Number of segments (including dropped ones)
+        :raises: **IOError** -- If the muxing process failed
+        :return: None
+        """
+        with self.__condition:
+            self.__segment_count = segment_count
+            self.__condition.notify_all()
+
+        self.join()
+        self.__log_thread.join()
+
+        wait_process(self.__process, self.__start_time, self.__metrics, "concat")
+
+        if self.__process.returncode != 0:
+            raise IOError(f"Muxing the rendered segments failed: {' '.join(self.__log)}")
+
+    def abort(self):
+        """
+        Stops the muxing process (after a failed render)
+        :return: None
+        """
+        with self.__condition:
+            self.__aborted = True
+            self.__segment_count = 0
+            self.__condition.notify_all()
+
+        self.__process.kill()
+
+    def run(self):
+        """
+        Writes the segments into the slots in timeline order
+        :return: None
+        """
+        next_task_id = 0
+        used_slots = 0
+
+        try:
+            while True:
+                with self.__condition:
+                    self.__condition.wait_for(
+                        lambda: next_task_id in self.__segments or self.__segment_count is not None
+                    )
+
+                    if self.__aborted:
+                        return
+
+                    if next_task_id not in self.__segments and next_task_id >= self.__segment_count:
+                        break
+
+                    # After finish() every segment was added, a missing one was never rendered and is skipped
+                    data = self.__segments.pop(next_task_id, None)
+
+                if data is not None:
+                    self.__write_slot(self.__slots[used_slots], data)
+                    used_slots += 1
+
+                if self.__on_segment_muxed is not None:
+                    self.__on_segment_muxed(next_task_id)
+
+                next_task_id += 1
+
+            if used_slots == 0:
+                raise IOError("No segment was rendered")
+
+            if used_slots < self.__slot_count:
+                # An empty slot can not be opened by the concat demuxer, which ends its input
+                self.__write_slot(self.__slots[used_slots], b"")
+        except Exception as error:
+            self.__process.kill()
+
+            if self.__aborted:
+                return
+
+            if self.__on_failed is None:
+                raise
+
+            self.__on_failed(error)
+
+    def __write_slot(self, slot: Path, data):
+        """
+        Writes a segment into a slot, waits until the muxing process opens the slot
+        :param slot: The named pipe
+        :param data: The segment as bytes or as a Path of a segment file
+        :return: None
+        """
+        while True:
+            try:
+                # Non-blocking, so that a failed muxing process does not block this thread forever
+                fd = os.open(slot, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as error:
+                if error.errno != errno.ENXIO:
+                    raise
+
+                if self.__process.poll() is not None:
+                    raise IOError(f"Muxing the rendered segments failed: {' '.join(self.__log)}")
+
+                time.sleep(0.005)
+
+        os.set_blocking(fd, True)
+
+        with open(fd, "wb") as file:
+            if isinstance(data, Path):
+                with open(data, "rb") as segment_file:
+                    shutil.copyfileobj(segment_file, file, 1024 * 1024)
+
+                # The segment is part of the output now, its temp space is freed right away
+                data.unlink()
+            else:
+                file.write(data)
+
+    def __read_log(self):
+        """
+        Keeps the last lines of the muxing process log (for error messages)
+        :return: None
+        """
+        for line in self.__process.stderr:
+            self.__log.append(line.strip())
+
+        self.__process.stderr.close()
@@ -0,0 +1,166 @@
+import pathlib
+import queue
+import subprocess
+from types import SimpleNamespace
+
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.tools.ffmpeg_capabilities import atempo_filter
+from unsilence.lib.tools.ffmpeg_output import is_complete_output, is_filter_error, output_collector, with_progress
+from unsilence.lib.tools.process import run_process
+
+
+class RenderChunkThread(RenderIntervalThread):
+    """
+    Worker thread that renders a whole chunk (a contiguous list of intervals) with a single ffmpeg process, using a
+    trim/atrim + setpts/atempo + concat filtergraph
+    """
+
+    def __init__(self, thread_id, input_file: pathlib.Path, render_options: SimpleNamespace, task_queue: queue.Queue,
+                 **kwargs):
+        """
+        Initializes a new Worker (is run in daemon mode)
+        :param thread_id: ID of this thread
+        :param input_file: The file the worker should work on
+        :param render_options: The parameters on how the video should be processed
+        :param task_queue: A queue object where the worker blocks until it gets more tasks
+        :param kwargs: Keyword Args, see RenderIntervalThread
+        """
+        super().__init__(thread_id, input_file, render_options, task_queue, **kwargs)
+        self.__input_file = input_file
+        self.__render_options = render_options
+        self.__metrics = kwargs.get("metrics", None)
+
+    def process_task(self, task: SimpleNamespace):
+        """
+        Renders a chunk task (task.intervals) into task.interval_output_file
+        :param task: The task that should be processed
+        :return: Whether the task was completed successfully
+        """
+        return self.__render_chunk(task)
+
+    def __render_chunk(self, task: SimpleNamespace):
+        """
+        Renders all intervals of a chunk with one ffmpeg process
+        :param task: The chunk task
+        :return: Whether the chunk was rendered. With render_options.check_intervals the chunk also has to be complete
+            (see lib.tools.ffmpeg_output.is_complete_output), otherwise it counts as corrupted
+        """
+        filter_script = task.interval_output_file.with_suffix(".filter.txt")
+
+        with open(filter_script, "w+") as file:
+            file.write(self.__generate_filter_graph(task.interval.start, task.intervals))
+
+        command = [
+            "ffmpeg",
+            "-ss", f"{task.interval.start}",
+            "-to", f"{task.interval.end}",
+            *RenderIntervalThread.thread_options(self.__render_options),
+            "-i", f"{self.__input_file}",
+            "-vsync", "1",
+            "-async", "1",
+            "-ignore_unknown", "-y",
+            "-filter_complex_script", f"{filter_script}",
+        ]
+
+        if not self.__render_options.audio_only:
+            command.extend(["-map", "[v]"])
+
+        command.extend(["-map", "[a]"])
+
+        if self.__render_options.ffmpeg_threads is not None:
+            command.extend(["-threads", str(self.__render_options.ffmpeg_threads)])
+
+        command.append(str(task.interval_output_file))
+
+        handle_line, output = output_collector()
+
+        output.returncode = run_process(
+            with_progress(command),
+            self.__metrics,
+            "render_chunk",
+            stderr=subprocess.PIPE,
+            on_error_line=handle_line
+        ).returncode
+
+        filter_script.unlink()
+
+        if is_filter_error(output):
+            raise ValueError("Invalid render options")
+
+        if output.returncode != 0:
+            if self.__render_options.drop_corrupted_intervals:
+                return False
+
+            raise IOError(f"Input file is corrupted between {task.interval.start} and {task.interval.end} "
+                          f"(in seconds): {RenderIntervalThread.last_error(output)}")
+
+        if self.__render_options.check_intervals:
+            return is_complete_output(
+                output,
+                sum(RenderIntervalThread.output_duration(interval, self.__render_options)
+                    for interval in task.intervals),
+                not self.__render_options.audio_only,
+                cuts=len(task.intervals)
+            )
+
+        return True
+
+    def __generate_filter_graph(self, chunk_start: float, intervals: list):
+        """
+        Generates the filtergraph that cuts, speeds up and concatenates all intervals of a chunk
+        :param chunk_start: The time in the input where the chunk starts (the input is seeked to this point)
+        :param intervals: The intervals of the chunk
+        :return: filtergraph string
+        """
+        audio_only = self.__render_options.audio_only
+        count = len(intervals)
+        complex_filter = []
+
+        if count > 1:
+            if not audio_only:
+                complex_filter.append("[0:v]split=" + str(count) + "".join(f"[vin{i}]" for i in range(count)))
+            complex_filter.append("[0:a]asplit=" + str(count) + "".join(f"[ain{i}]" for i in range(count)))
+            video_inputs = [f"[vin{i}]" for i in range(count)]
+            audio_inputs = [f"[ain{i}]" for i in range(count)]
+        else:
+            video_inputs = ["[0:v]"]
+            audio_inputs = ["[0:a]"]
+
+        concat_inputs = []
+
+        for i, interval in enumerate(intervals):
+            if interval.is_silent:
+                current_speed = self.__render_options.silent_speed
+                current_volume = self.__render_options.silent_volume
+            else:
+                current_speed = self.__render_options.audible_speed
+                current_volume = self.__render_options.audible_volume
+
+            current_speed = RenderIntervalThread.clamp_speed(
+                interval.duration,
+                current_speed,
+                self.__render_options.minimum_interval_duration
+            )
+
+            start = round(interval.start - chunk_start, 6)
+            end = round(interval.end - chunk_start, 6)
+
+            if not audio_only:
+                complex_filter.append(
+                    f"{video_inputs[i]}trim=start={start}:end={end},"
+                    f"setpts={round(1 / current_speed, 4)}*(PTS-STARTPTS)[v{i}]"
+                )
+                concat_inputs.append(f"[v{i}]")
+
+            complex_filter.append(
+                f"{audio_inputs[i]}atrim=start={start}:end={end},asetpts=PTS-STARTPTS,"
+                f"{atempo_filter(current_speed)},volume={current_volume}[a{i}]"
+            )
+            concat_inputs.append(f"[a{i}]")
+
+        if audio_only:
+            complex_filter.append("".join(concat_inputs) + f"concat=n={count}:v=0:a=1[a]")
+        else:
+            complex_filter.append("".join(concat_inputs) + f"concat=n={count}:v=1:a=1[v][a]")
+
+        return ";\n".join(complex_filter)
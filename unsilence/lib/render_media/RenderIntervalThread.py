@@ -2,9 +2,14 @@ import pathlib
 import queue
 import subprocess
 import threading
+import time
 from types import SimpleNamespace
 
 from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.tools.ffmpeg_capabilities import atempo_filter
+from unsilence.lib.tools.ffmpeg_output import duration_matches, is_complete_output, is_filter_error, output_collector, \
+    output_seconds, with_progress
+from unsilence.lib.tools.process import run_process
 
 
 class RenderIntervalThread(threading.Thread):
@@ -12,122 +17,223 @@ class RenderIntervalThread(threading.Thread):
     Worker thread that can render/process intervals based on defined options
     """
 
+    STOP = object()
+
+    # How many segment files a single process checks at most (see probe_output_files)
+    PROBE_BATCH_SIZE = 100
+
+    # A stream copy starts at the last keyframe before its seek point. The keyframe times are rounded to microseconds
+    # by ffprobe, so a copy seeks slightly after the keyframe its interval starts at (in seconds)
+    KEYFRAME_SEEK_OFFSET = 0.000001
+
     def __init__(self, thread_id, input_file: pathlib.Path, render_options: SimpleNamespace, task_queue: queue.Queue,
-                 thread_lock: threading.Lock, **kwargs):
+                 **kwargs):
         """
         Initializes a new Worker (is run in daemon mode)
         :param thread_id: ID of this thread
         :param input_file: The file the worker should work on
         :param render_options: The parameters on how the video should be processed, more details below
-        :param task_queue: A queue object where the worker can get more tasks
-        :param thread_lock: A thread lock object to acquire and release thread locks
+        :param task_queue: A queue object where the worker blocks until it gets more tasks
         :param kwargs: Keyword Args, see below for more information
+
+        kwargs:
+            on_task_completed: Function that is called when a task is finished (called like: func(task, corrupted))
+            on_task_failed: Function that is called when processing a task raised an exception
+                (called like: func(task, exception))
+            metrics: lib.metrics.Metrics.Metrics that records the spawned processes and the processed tasks
         """
         super().__init__()
         self.daemon = True
         self.thread_id = thread_id
         self.task_queue = task_queue
-        self.thread_lock = thread_lock
-        self.__should_exit = False
         self.__input_file = input_file
         self.__on_task_completed = kwargs.get("on_task_completed", None)
+        self.__on_task_failed = kwargs.get("on_task_failed", None)
+        self.__metrics = kwargs.get("metrics", None)
         self.__render_options = render_options
 
     def run(self):
         """
-        Start the worker. Worker runs until stop() is called. It runs in a loop, takes a new task if available, and
-        processes it
+        Start the worker. Worker runs until it receives the stop sentinel (see stop()). It blocks on the task queue,
+        takes the next task and processes it. Exceptions (also the ones of on_task_completed) are passed to
+        on_task_failed instead of ending the worker
         :return: None
         """
-        while not self.__should_exit:
-            self.thread_lock.acquire()
+        while True:
+            task: SimpleNamespace = self.task_queue.get()
 
-            if not self.task_queue.empty():
-                task: SimpleNamespace = self.task_queue.get()
-                self.thread_lock.release()
+            if task is RenderIntervalThread.STOP:
+                break
 
-                completed = self.__render_interval(
-                    task.interval_output_file,
-                    task.interval,
-                    drop_corrupted_intervals=self.__render_options.drop_corrupted_intervals,
-                    minimum_interval_duration=self.__render_options.minimum_interval_duration
-                )
+            start_time = time.perf_counter()
+
+            try:
+                completed = self.process_task(task)
+            except Exception as error:
+                if self.__on_task_failed is None:
+                    raise
 
-                if completed and self.__render_options.check_intervals:
-                    probe_output = subprocess.run(
-                        [
-                            "ffprobe",
-                            "-loglevel", "quiet",
-                            f"{task.interval_output_file}"
-                        ],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.STDOUT
+                self.__on_task_failed(task, error)
+                continue
+            finally:
+                if self.__metrics is not None:
+                    self.__metrics.record_task(
+                        self.thread_id,
+                        task.task_id,
+                        queue_wait=start_time - getattr(task, "queued_at", start_time),
+                        wall_time=time.perf_counter() - start_time
                     )
-                    completed = probe_output.returncode == 0
 
-                if self.__on_task_completed is not None:
-                    self.__on_task_completed(task, not completed)
-            else:
-                self.thread_lock.release()
+            if self.__on_task_completed is None:
+                continue
+
+            try:
+                self.__on_task_completed(task, not completed)
+            except Exception as error:
+                if self.__on_task_failed is None:
+                    raise
+
+                self.__on_task_failed(task, error)
+
+    def process_task(self, task: SimpleNamespace):
+        """
+        Processes a single task taken from the task queue
+        :param task: The task that should be processed
+        :return: Whether the task was completed successfully
+        """
+        completed = False
+
+        if getattr(task, "stream_copy", False):
+            completed = self.__copy_interval(task, task.interval)
+
+        if not completed:
+            completed = self.__render_interval(
+                task,
+                task.interval,
+                drop_corrupted_intervals=self.__render_options.drop_corrupted_intervals,
+                minimum_interval_duration=self.__render_options.minimum_interval_duration
+            )
+
+        return completed
 
     def stop(self):
         """
-        Stops the worker after its current task is finished
-        :return:
+        Queues the stop sentinel, so that a worker exits after the tasks queued before it are taken. Call it once for
+        every worker that shares the task queue
+        :return: None
         """
-        self.__should_exit = True
+        self.task_queue.put(RenderIntervalThread.STOP)
 
-    def __render_interval(self, interval_output_file: pathlib.Path, interval: Interval,
+    def __copy_interval(self, task: SimpleNamespace, interval: Interval):
+        """
+        Copies an interval without re-encoding it (the interval start needs to be on a keyframe)
+        :param task: The task, the segment is saved to task.interval_output_file (or task.segment_data, see
+            RenderIntervalThread.run_output)
+        :param interval: The current Interval that should be processed
+        :return: Whether the stream copy succeeded with the duration of the interval (and is complete, if
+            render_options.check_intervals is set), otherwise the interval has to be re-encoded
+        """
+        command = [
+            "ffmpeg",
+            "-ss", f"{interval.start + RenderIntervalThread.KEYFRAME_SEEK_OFFSET:.6f}",
+            "-to", f"{interval.end}",
+            "-i", f"{self.__input_file}",
+        ]
+
+        if self.__render_options.audio_only:
+            command.extend(["-vn", "-map", "0:a:0"])
+        else:
+            command.extend(["-map", "0:v:0", "-map", "0:a:0"])
+
+        command.extend([
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            "-y"
+        ])
+
+        if self.__render_options.pipeline_output is not None:
+            command.extend(["-f", "nut"])
+
+        command.append(RenderIntervalThread.output_target(task.interval_output_file, self.__render_options))
+
+        output = self.run_output(command, task, self.__render_options, self.__metrics, "stream_copy")
+
+        # The progress of a stream copy counts from the cut point, a copy that started at an earlier keyframe is ruled
+        # out by KEYFRAME_SEEK_OFFSET
+        if output.returncode != 0 or not duration_matches(output_seconds(output), interval.duration):
+            return False
+
+        if self.__render_options.check_intervals:
+            return is_complete_output(output, interval.duration, not self.__render_options.audio_only)
+
+        return True
+
+    def __render_interval(self, task: SimpleNamespace, interval: Interval,
                           apply_filter=True, drop_corrupted_intervals=False, minimum_interval_duration=0.25):
         """
         Renders an interval with the given render options
-        :param interval_output_file: Where the current output file should be saved
+        :param task: The task, the segment is saved to task.interval_output_file (or task.segment_data, see
+            RenderIntervalThread.run_output)
         :param interval: The current Interval that should be processed
         :param apply_filter: Whether the AV-Filter should be applied or if the media interval should be left untouched
         :param drop_corrupted_intervals: Whether to remove corrupted frames from the video or keep them in unedited
-        :return: Whether it is corrupted or not
+        :return: Whether the segment was rendered. With render_options.check_intervals the segment also has to be
+            complete (see lib.tools.ffmpeg_output.is_complete_output), otherwise it counts as corrupted
         """
 
-        command = self.__generate_command(interval_output_file, interval, apply_filter, minimum_interval_duration)
+        command = RenderIntervalThread.generate_command(self.__input_file, task.interval_output_file, interval,
+                                                        self.__render_options, apply_filter, minimum_interval_duration)
 
-        console_output = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
+        output = self.run_output(command, task, self.__render_options, self.__metrics, "render_interval")
+
+        if is_filter_error(output):
+            raise ValueError("Invalid render options")
 
-        if "Conversion failed!" in str(console_output.stdout).splitlines()[-1]:
+        if output.returncode != 0:
             if drop_corrupted_intervals:
                 return False
             if apply_filter:
-                self.__render_interval(
-                    interval_output_file,
+                # The segment is not sped up, it must not be reused as the rendered interval (see SegmentCache.key)
+                task.unfiltered = True
+                return self.__render_interval(
+                    task,
                     interval,
                     apply_filter=False,
                     drop_corrupted_intervals=drop_corrupted_intervals,
                     minimum_interval_duration=minimum_interval_duration
                 )
-            else:
-                raise IOError(f"Input file is corrupted between {interval.start} and {interval.end} (in seconds)")
 
-        if "Error initializing complex filter" in str(console_output.stdout):
-            raise ValueError("Invalid render options")
+            raise IOError(f"Input file is corrupted between {interval.start} and {interval.end} (in seconds): "
+                          f"{RenderIntervalThread.last_error(output)}")
+
+        if self.__render_options.check_intervals:
+            return is_complete_output(
+                output,
+                RenderIntervalThread.output_duration(interval, self.__render_options, apply_filter),
+                not self.__render_options.audio_only
+            )
 
         return True
 
-    def __generate_command(self, interval_output_file: pathlib.Path, interval: Interval, apply_filter: bool, minimum_interval_duration: float):
+    @staticmethod
+    def generate_command(input_file: pathlib.Path, interval_output_file: pathlib.Path, interval: Interval,
+                         render_options: SimpleNamespace, apply_filter: bool, minimum_interval_duration: float):
         """
         Generates the ffmpeg command to process the video
+        :param input_file: The file that should be processed
         :param interval_output_file: Where the media interval should be saved
         :param interval: The current interval
+        :param render_options: The render options
         :param apply_filter: Whether a filter should be applied or not
+        :param minimum_interval_duration: Minimum duration of the interval after the speed up
         :return: ffmpeg console command
         """
         command = [
             "ffmpeg",
             "-ss", f"{interval.start}",
             "-to", f"{interval.end}",
-            "-i", f"{self.__input_file}",
+            *RenderIntervalThread.thread_options(render_options),
+            "-i", f"{input_file}",
             "-vsync", "1",
             "-async", "1",
             "-safe", "0",
@@ -138,39 +244,194 @@ class RenderIntervalThread(threading.Thread):
             complex_filter = []
 
             if interval.is_silent:
-                current_speed = self.__render_options.silent_speed
-                current_volume = self.__render_options.silent_volume
+                current_speed = render_options.silent_speed
+                current_volume = render_options.silent_volume
             else:
-                current_speed = self.__render_options.audible_speed
-                current_volume = self.__render_options.audible_volume
+                current_speed = render_options.audible_speed
+                current_volume = render_options.audible_volume
 
             current_speed = RenderIntervalThread.clamp_speed(interval.duration, current_speed, minimum_interval_duration)
 
-            if not self.__render_options.audio_only:
+            if not render_options.audio_only:
                 complex_filter.extend([
                     f"[0:v]setpts={round(1 / current_speed, 4)}*PTS[v]",
                 ])
 
+            # Every filtered segment (not only the parts of split intervals) is cut to the exact duration of the sped
+            # up interval, with padded audio. Otherwise the frame rounding of the input cut (video) and the encoder
+            # padding (audio only) add up over the concatenated segments and the output drifts from the timeline
             complex_filter.extend([
-                f"[0:a]atempo={round(current_speed, 4)},volume={current_volume}[a]",
+                f"[0:a]{atempo_filter(current_speed)},volume={current_volume},apad[a]",
             ])
 
             command.extend(
                 ["-filter_complex", ";".join(complex_filter)]
             )
 
-            if not self.__render_options.audio_only:
+            if not render_options.audio_only:
                 command.extend(["-map", "[v]"])
 
-            command.extend(["-map", "[a]"])
+            command.extend(["-map", "[a]", "-t", f"{interval.duration / current_speed}"])
         else:
-            if self.__render_options.audio_only:
+            if render_options.audio_only:
                 command.append("-vn")
 
-        command.append(str(interval_output_file))
+        if render_options.ffmpeg_threads is not None:
+            command.extend(["-threads", str(render_options.ffmpeg_threads)])
+
+        if render_options.pipeline_output is not None:
+            command.extend(render_options.pipeline_output)
+
+        command.append(RenderIntervalThread.output_target(interval_output_file, render_options))
 
         return command
 
+    @staticmethod
+    def output_target(interval_output_file: pathlib.Path, render_options: SimpleNamespace):
+        """
+        Generates the output target of an ffmpeg command that renders a segment
+        :param interval_output_file: Where the segment should be saved
+        :param render_options: The render options
+        :return: stdout if the segments are kept in memory (render_options.segments_in_memory), else the file path
+        """
+        if render_options.segments_in_memory:
+            return "pipe:1"
+
+        return str(interval_output_file)
+
+    @staticmethod
+    def run_output(command: list, task: SimpleNamespace, render_options: SimpleNamespace, metrics=None,
+                   stage: str = None):
+        """
+        Runs an ffmpeg command that renders a segment, with its progress on stderr (see
+        lib.tools.ffmpeg_output.with_progress). stderr is read while ffmpeg runs, only the progress values and the last
+        log lines are kept. If the segments are kept in memory (render_options.segments_in_memory, see
+        lib.render_media.PipelineMuxer) the command writes the segment to stdout, it is kept as task.segment_data
+        instead of being written to task.interval_output_file
+        :param command: The ffmpeg command
+        :param task: The task the segment belongs to
+        :param render_options: The render options
+        :param metrics: lib.metrics.Metrics.Metrics that records the process (optional)
+        :param stage: Name of the stage the process belongs to
+        :return: The collected output with the returncode (see lib.tools.ffmpeg_output.output_collector)
+        """
+        handle_line, output = output_collector()
+
+        completed_process = run_process(
+            with_progress(command),
+            metrics,
+            stage,
+            stdout=subprocess.PIPE if render_options.segments_in_memory else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            on_error_line=handle_line
+        )
+
+        if render_options.segments_in_memory:
+            task.segment_data = completed_process.stdout
+
+        output.returncode = completed_process.returncode
+
+        return output
+
+    @staticmethod
+    def last_error(output: SimpleNamespace):
+        """
+        Returns the last log line of a failed ffmpeg command for error messages
+        :param output: The collected output (see lib.tools.ffmpeg_output.output_collector)
+        :return: The line, or the return code if ffmpeg did not log anything
+        """
+        if len(output.log) == 0:
+            return f"ffmpeg exited with {output.returncode}"
+
+        return output.log[-1]
+
+    @staticmethod
+    def probe_output_files(output_files: list, metrics=None, batch_size: int = PROBE_BATCH_SIZE):
+        """
+        Checks whether rendered files can be read, like ffprobe does, but with one process for many files (ffprobe
+        only accepts a single input): ffmpeg opens all files of a batch as inputs and stops at the first one it can
+        not read. That file is invalid and the rest of the batch is checked by the next process, so a batch takes a
+        single process if all of its files are valid
+        :param output_files: The files that should be checked
+        :param metrics: lib.metrics.Metrics.Metrics that records the processes (optional)
+        :param batch_size: How many files are opened by one process at most
+        :return: Set of the invalid files
+        """
+        invalid_files = set()
+        pending_files = list(output_files)
+
+        while len(pending_files) > 0:
+            batch = pending_files[:batch_size]
+            command = ["ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error"]
+
+            for output_file in batch:
+                command.extend(["-i", f"{output_file}"])
+
+            # Nothing is decoded, the null output stops before the first frame
+            command.extend(["-t", "0", "-f", "null", "-"])
+
+            handle_line, output = output_collector()
+            output.returncode = run_process(command, metrics, "probe_segments", stderr=subprocess.PIPE,
+                                            on_error_line=handle_line).returncode
+
+            if output.returncode == 0:
+                pending_files = pending_files[len(batch):]
+                continue
+
+            failed_index = next(
+                (i for i, output_file in enumerate(batch)
+                 if any(f"{output_file}." in line or f"{output_file}:" in line for line in output.log)),
+                None
+            )
+
+            if failed_index is None and len(batch) > 1:
+                # ffmpeg failed without naming a file, the batch is checked file by file
+                for output_file in batch:
+                    invalid_files.update(RenderIntervalThread.probe_output_files([output_file], metrics))
+
+                pending_files = pending_files[len(batch):]
+                continue
+
+            failed_index = failed_index or 0
+            invalid_files.add(batch[failed_index])
+            pending_files = pending_files[failed_index + 1:]
+
+        return invalid_files
+
+    @staticmethod
+    def thread_options(render_options: SimpleNamespace):
+        """
+        Generates the global and input options that limit the threads of an ffmpeg process (the encoder threads are
+        limited by an output option, -threads after the inputs)
+        :param render_options: The render options (with ffmpeg_threads and filter_threads, None means ffmpeg decides)
+        :return: List of command line options
+        """
+        options = []
+
+        if render_options.filter_threads is not None:
+            options.extend(["-filter_complex_threads", str(render_options.filter_threads)])
+
+        if render_options.ffmpeg_threads is not None:
+            options.extend(["-threads", str(render_options.ffmpeg_threads)])
+
+        return options
+
+    @staticmethod
+    def output_duration(interval: Interval, render_options: SimpleNamespace, apply_filter: bool = True):
+        """
+        Returns the duration of the rendered segment of an interval
+        :param interval: The interval
+        :param render_options: The render options
+        :param apply_filter: Whether the interval is sped up (see generate_command)
+        :return: Duration in seconds
+        """
+        if not apply_filter:
+            return interval.duration
+
+        speed = render_options.silent_speed if interval.is_silent else render_options.audible_speed
+        return interval.duration / RenderIntervalThread.clamp_speed(interval.duration, speed,
+                                                                    render_options.minimum_interval_duration)
+
     @staticmethod
     def clamp_speed(duration: float, speed: float, minimum_interval_duration=0.25):
         if duration / speed < minimum_interval_duration:
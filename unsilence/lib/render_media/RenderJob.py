@@ -0,0 +1,158 @@
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.cache.FileCache import default_cache_dir
+from unsilence.lib.tools.fingerprint import file_fingerprint
+
+
+def default_job_dir(input_file: Path, output_file: Path):
+    """
+    Returns a stable job directory for rendering input_file to output_file (outside of the temp directory, which is
+    deleted when the program ends)
+    :param input_file: The file that is processed
+    :param output_file: Where the processed file should be saved
+    :return: Path of the job directory
+    """
+    key = f"{Path(input_file).absolute()}\n{Path(output_file).absolute()}"
+    return default_cache_dir() / "jobs" / hashlib.sha1(key.encode()).hexdigest()
+
+
+class RenderJob:
+    """
+    Checkpoints of a resumable render: A stable job directory that contains the rendered segments, a manifest with the
+    input fingerprint and render options and a journal of the completed segments with their validation status
+    """
+
+    def __init__(self, job_dir: Path, input_file: Path, render_options: dict):
+        """
+        Opens the job directory. If it belongs to a different input or different render options, it is reset
+        :param job_dir: The stable job directory
+        :param input_file: The file that is processed
+        :param render_options: Everything (besides the intervals) that influences the rendered segments
+        """
+        self.__job_dir = Path(job_dir).absolute()
+        self.__manifest_file = self.__job_dir / "manifest.json"
+        self.__journal_file = self.__job_dir / "segments.jsonl"
+        self.__segments = {}
+
+        manifest = {
+            "input": str(Path(input_file).absolute()),
+            "fingerprint": file_fingerprint(input_file),
+            "options": render_options
+        }
+
+        if self.__load_manifest() != json.loads(json.dumps(manifest)):
+            if self.__job_dir.exists():
+                shutil.rmtree(self.__job_dir)
+
+            self.__job_dir.mkdir(parents=True)
+
+            with open(self.__manifest_file, "w+") as file:
+                json.dump(manifest, file)
+        else:
+            self.__load_journal()
+
+    @property
+    def job_dir(self):
+        """
+        Get the job directory
+        :return: Path of the job directory
+        """
+        return self.__job_dir
+
+    def __load_manifest(self):
+        """
+        Loads the manifest of an existing job directory
+        :return: Manifest dict or None
+        """
+        try:
+            with open(self.__manifest_file, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def __load_journal(self):
+        """
+        Loads the journal of completed segments, the last entry of a segment wins
+        :return: None
+        """
+        try:
+            with open(self.__journal_file, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line may be incomplete if the process was killed while writing it
+                        continue
+
+                    self.__segments[entry["task_id"]] = entry
+        except OSError:
+            pass
+
+    @staticmethod
+    def task_signature(task: SimpleNamespace):
+        """
+        Returns what identifies the output of a task (besides the render options)
+        :param task: A render task
+        :return: JSON compatible list
+        """
+        return [
+            round(task.interval.start, 6),
+            round(task.interval.end, 6),
+            bool(task.interval.is_silent),
+            bool(getattr(task, "stream_copy", False)),
+            len(getattr(task, "intervals", [task.interval]))
+        ]
+
+    def is_completed(self, task: SimpleNamespace):
+        """
+        Checks whether a task was already rendered and validated by a previous run
+        :param task: A render task
+        :return: Whether the segment can be reused
+        """
+        entry = self.__segments.get(task.task_id, None)
+
+        if entry is None or not entry["valid"] or entry["signature"] != RenderJob.task_signature(task):
+            return False
+
+        try:
+            return task.interval_output_file.stat().st_size == entry["size"]
+        except OSError:
+            return False
+
+    def record(self, task: SimpleNamespace, valid: bool):
+        """
+        Appends a finished segment to the journal
+        :param task: The finished render task
+        :param valid: Whether the segment was rendered successfully and passed the validation
+        :return: None
+        """
+        try:
+            size = task.interval_output_file.stat().st_size
+        except OSError:
+            size = None
+            valid = False
+
+        entry = {
+            "task_id": task.task_id,
+            "file": task.interval_output_file.name,
+            "signature": RenderJob.task_signature(task),
+            "size": size,
+            "valid": valid
+        }
+        self.__segments[task.task_id] = entry
+
+        with open(self.__journal_file, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+
+    def remove(self):
+        """
+        Deletes the job directory (after the render finished)
+        :return: None
+        """
+        if self.__job_dir.exists():
+            shutil.rmtree(self.__job_dir)
@@ -0,0 +1,252 @@
+import shutil
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.intervals.Intervals import Intervals
+from unsilence.lib.metrics.Metrics import Metrics
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.render_media.TaskScheduling import PROCESS_COST, interval_speed, predict_task_cost, \
+    simulate_makespan, split_long_intervals
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+from unsilence.lib.tools.process import run_process
+
+
+def select_samples(interval_list: list, render_options: SimpleNamespace, samples_per_kind: int = 4,
+                   max_sample_duration: float = 8.0):
+    """
+    Picks representative intervals for test renders: of the audible and of the silent intervals, the ones at evenly
+    spaced quantiles of their predicted cost (see lib.render_media.TaskScheduling.predict_task_cost, which respects
+    RenderIntervalThread.clamp_speed), so short and long intervals are both measured
+    :param interval_list: The intervals that will be rendered
+    :param render_options: The render options (see MediaRenderer.render)
+    :param samples_per_kind: How many audible and how many silent intervals are picked
+    :param max_sample_duration: Longer intervals are cut to this duration (in seconds), the cost grows linearly with it
+    :return: List of intervals
+    """
+    samples = []
+
+    for is_silent in [False, True]:
+        candidates = sorted(
+            [interval for interval in interval_list if interval.is_silent == is_silent],
+            key=lambda interval: predict_task_cost(interval, render_options)
+        )
+        count = min(samples_per_kind, len(candidates))
+
+        if count == 0:
+            continue
+
+        indices = sorted({round(i * (len(candidates) - 1) / max(1, count - 1)) for i in range(count)})
+
+        for index in indices:
+            sample = candidates[index].copy()
+            sample.end = min(sample.end, sample.start + max_sample_duration)
+            samples.append(sample)
+
+    return samples
+
+
+def fit_cost_model(measurements: list):
+    """
+    Fits the seconds of the test renders to their predicted costs: a fixed process overhead plus a rate per unit of
+    the remaining (duration dependent) cost
+    :param measurements: List of SimpleNamespace with predicted_cost and wall_time
+    :return: SimpleNamespace with overhead (seconds) and rate (seconds per cost unit)
+    """
+    variable_costs = [measurement.predicted_cost - PROCESS_COST for measurement in measurements]
+    seconds = [measurement.wall_time for measurement in measurements]
+
+    mean_cost = sum(variable_costs) / len(variable_costs)
+    mean_seconds = sum(seconds) / len(seconds)
+    variance = sum((cost - mean_cost) ** 2 for cost in variable_costs)
+
+    if variance > 0:
+        rate = sum((cost - mean_cost) * (second - mean_seconds)
+                   for cost, second in zip(variable_costs, seconds)) / variance
+        overhead = mean_seconds - rate * mean_cost
+
+        if rate > 0 and overhead >= 0:
+            return SimpleNamespace(overhead=overhead, rate=rate)
+
+    # Too few or too noisy samples for a line: the predicted costs are scaled as a whole
+    scale = sum(seconds) / sum(measurement.predicted_cost for measurement in measurements)
+    return SimpleNamespace(overhead=PROCESS_COST * scale, rate=scale)
+
+
+def estimate_render_time(input_file: Path, intervals: Intervals, temp_path: Path, **kwargs):
+    """
+    Predicts the wall time of rendering intervals with the interval engine on this machine: representative intervals
+    are test rendered one after the other (see select_samples) and concatenated, the measured times calibrate the cost
+    model of the scheduler, and the dispatch of all render tasks is simulated for every thread count. Processes that do
+    not fit on the usable CPUs (by the measured CPU time per process) slow each other down
+    :param input_file: The file that should be processed
+    :param intervals: The Intervals that should be processed
+    :param temp_path: The temp path where the test renders are stored
+    :param kwargs: Keyword Args, see below
+    :return: Estimate dict with threads (dict of thread count to predicted seconds), best_threads, render_time
+        (seconds per thread count without the concat), concat_time, process_overhead, cpu_per_process, samples and
+        sample_time (seconds spent on the test renders)
+
+    kwargs:
+        audio_only, audible_speed, silent_speed, audible_volume, silent_volume, minimum_interval_duration,
+            ffmpeg_threads, filter_threads, max_task_duration, audio_proxy, metrics:
+            see lib.render_media.MediaRenderer.MediaRenderer.render (measure with the ffmpeg_threads of the render)
+        output_suffix: Suffix of the output file, it decides the encoders (default: suffix of the input file)
+        thread_counts: The thread counts that should be predicted (default: 1 to twice the usable CPUs)
+        samples_per_kind: How many audible and how many silent intervals are test rendered (default 4)
+        max_sample_duration: Longest test render (in seconds of input, default 8)
+    """
+    input_file = Path(input_file).absolute()
+
+    if not input_file.exists():
+        raise FileNotFoundError(f"Input file {input_file} does not exist!")
+
+    render_options = SimpleNamespace(
+        audio_only=kwargs.get("audio_only", False),
+        audible_speed=kwargs.get("audible_speed", 1),
+        silent_speed=kwargs.get("silent_speed", 6),
+        audible_volume=kwargs.get("audible_volume", 1),
+        silent_volume=kwargs.get("silent_volume", 0.5),
+        minimum_interval_duration=kwargs.get("minimum_interval_duration", 0.25),
+        ffmpeg_threads=kwargs.get("ffmpeg_threads", None),
+        filter_threads=kwargs.get("filter_threads", None),
+        audio_proxy=False,
+        pipeline_output=None,
+        segments_in_memory=False
+    )
+
+    source_file = input_file
+
+    if render_options.audio_only and kwargs.get("audio_proxy", None) is not None:
+        source_file = Path(kwargs["audio_proxy"]).absolute()
+        render_options.audio_proxy = True
+
+    interval_list = intervals.remove_short_intervals_from_start(
+        render_options.audible_speed,
+        render_options.silent_speed
+    ).intervals
+    interval_list = list(
+        split_long_intervals(interval_list, kwargs.get("max_task_duration", None), render_options=render_options)
+    )
+
+    if len(interval_list) == 0:
+        raise ValueError("There are no intervals to render")
+
+    samples = select_samples(interval_list, render_options, kwargs.get("samples_per_kind", 4),
+                             kwargs.get("max_sample_duration", 8.0))
+
+    sample_path = Path(temp_path).absolute() / f"estimate_{uuid.uuid4()}"
+    sample_path.mkdir(parents=True)
+
+    try:
+        measurements, concat_rate = _measure_samples(source_file, samples, render_options, sample_path,
+                                                     kwargs.get("output_suffix", None) or input_file.suffix,
+                                                     kwargs.get("metrics", None))
+    finally:
+        shutil.rmtree(sample_path, ignore_errors=True)
+
+    model = fit_cost_model(measurements)
+
+    wall_time = sum(measurement.wall_time for measurement in measurements)
+    cpu_time = sum(measurement.cpu_time for measurement in measurements)
+    # Without os.wait4 the CPU time is unknown, every process is assumed to use its ffmpeg threads
+    cpu_per_process = cpu_time / wall_time if cpu_time > 0 else (render_options.ffmpeg_threads or 1)
+
+    cpu_count = usable_cpu_count()
+    thread_counts = kwargs.get("thread_counts", None) or range(1, 2 * cpu_count + 1)
+
+    # Dispatched longest first, like the render
+    costs = sorted(
+        [model.overhead + model.rate * (predict_task_cost(interval, render_options) - PROCESS_COST)
+         for interval in interval_list],
+        reverse=True
+    )
+    output_duration = sum(interval.duration / interval_speed(interval, render_options) for interval in interval_list)
+    concat_time = concat_rate * output_duration
+
+    render_time = {
+        threads: simulate_makespan(costs, threads) * max(1.0, threads * cpu_per_process / cpu_count)
+        for threads in thread_counts
+    }
+    predictions = {threads: seconds + concat_time for threads, seconds in render_time.items()}
+
+    return {
+        "threads": predictions,
+        "best_threads": min(predictions, key=lambda threads: (predictions[threads], threads)),
+        "render_time": render_time,
+        "concat_time": concat_time,
+        "process_overhead": model.overhead,
+        "cpu_per_process": cpu_per_process,
+        "samples": len(measurements),
+        "sample_time": wall_time
+    }
+
+
+def _measure_samples(input_file: Path, samples: list, render_options: SimpleNamespace, sample_path: Path,
+                     suffix: str, metrics: Metrics = None):
+    """
+    Test renders the samples one after the other and concatenates them
+    :param input_file: The file that should be processed
+    :param samples: The sample intervals
+    :param render_options: The render options
+    :param sample_path: Directory for the rendered samples
+    :param suffix: Suffix of the output file
+    :param metrics: Metrics of the job, its process slots are used (optional)
+    :return: List of SimpleNamespace (interval, predicted_cost, wall_time, cpu_time), concat seconds per output second
+    """
+    measurements = []
+    sample_files = []
+    output_duration = 0.0
+
+    for i, sample in enumerate(samples):
+        sample_file = sample_path / f"sample_{i}{suffix}"
+        command = RenderIntervalThread.generate_command(input_file, sample_file, sample, render_options, True,
+                                                        render_options.minimum_interval_duration)
+
+        summary = _timed_process(command, metrics)
+
+        if not sample_file.exists():
+            raise IOError(f"The test render between {sample.start} and {sample.end} (in seconds) failed")
+
+        measurements.append(SimpleNamespace(
+            interval=sample,
+            predicted_cost=predict_task_cost(sample, render_options),
+            wall_time=summary["wall_time"],
+            cpu_time=summary["user_time"] + summary["system_time"]
+        ))
+        sample_files.append(sample_file)
+        output_duration += sample.duration / interval_speed(sample, render_options)
+
+    concat_file = sample_path / "concat_list.txt"
+
+    with open(concat_file, "w+") as file:
+        file.writelines(f"file {sample_file.name}\n" for sample_file in sample_files)
+
+    summary = _timed_process([
+        "ffmpeg",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", f"{concat_file.as_posix()}",
+        "-c", "copy",
+        "-y",
+        f"{(sample_path / f'concat{suffix}').as_posix()}"
+    ], metrics)
+
+    return measurements, summary["wall_time"] / output_duration if output_duration > 0 else 0.0
+
+
+def _timed_process(command: list, metrics: Metrics = None):
+    """
+    Runs a process and measures it
+    :param command: The command
+    :param metrics: Metrics of the job, its process slots are used (optional)
+    :return: Process summary dict (wall_time, user_time, system_time, see lib.metrics.Metrics.Metrics.summary)
+    """
+    process_metrics = Metrics(
+        process_slots=metrics.process_slots if metrics is not None else None,
+        priority=metrics.priority if metrics is not None else 0
+    )
+
+    run_process(command, process_metrics, "estimate_render")
+
+    return process_metrics.summary()["processes"]["estimate_render"]
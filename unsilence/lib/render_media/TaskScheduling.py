@@ -0,0 +1,203 @@
+import heapq
+import math
+import subprocess
+from fractions import Fraction
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.intervals.Interval import Interval
+from unsilence.lib.render_media.RenderIntervalThread import RenderIntervalThread
+from unsilence.lib.tools.process import run_process
+
+# Relative cost weights, in "seconds of work" per second of media
+PROCESS_COST = 0.2
+DECODE_COST = 0.05
+AUDIO_ENCODE_COST = 0.02
+VIDEO_ENCODE_COST = 0.5
+STREAM_COPY_COST = 0.005
+
+# Samples per frame of the audio codec ffmpeg chooses by default for an output suffix, the concat demuxer keeps the
+# padding of the last frame of every segment
+AUDIO_FRAME_SAMPLES = {
+    ".mp4": 1024,
+    ".m4v": 1024,
+    ".mov": 1024,
+    ".m4a": 1024,
+    ".aac": 1024,
+    ".mp3": 1152,
+}
+
+
+def interval_speed(interval: Interval, render_options: SimpleNamespace):
+    """
+    Returns the speed an interval gets rendered at, including the clamping of RenderIntervalThread.clamp_speed
+    :param interval: The interval
+    :param render_options: The render options (see MediaRenderer.render)
+    :return: Speed
+    """
+    speed = render_options.silent_speed if interval.is_silent else render_options.audible_speed
+    return RenderIntervalThread.clamp_speed(interval.duration, speed, render_options.minimum_interval_duration)
+
+
+def predict_task_cost(interval: Interval, render_options: SimpleNamespace, stream_copy: bool = False):
+    """
+    Predicts the relative encode cost of rendering an interval: a fixed process start cost, the decode of the input
+    part and the encode of the (sped up) output part, which is much more expensive if the video is rendered too
+    :param interval: The interval
+    :param render_options: The render options (see MediaRenderer.render)
+    :param stream_copy: Whether the interval is stream copied instead of re-encoded
+    :return: Predicted cost
+    """
+    if stream_copy:
+        return PROCESS_COST + STREAM_COPY_COST * interval.duration
+
+    output_duration = interval.duration / interval_speed(interval, render_options)
+    encode_cost = AUDIO_ENCODE_COST if render_options.audio_only else AUDIO_ENCODE_COST + VIDEO_ENCODE_COST
+
+    return PROCESS_COST + DECODE_COST * interval.duration + encode_cost * output_duration
+
+
+def task_cost(task: SimpleNamespace, render_options: SimpleNamespace):
+    """
+    Predicts the relative cost of a render task
+    :param task: The render task (with task.interval)
+    :param render_options: The render options (see MediaRenderer.render)
+    :return: Predicted cost
+    """
+    return predict_task_cost(task.interval, render_options, getattr(task, "stream_copy", False))
+
+
+def probe_frame_duration(input_file: Path, output_suffix: str, audio_only: bool, metrics=None):
+    """
+    Reads the frame rate of the first video stream (or the sample rate of the first audio stream if only the audio is
+    rendered) with ffprobe and returns the output frame duration every rendered interval is rounded up to
+    :param input_file: The file that should be probed
+    :param output_suffix: File suffix of the output
+    :param audio_only: Whether only the audio is rendered
+    :param metrics: lib.metrics.Metrics.Metrics that records the ffprobe process (optional)
+    :return: Frame duration (Fraction of seconds), None if it is unknown (also if ffprobe is not installed)
+    """
+    if audio_only and output_suffix.lower() not in AUDIO_FRAME_SAMPLES:
+        return None
+
+    try:
+        console_output = run_process(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", "a:0" if audio_only else "v:0",
+                "-show_entries", "stream=sample_rate" if audio_only else "stream=r_frame_rate",
+                "-of", "csv=p=0",
+                str(input_file)
+            ],
+            metrics,
+            "probe_frame_rate",
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        ).stdout.strip()
+    except OSError:
+        # The split points are then not aligned to frames
+        return None
+
+    try:
+        rate = Fraction(console_output.splitlines()[0].strip(","))
+    except (IndexError, ValueError, ZeroDivisionError):
+        return None
+
+    if rate <= 0:
+        return None
+
+    return AUDIO_FRAME_SAMPLES[output_suffix.lower()] / rate if audio_only else 1 / rate
+
+
+def split_long_intervals(interval_iterable, max_task_duration: float, frame_duration: Fraction = None,
+                         render_options: SimpleNamespace = None):
+    """
+    Splits intervals that are longer than max_task_duration into (roughly) equally long sub-intervals. Every rendered
+    sub-interval is rounded up to whole (video or audio) frames, so the split points are snapped to frame boundaries
+    of the sped up output to keep the concatenated output as long as the unsplit one
+    :param interval_iterable: Iterable of intervals
+    :param max_task_duration: Longest allowed interval duration (in seconds), None disables splitting
+    :param frame_duration: Output frame duration to snap to, None disables snapping (see probe_frame_duration)
+    :param render_options: The render options (see MediaRenderer.render), required for snapping and to keep the parts
+                           long enough that their speed doesn't get clamped
+    :return: Generator of intervals
+    """
+    for interval in interval_iterable:
+        if max_task_duration is None or interval.duration <= max_task_duration:
+            yield interval
+            continue
+
+        parts = math.ceil(interval.duration / max_task_duration)
+        step = None
+
+        if render_options is not None:
+            # A part that is short enough to get its speed clamped would be rendered slower than the whole interval
+            speed = interval_speed(interval, render_options)
+            shortest_part = render_options.minimum_interval_duration + float(frame_duration or 0)
+            parts = max(1, min(parts, math.floor(interval.duration / speed / shortest_part)))
+
+            if frame_duration is not None and float(frame_duration) * speed <= interval.duration / parts / 2:
+                step = float(frame_duration) * speed
+
+        part_duration = interval.duration / parts
+
+        boundaries = [interval.start]
+        for i in range(1, parts):
+            offset = i * part_duration if step is None else round(i * part_duration / step) * step
+            boundaries.append(interval.start + offset)
+        boundaries.append(interval.end)
+
+        for start, end in zip(boundaries, boundaries[1:]):
+            yield Interval(start=start, end=end, is_silent=interval.is_silent)
+
+
+def order_tasks(tasks: list, render_options: SimpleNamespace):
+    """
+    Orders tasks so that the most expensive ones are dispatched first (longest expected job first)
+    :param tasks: List of render tasks (with task.interval)
+    :param render_options: The render options (see MediaRenderer.render)
+    :return: New, sorted list of tasks
+    """
+    return sorted(tasks, key=lambda task: task_cost(task, render_options), reverse=True)
+
+
+def simulate_makespan(costs: list, workers: int):
+    """
+    Simulates the dispatch of tasks (in the given order) to the next free worker
+    :param costs: Costs of the tasks, in dispatch order
+    :param workers: Number of workers
+    :return: Time until the last worker is finished
+    """
+    worker_times = [0.0] * max(1, workers)
+
+    for cost in costs:
+        heapq.heapreplace(worker_times, worker_times[0] + cost)
+
+    return max(worker_times)
+
+
+def makespan_report(timeline_tasks: list, ordered_tasks: list, render_options: SimpleNamespace, workers: int):
+    """
+    Compares the predicted makespan of the chosen task order against dispatching the tasks in timeline (FIFO) order
+    :param timeline_tasks: Tasks in timeline order
+    :param ordered_tasks: Tasks in dispatch order
+    :param render_options: The render options (see MediaRenderer.render)
+    :param workers: Number of workers
+    :return: Report dict (predicted costs in relative units)
+    """
+    costs = {id(task): task_cost(task, render_options) for task in timeline_tasks}
+
+    fifo = simulate_makespan([costs[id(task)] for task in timeline_tasks], workers)
+    ordered = simulate_makespan([costs[id(task)] for task in ordered_tasks], workers)
+    total = sum(costs.values())
+
+    return {
+        "tasks": len(timeline_tasks),
+        "workers": workers,
+        "total_cost": total,
+        "lower_bound": max(total / max(1, workers), max(costs.values(), default=0)),
+        "fifo_makespan": fifo,
+        "makespan": ordered,
+        "improvement": (fifo - ordered) / fifo if fifo > 0 else 0
+    }
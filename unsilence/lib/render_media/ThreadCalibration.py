@@ -0,0 +1,142 @@
+import json
+import os
+import platform
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from unsilence.lib.cache.FileCache import default_cache_dir
+from unsilence.lib.tools.cpu_budget import thread_budget, usable_cpu_count
+
+
+def calibration_file():
+    """
+    Returns the default file where the calibrated thread budgets are stored
+    :return: Path of the calibration file
+    """
+    return default_cache_dir() / "thread_calibration.json"
+
+
+def machine_key(cpu_count: int = None):
+    """
+    Identifies the machine (and its usable CPU count) a calibration belongs to
+    :param cpu_count: Number of usable CPUs (default: usable_cpu_count())
+    :return: Key string
+    """
+    if cpu_count is None:
+        cpu_count = usable_cpu_count()
+
+    return f"{platform.node()}:{platform.machine()}:{cpu_count}"
+
+
+def load_calibration(audio_only: bool, file: Path = None):
+    """
+    Loads the calibrated thread budget of this machine
+    :param audio_only: Whether the budget for audio only or for video renders should be loaded
+    :param file: The calibration file (default: calibration_file())
+    :return: SimpleNamespace with workers, ffmpeg_threads and filter_threads, or None if there is no calibration
+    """
+    try:
+        with open(file or calibration_file(), "r") as f:
+            entry = json.load(f)[machine_key()]["audio" if audio_only else "video"]
+
+        return SimpleNamespace(
+            workers=int(entry["workers"]),
+            ffmpeg_threads=int(entry["ffmpeg_threads"]),
+            filter_threads=int(entry["filter_threads"])
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_calibration(audio_only: bool, budget: SimpleNamespace, file: Path = None):
+    """
+    Stores the calibrated thread budget of this machine
+    :param audio_only: Whether the budget is for audio only or for video renders
+    :param budget: SimpleNamespace with workers, ffmpeg_threads and filter_threads
+    :param file: The calibration file (default: calibration_file())
+    :return: None
+    """
+    file = Path(file or calibration_file())
+
+    try:
+        with open(file, "r") as f:
+            calibration = json.load(f)
+    except (OSError, ValueError):
+        calibration = {}
+
+    calibration.setdefault(machine_key(), {})["audio" if audio_only else "video"] = vars(budget)
+
+    file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = file.with_name(f".{uuid.uuid4()}.tmp")
+
+    with open(temp_file, "w+") as f:
+        json.dump(calibration, f, indent=2)
+
+    os.replace(temp_file, file)
+
+
+def auto_thread_budget(audio_only: bool):
+    """
+    Returns the thread budget for threads="auto": the calibrated one if this machine was calibrated, otherwise the
+    heuristic of lib.tools.cpu_budget.thread_budget
+    :param audio_only: Whether the render is audio only
+    :return: SimpleNamespace with workers, ffmpeg_threads and filter_threads
+    """
+    return load_calibration(audio_only) or thread_budget(audio_only)
+
+
+def candidate_budgets(audio_only: bool, cpu_count: int = None):
+    """
+    Generates the splits of the CPU budget that are tried by the calibration
+    :param audio_only: Whether the render is audio only
+    :param cpu_count: Number of usable CPUs (default: usable_cpu_count())
+    :return: List of SimpleNamespace with workers, ffmpeg_threads and filter_threads
+    """
+    if cpu_count is None:
+        cpu_count = usable_cpu_count()
+
+    candidates = [thread_budget(audio_only, cpu_count)]
+
+    for ffmpeg_threads in [1, 2, 4, 8]:
+        if ffmpeg_threads > cpu_count:
+            break
+
+        for workers in {cpu_count // ffmpeg_threads, max(1, cpu_count // ffmpeg_threads // 2)}:
+            candidate = SimpleNamespace(workers=max(1, workers), ffmpeg_threads=ffmpeg_threads, filter_threads=1)
+            if candidate not in candidates:
+                candidates.append(candidate)
+
+    return candidates
+
+
+def calibrate(render_function, audio_only: bool, candidates: list = None, on_result=None, file: Path = None):
+    """
+    Times a render with every candidate split of the CPU budget and stores the fastest one for this machine
+    :param render_function: Function that renders a representative sample (called like func(budget))
+    :param audio_only: Whether the sample is rendered audio only
+    :param candidates: The budgets that should be tried (default: candidate_budgets(audio_only))
+    :param on_result: Function that is called after every candidate (called like func(budget, seconds))
+    :param file: The calibration file (default: calibration_file())
+    :return: The fastest budget
+    """
+    if candidates is None:
+        candidates = candidate_budgets(audio_only)
+
+    best_budget = None
+    best_time = None
+
+    for budget in candidates:
+        start_time = time.perf_counter()
+        render_function(budget)
+        seconds = time.perf_counter() - start_time
+
+        if on_result is not None:
+            on_result(budget, seconds)
+
+        if best_time is None or seconds < best_time:
+            best_budget, best_time = budget, seconds
+
+    save_calibration(audio_only, best_budget, file)
+    return best_budget
@@ -0,0 +1,194 @@
+import json
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from unsilence.lib.server.JobServer import JobServer
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server on a Unix domain socket, every connection is handled by its own thread
+    """
+
+    daemon_threads = True
+
+
+def create_http_server(job_server: JobServer, host: str = "127.0.0.1", port: int = 8765, socket_path: Path = None):
+    """
+    Creates the HTTP server of the job API (call serve_forever() on it)
+
+    Endpoints:
+        POST /jobs: Submits a job (see JobServer.submit), responds with the job
+        GET /jobs: Lists all jobs
+        GET /jobs/<id>: Get a job with its result
+        DELETE /jobs/<id>: Cancels a queued job
+        GET /jobs/<id>/events?since=<seq>: Streams the events of a job as JSON lines until it is finished
+        GET /metrics: Queue depth and throughput of the server
+
+    :param job_server: The JobServer
+    :param host: Address the TCP server binds to (ignored if socket_path is given)
+    :param port: Port of the TCP server (ignored if socket_path is given)
+    :param socket_path: Path of a Unix domain socket the server binds to instead of TCP (optional)
+    :return: ThreadingHTTPServer or ThreadingUnixHTTPServer
+    """
+    handler = _handler_class(job_server)
+
+    if socket_path is None:
+        return ThreadingHTTPServer((host, port), handler)
+
+    socket_path = Path(socket_path)
+    if socket_path.is_socket():
+        # Left behind by a server that was not shut down cleanly
+        os.unlink(socket_path)
+
+    return ThreadingUnixHTTPServer(str(socket_path), handler)
+
+
+def _handler_class(job_server: JobServer):
+    """
+    Creates the request handler class of a JobServer
+    :param job_server: The JobServer
+    :return: Subclass of BaseHTTPRequestHandler
+    """
+
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        """
+        Translates the HTTP requests of the job API to JobServer calls
+        """
+
+        def do_GET(self):
+            path, query = self.__route()
+
+            if path == ["metrics"]:
+                self.__respond(200, job_server.metrics())
+            elif path == ["jobs"]:
+                self.__respond(200, job_server.list())
+            elif len(path) == 2 and path[0] == "jobs":
+                self.__call(200, job_server.get, path[1])
+            elif len(path) == 3 and path[0] == "jobs" and path[2] == "events":
+                self.__stream_events(path[1], query)
+            else:
+                self.__respond(404, {"error": "Not found"})
+
+        def do_POST(self):
+            path, _ = self.__route()
+
+            if path != ["jobs"]:
+                self.__respond(404, {"error": "Not found"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                spec = json.loads(self.rfile.read(length) or b"null")
+            except ValueError:
+                self.__respond(400, {"error": "The body must be JSON"})
+                return
+
+            self.__call(201, job_server.submit, spec)
+
+        def do_DELETE(self):
+            path, _ = self.__route()
+
+            if len(path) == 2 and path[0] == "jobs":
+                self.__call(200, job_server.cancel, path[1])
+            else:
+                self.__respond(404, {"error": "Not found"})
+
+        def address_string(self):
+            # Connections of a Unix domain socket have no address
+            if isinstance(self.client_address, tuple):
+                return super().address_string()
+
+            return "unix"
+
+        def log_message(self, format, *args):
+            # Requests are not logged, the server only prints errors
+            pass
+
+        def __route(self):
+            """
+            Splits the request path
+            :return: List of path components, dict of query parameters
+            """
+            url = urlsplit(self.path)
+            return [part for part in url.path.split("/") if part != ""], parse_qs(url.query)
+
+        def __call(self, status: int, func, argument):
+            """
+            Calls a JobServer method and responds with its result, or with the error it raised
+            :param status: HTTP status of a successful call
+            :param func: The JobServer method
+            :param argument: Argument of the method
+            :return: None
+            """
+            try:
+                result = func(argument)
+            except KeyError as error:
+                self.__respond(404, {"error": error.args[0]})
+            except ValueError as error:
+                self.__respond(400 if func != job_server.cancel else 409, {"error": str(error)})
+            else:
+                self.__respond(status, result)
+
+        def __respond(self, status: int, body):
+            """
+            Sends a JSON response
+            :param status: HTTP status
+            :param body: JSON serializable body
+            :return: None
+            """
+            data = json.dumps(body).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def __stream_events(self, job_id: str, query: dict):
+            """
+            Streams the events of a job as JSON lines until the job is finished
+            :param job_id: The id of the job
+            :param query: Query parameters of the request
+            :return: None
+            """
+            try:
+                since = int(query.get("since", ["0"])[0])
+                events = job_server.events(job_id, since)
+                first_event = next(events, None)
+            except KeyError as error:
+                self.__respond(404, {"error": error.args[0]})
+                return
+            except ValueError:
+                self.__respond(400, {"error": "since must be an integer"})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+
+            try:
+                if first_event is not None:
+                    self.__write_event(first_event)
+
+                for event in events:
+                    self.__write_event(event)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped listening, the job is not affected
+                pass
+            finally:
+                events.close()
+
+        def __write_event(self, event: dict):
+            """
+            Sends one event line
+            :param event: The event dict
+            :return: None
+            """
+            self.wfile.write(json.dumps(event).encode() + b"\n")
+            self.wfile.flush()
+
+    return JobRequestHandler
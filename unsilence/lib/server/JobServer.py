@@ -0,0 +1,427 @@
+import heapq
+import itertools
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from unsilence.Unsilence import Unsilence
+from unsilence.lib.batch.ProcessSlots import ProcessSlots
+from unsilence.lib.cache.DetectionCache import DetectionCache
+from unsilence.lib.metrics.Metrics import Metrics
+from unsilence.lib.server.JobStore import JobStore
+from unsilence.lib.tools.cpu_budget import usable_cpu_count
+
+
+class JobServer:
+    """
+    Long running scheduler of detect, estimate and render jobs: the jobs share one lib.batch.ProcessSlots.ProcessSlots
+    (like a batch), the detection cache and the ffmpeg capability probe stay in memory between jobs, every change of a
+    job is checkpointed to the state directory and its progress is published as events. A job that was queued or
+    running when the server stopped is queued again on the next start, an interrupted render resumes from its rendered
+    segments (see lib.render_media.RenderJob.RenderJob)
+    """
+
+    JOB_TYPES = ["detect", "estimate", "render"]
+    FINAL_STATES = ["finished", "failed", "cancelled"]
+
+    DETECTION_OPTIONS = [
+        "silence_level", "silence_time_threshold", "short_interval_threshold", "stretch_time", "detection_engine",
+        "detection_shards"
+    ]
+
+    RENDER_OPTIONS = [
+        "audio_only", "audible_speed", "silent_speed", "audible_volume", "silent_volume", "drop_corrupted_intervals",
+        "check_intervals", "probe_segments", "minimum_interval_duration", "engine", "max_task_duration", "passthrough"
+    ]
+
+    def __init__(self, state_dir: Path, process_slots: ProcessSlots = None, parallel_jobs: int = 2,
+                 detection_cache: DetectionCache = None):
+        """
+        Initializes a new JobServer and restores the checkpointed jobs of the state directory
+        :param state_dir: Directory of the job checkpoints, temp files and interrupted renders
+        :param process_slots: The global process limit (default: one slot per usable CPU)
+        :param parallel_jobs: How many jobs are in progress at the same time
+        :param detection_cache: Cache of detection results shared by all jobs (optional)
+        """
+        if process_slots is None:
+            process_slots = ProcessSlots(usable_cpu_count())
+
+        self.__state_dir = Path(state_dir).absolute()
+        self.__store = JobStore(self.__state_dir)
+        self.__process_slots = process_slots
+        self.__parallel_jobs = max(1, parallel_jobs)
+        self.__detection_cache = detection_cache
+
+        self.__condition = threading.Condition()
+        self.__jobs = {}
+        self.__events = {}
+        self.__queue = []
+        self.__sequence = itertools.count()
+        self.__workers = []
+        self.__stopping = False
+
+        self.__started_at = time.time()
+        self.__start_busy_time = process_slots.busy_time()
+        self.__media_duration = 0.0
+        self.__job_wall_time = 0.0
+
+        with self.__condition:
+            for job in self.__store.load_all():
+                self.__jobs[job["id"]] = job
+                self.__events[job["id"]] = []
+
+                if job["status"] in ["queued", "running"]:
+                    job["status"] = "queued"
+                    self.__store.save(job)
+                    self.__push(job)
+                    self.__emit(job["id"], "queued", restored=True)
+                else:
+                    self.__emit(job["id"], job["status"], error=job["error"], restored=True)
+
+    def start(self):
+        """
+        Starts the workers
+        :return: None
+        """
+        for _ in range(self.__parallel_jobs):
+            # Daemon threads: a running job that is stopped with the process stays checkpointed as running
+            worker = threading.Thread(target=self.__work, daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+
+    def stop(self):
+        """
+        Stops taking new jobs, queued jobs stay checkpointed for the next start
+        :return: None
+        """
+        with self.__condition:
+            self.__stopping = True
+            self.__condition.notify_all()
+
+    def submit(self, spec: dict):
+        """
+        Validates and queues a job
+        :param spec: Dict with "type" (detect, estimate or render), "input", "output" (render only), "priority"
+            (optional, higher first) and "options" (optional, detection and render keyword arguments)
+        :return: The job dict
+        """
+        if not isinstance(spec, dict):
+            raise ValueError("The job must be a JSON object")
+
+        job_type = spec.get("type", None)
+        if job_type not in JobServer.JOB_TYPES:
+            raise ValueError(f"type must be one of {', '.join(JobServer.JOB_TYPES)}")
+
+        if not isinstance(spec.get("input", None), str):
+            raise ValueError("input must be a path")
+
+        input_file = Path(spec["input"]).absolute()
+        if not input_file.is_file():
+            raise ValueError(f"Input file {input_file} does not exist!")
+
+        output_file = None
+        if job_type == "render":
+            if not isinstance(spec.get("output", None), str):
+                raise ValueError("output must be a path")
+
+            output_file = str(Path(spec["output"]).absolute())
+
+        priority = spec.get("priority", 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError("priority must be an integer")
+
+        options = spec.get("options", {})
+        if not isinstance(options, dict):
+            raise ValueError("options must be a JSON object")
+
+        unknown_options = set(options) - set(JobServer.DETECTION_OPTIONS) - set(JobServer.RENDER_OPTIONS)
+        if len(unknown_options) > 0:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown_options))}")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "input": str(input_file),
+            "output": output_file,
+            "priority": priority,
+            "options": options,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None
+        }
+
+        with self.__condition:
+            self.__store.save(job)
+            self.__jobs[job["id"]] = job
+            self.__events[job["id"]] = []
+            self.__push(job)
+            self.__emit(job["id"], "queued")
+            self.__condition.notify_all()
+
+            return dict(job)
+
+    def cancel(self, job_id: str):
+        """
+        Cancels a queued job
+        :param job_id: The id of the job
+        :return: The job dict
+        """
+        with self.__condition:
+            job = self.__job(job_id)
+
+            if job["status"] != "queued":
+                raise ValueError(f"Only queued jobs can be cancelled, the job is {job['status']}")
+
+            # The queue entry is skipped by the workers
+            self.__finish(job, "cancelled")
+            return dict(job)
+
+    def get(self, job_id: str):
+        """
+        Get a job
+        :param job_id: The id of the job
+        :return: The job dict
+        """
+        with self.__condition:
+            return dict(self.__job(job_id))
+
+    def list(self):
+        """
+        Get all jobs (without their results)
+        :return: List of job dicts in submission order
+        """
+        with self.__condition:
+            return [
+                {key: value for key, value in job.items() if key != "result"}
+                for job in sorted(self.__jobs.values(), key=lambda x: x["created"])
+            ]
+
+    def events(self, job_id: str, since: int = 0):
+        """
+        Generator of the events of a job (queued, started, progress, finished, failed, cancelled), blocks until the job
+        is finished. Every event is a dict with "seq", "time", "event" and event specific values
+        :param job_id: The id of the job
+        :param since: Only events with a seq of at least this value are yielded
+        :return: Generator of event dicts
+        """
+        with self.__condition:
+            self.__job(job_id)
+
+        position = since
+
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(
+                    lambda: len(self.__events[job_id]) > position
+                    or self.__jobs[job_id]["status"] in JobServer.FINAL_STATES
+                )
+                new_events = self.__events[job_id][position:]
+                finished = self.__jobs[job_id]["status"] in JobServer.FINAL_STATES
+
+            yield from new_events
+            position += len(new_events)
+
+            if finished and len(new_events) == 0:
+                return
+
+    def metrics(self):
+        """
+        Get the queue depth and throughput of the server
+        :return: Metrics dict
+        """
+        with self.__condition:
+            states = {state: 0 for state in ["queued", "running"] + JobServer.FINAL_STATES}
+            for job in self.__jobs.values():
+                states[job["status"]] += 1
+
+            uptime = time.time() - self.__started_at
+            busy_time = self.__process_slots.busy_time() - self.__start_busy_time
+
+            return {
+                "uptime": uptime,
+                "queue_depth": states["queued"],
+                "jobs": states,
+                "parallel_jobs": self.__parallel_jobs,
+                "process_slots": self.__process_slots.capacity,
+                "slot_utilization": busy_time / (uptime * self.__process_slots.capacity) if uptime > 0 else None,
+                "media_duration": self.__media_duration,
+                "throughput": self.__media_duration / uptime if uptime > 0 else None,
+                "job_speed": self.__media_duration / self.__job_wall_time if self.__job_wall_time > 0 else None
+            }
+
+    def __job(self, job_id: str):
+        """
+        Get the job dict of an id (call with the condition held)
+        :param job_id: The id of the job
+        :return: The job dict
+        """
+        if job_id not in self.__jobs:
+            raise KeyError(f"Unknown job {job_id}")
+
+        return self.__jobs[job_id]
+
+    def __push(self, job: dict):
+        """
+        Adds a job to the queue, ordered by priority (highest first) and submission (call with the condition held)
+        :param job: The job dict
+        :return: None
+        """
+        heapq.heappush(self.__queue, (-job["priority"], next(self.__sequence), job["id"]))
+
+    def __emit(self, job_id: str, event: str, **values):
+        """
+        Publishes an event of a job (call with the condition held)
+        :param job_id: The id of the job
+        :param event: Name of the event
+        :param values: Event specific values
+        :return: None
+        """
+        events = self.__events[job_id]
+        events.append(dict(values, seq=len(events), time=time.time(), event=event))
+        self.__condition.notify_all()
+
+    def __finish(self, job: dict, status: str, **values):
+        """
+        Moves a job to a final state, checkpoints it and publishes the event (call with the condition held)
+        :param job: The job dict
+        :param status: finished, failed or cancelled
+        :param values: Job values that should be updated (result, error)
+        :return: None
+        """
+        job.update(values, status=status, finished=time.time())
+        self.__store.save(job)
+        self.__emit(job["id"], status, error=job["error"])
+
+    def __work(self):
+        """
+        Worker loop: takes the queued job with the highest priority and runs it
+        :return: None
+        """
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__stopping or len(self.__queue) > 0)
+
+                if self.__stopping:
+                    return
+
+                _, _, job_id = heapq.heappop(self.__queue)
+                job = self.__jobs[job_id]
+
+                if job["status"] != "queued":
+                    continue
+
+                job.update(status="running", started=time.time())
+                self.__store.save(job)
+                self.__emit(job_id, "started")
+
+            start_time = time.perf_counter()
+
+            try:
+                result = self.__run(job)
+            except Exception as error:
+                with self.__condition:
+                    self.__finish(job, "failed", error=str(error) or type(error).__name__)
+                continue
+
+            with self.__condition:
+                self.__media_duration += result["media_duration"]
+                self.__job_wall_time += time.perf_counter() - start_time
+                self.__finish(job, "finished", result=result)
+
+    def __run(self, job: dict):
+        """
+        Runs a job
+        :param job: The job dict
+        :return: Result dict of the job
+        """
+        options = job["options"]
+        detection_options = {key: options[key] for key in JobServer.DETECTION_OPTIONS if key in options}
+        render_options = {
+            "threads": self.__process_slots.capacity,
+            "ffmpeg_threads": 1,
+            "filter_threads": 1
+        }
+        render_options.update({key: options[key] for key in JobServer.RENDER_OPTIONS if key in options})
+
+        metrics = Metrics(process_slots=self.__process_slots, priority=job["priority"])
+        temp_dir = self.__state_dir / "tmp" / job["id"]
+        job_dir = self.__state_dir / "renders" / job["id"]
+        continual = Unsilence(Path(job["input"]), temp_dir=temp_dir, metrics=metrics)
+
+        try:
+            intervals = continual.detect_silence(
+                detection_cache=self.__detection_cache,
+                on_silence_detect_progress_update=self.__progress_reporter(job["id"], "detect"),
+                **detection_options
+            )
+
+            time_data = continual.estimate_time(render_options.get("audible_speed", 1),
+                                                render_options.get("silent_speed", 6))
+            result = {
+                "media_duration": time_data["before"]["all"][0],
+                "output_duration": time_data["after"]["all"][0],
+                "estimate": time_data
+            }
+
+            if job["type"] == "detect":
+                result["intervals"] = intervals.serialize()
+
+            if job["type"] == "estimate":
+                # Predicted for the threads a render job of this server gets
+                result["render_time"] = continual.estimate_render_time(
+                    thread_counts=[render_options["threads"]],
+                    **render_options
+                )
+
+            if job["type"] == "render":
+                output_file = Path(job["output"])
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+
+                continual.render_media(
+                    output_file,
+                    job_dir=job_dir,
+                    on_render_progress_update=self.__progress_reporter(job["id"], "render"),
+                    on_concat_progress_update=self.__progress_reporter(job["id"], "concat"),
+                    **render_options
+                )
+        except Exception:
+            # Only an interrupted server resumes a render, a failed job is not run again
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        finally:
+            continual.cleanup()
+
+        summary = metrics.summary()
+        result["cpu_time"] = sum(values["user_time"] + values["system_time"]
+                                 for values in summary["processes"].values())
+        result["stages"] = {name: values["wall_time"] for name, values in summary["stages"].items()}
+
+        return result
+
+    def __progress_reporter(self, job_id: str, stage: str):
+        """
+        Creates a progress function that publishes progress events, at most four per second and stage (and always the
+        last one)
+        :param job_id: The id of the job
+        :param stage: Name of the stage (detect, render or concat)
+        :return: Function that is called like function(current, total)
+        """
+        last_event = [0.0]
+
+        def report(current, total):
+            now = time.perf_counter()
+
+            if current != total and now - last_event[0] < 0.25:
+                return
+
+            last_event[0] = now
+
+            with self.__condition:
+                self.__emit(job_id, "progress", stage=stage, current=current, total=total)
+
+        return report
@@ -0,0 +1,62 @@
+import json
+import os
+import uuid
+from pathlib import Path
+
+
+class JobStore:
+    """
+    Checkpoints of the jobs of the job server: every job is a JSON file in the state directory that is replaced
+    atomically whenever the job changes, so a restarted server finds all queued (and interrupted) jobs again
+    """
+
+    def __init__(self, state_dir: Path):
+        """
+        Initializes a new JobStore
+        :param state_dir: The state directory of the server
+        """
+        self.__jobs_dir = Path(state_dir) / "jobs"
+        self.__jobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(self, job: dict):
+        """
+        Writes the checkpoint of a job (atomically, an interrupted write leaves the previous checkpoint)
+        :param job: The job dict, must contain "id"
+        :return: None
+        """
+        path = self.__jobs_dir / f"{job['id']}.json"
+        partial_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex[:8]}.partial")
+
+        with open(partial_path, "w+") as file:
+            json.dump(job, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(partial_path, path)
+
+    def load_all(self):
+        """
+        Loads the checkpoints of all jobs, unreadable checkpoints are skipped
+        :return: List of job dicts in submission order
+        """
+        jobs = []
+
+        for path in self.__jobs_dir.glob("*.json"):
+            try:
+                with open(path, "r") as file:
+                    jobs.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+        return sorted(jobs, key=lambda job: job.get("created", 0))
+
+    def remove(self, job_id: str):
+        """
+        Removes the checkpoint of a job
+        :param job_id: The id of the job
+        :return: None
+        """
+        try:
+            (self.__jobs_dir / f"{job_id}.json").unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,106 @@
+import re
+from pathlib import Path
+
+import numpy as np
+
+from unsilence.lib.intervals.TimelineMap import TimelineMap
+
+TIMESTAMP_PATTERN = r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})"
+TIMING_LINE = re.compile(rf"^\s*{TIMESTAMP_PATTERN}\s*-->\s*{TIMESTAMP_PATTERN}(.*)$")
+BLOCK_SEPARATOR = re.compile(r"\n[ \t]*\n")
+
+
+def remap_subtitles(input_file: Path, output_file: Path, timeline_map: TimelineMap):
+    """
+    Rewrites the cue timings of a SRT or WebVTT file from input time to output time. Cues that end up without a
+    duration (because they were cut away) are dropped, SRT cues are renumbered
+    :param input_file: The SRT/VTT file with timings of the input media
+    :param output_file: Where the SRT/VTT file with timings of the output media should be saved
+    :param timeline_map: lib.intervals.TimelineMap.TimelineMap of the render
+    :return: Number of written cues
+    """
+    input_file = Path(input_file)
+    output_file = Path(output_file)
+
+    if input_file.suffix.lower() not in (".srt", ".vtt"):
+        raise ValueError(f"Unsupported subtitle format {input_file.suffix}, only .srt and .vtt are supported")
+
+    is_srt = input_file.suffix.lower() == ".srt"
+
+    with open(input_file, "r", encoding="utf-8-sig") as file:
+        blocks = BLOCK_SEPARATOR.split(file.read().replace("\r\n", "\n").strip("\n"))
+
+    cues = []
+
+    for block_index, block in enumerate(blocks):
+        lines = block.split("\n")
+
+        for line_index, line in enumerate(lines[:2]):
+            match = TIMING_LINE.match(line)
+            if match is not None:
+                cues.append((block_index, line_index, match))
+                break
+
+    input_times = np.array(
+        [[_parse_timestamp(match.groups()[0:4]), _parse_timestamp(match.groups()[4:8])] for _, _, match in cues],
+        dtype=np.float64
+    ).reshape(-1, 2)
+
+    output_times = timeline_map.to_output(input_times)
+
+    cue_lookup = {block_index: (line_index, match, times) for (block_index, line_index, match), times
+                  in zip(cues, output_times.tolist())}
+    separator = "," if is_srt else "."
+
+    output_blocks = []
+    cue_count = 0
+
+    for block_index, block in enumerate(blocks):
+        if block_index not in cue_lookup:
+            output_blocks.append(block)
+            continue
+
+        line_index, match, (start, end) = cue_lookup[block_index]
+
+        if round(end * 1000) <= round(start * 1000):
+            continue
+
+        cue_count += 1
+        lines = block.split("\n")
+        lines[line_index] = f"{_format_timestamp(start, separator)} --> {_format_timestamp(end, separator)}" \
+                            f"{match.group(9)}"
+
+        if is_srt and line_index == 1 and lines[0].strip().isdigit():
+            lines[0] = str(cue_count)
+
+        output_blocks.append("\n".join(lines))
+
+    with open(output_file, "w+", encoding="utf-8") as file:
+        file.write("\n\n".join(output_blocks) + "\n")
+
+    return cue_count
+
+
+def _parse_timestamp(groups):
+    """
+    Converts the groups of a matched timestamp to seconds
+    :param groups: (hours or None, minutes, seconds, milliseconds)
+    :return: Time in seconds
+    """
+    hours, minutes, seconds, milliseconds = groups
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(milliseconds) / 1000
+
+
+def _format_timestamp(time: float, separator: str):
+    """
+    Formats a time as a subtitle timestamp (HH:MM:SS,mmm or HH:MM:SS.mmm)
+    :param time: Time in seconds
+    :param separator: Separator between seconds and milliseconds
+    :return: Timestamp string
+    """
+    milliseconds = int(round(time * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
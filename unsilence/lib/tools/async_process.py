@@ -0,0 +1,100 @@
+import asyncio
+import re
+import subprocess
+import time
+
+
+async def run_process_async(command: list, metrics=None, stage: str = None, process_limit: asyncio.Semaphore = None,
+                            on_line=None):
+    """
+    asyncio version of lib.tools.process.run_process: runs a process with asyncio.create_subprocess_exec and captures
+    its console output (stdout and stderr) without blocking the event loop. If the awaiting task is cancelled (or
+    anything else interrupts it) the process is killed
+    :param command: The command that should be run
+    :param metrics: lib.metrics.Metrics.Metrics the process is recorded to (optional, only the wall time is known)
+    :param stage: Name of the stage the process belongs to
+    :param process_limit: Semaphore that limits how many processes run at the same time (optional)
+    :param on_line: Function that is called with every decoded line of the console output, the output is not kept
+        then (optional)
+    :return: subprocess.CompletedProcess, stdout is the console output (None if on_line is given)
+    """
+    if process_limit is not None:
+        await process_limit.acquire()
+
+    try:
+        return await _run_process_async(command, metrics, stage, on_line)
+    finally:
+        if process_limit is not None:
+            process_limit.release()
+
+
+async def _run_process_async(command: list, metrics, stage: str, on_line):
+    """
+    Runs a process to completion (see run_process_async)
+    :return: subprocess.CompletedProcess
+    """
+    start_time = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *[str(part) for part in command],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+
+    output = []
+
+    def handle_line(line: bytes):
+        """
+        Nested function that passes on or keeps a line of the console output
+        :param line: The line (without line break)
+        :return: None
+        """
+        line = line.decode(errors="replace") + "\n"
+
+        if on_line is not None:
+            on_line(line)
+        else:
+            output.append(line)
+
+    try:
+        buffer = b""
+
+        while True:
+            chunk = await process.stdout.read(65536)
+
+            if len(chunk) == 0:
+                break
+
+            # ffmpeg ends its status lines with a carriage return, like universal_newlines they count as line breaks
+            *lines, buffer = re.split(b"\r\n|\r|\n", buffer + chunk)
+
+            for line in lines:
+                handle_line(line)
+
+        if len(buffer) > 0:
+            handle_line(buffer)
+
+        await process.wait()
+    except BaseException:
+        _kill(process)
+        # The kill is not cancelled again, the process is reaped before the exception propagates
+        await asyncio.shield(process.wait())
+        raise
+
+    if metrics is not None:
+        metrics.record_process(stage, command, wall_time=time.perf_counter() - start_time,
+                               returncode=process.returncode)
+
+    return subprocess.CompletedProcess(command, process.returncode, None if on_line is not None else "".join(output))
+
+
+def _kill(process):
+    """
+    Kills a process that may already have exited
+    :param process: asyncio.subprocess.Process
+    :return: None
+    """
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,75 @@
+import math
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+
+def usable_cpu_count():
+    """
+    Returns the number of CPUs this process can actually use: the CPUs in its affinity mask, limited by the CPU quota
+    of its cgroup (v2 cpu.max or v1 cpu.cfs_quota_us/cpu.cfs_period_us), e.g. inside a container
+    :return: Number of CPUs (at least 1)
+    """
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpu_count = min(cpu_count, max(1, math.ceil(quota)))
+
+    return max(1, cpu_count)
+
+
+def _cgroup_cpu_quota():
+    """
+    Reads the CPU quota of the cgroup of this process
+    :return: Quota in CPUs (float) or None if there is no quota
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as file:
+            quota, period = file.read().split()[:2]
+
+        if quota != "max":
+            return int(quota) / int(period)
+
+        return None
+    except (OSError, ValueError):
+        pass
+
+    for cgroup_dir in [Path("/sys/fs/cgroup/cpu"), Path("/sys/fs/cgroup/cpu,cpuacct")]:
+        try:
+            quota = int((cgroup_dir / "cpu.cfs_quota_us").read_text())
+            period = int((cgroup_dir / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+
+        if quota > 0 and period > 0:
+            return quota / period
+
+    return None
+
+
+def thread_budget(audio_only: bool, cpu_count: int = None):
+    """
+    Splits the CPU budget between concurrent ffmpeg processes (render workers) and the threads of every process.
+    Audio encoders are single threaded, so audio only renders use one process per CPU. Video encoders scale with their
+    thread count, but short intervals do not keep many encoder threads busy, so a few threads per process are used
+    :param audio_only: Whether the render is audio only
+    :param cpu_count: Number of usable CPUs (default: usable_cpu_count())
+    :return: SimpleNamespace with workers, ffmpeg_threads and filter_threads
+    """
+    if cpu_count is None:
+        cpu_count = usable_cpu_count()
+
+    if audio_only:
+        return SimpleNamespace(workers=cpu_count, ffmpeg_threads=1, filter_threads=1)
+
+    ffmpeg_threads = 1 if cpu_count <= 2 else min(4, cpu_count // 2)
+
+    return SimpleNamespace(
+        workers=max(1, cpu_count // ffmpeg_threads),
+        ffmpeg_threads=ffmpeg_threads,
+        filter_threads=1
+    )
@@ -0,0 +1,207 @@
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from pathlib import Path
+
+from unsilence.lib.cache.FileCache import default_cache_dir
+
+# Bumped whenever the probe records something new, older cache entries are probed again
+PROBE_VERSION = 1
+
+# The libavutil version of the ffmpeg release 4.2.4 "Ada"
+MINIMUM_LIBAVUTIL = (56, 31, 100)
+
+# Filters unsilence can not work without
+REQUIRED_FILTERS = ["atempo", "silencedetect", "setpts", "volume", "concat"]
+
+# Range of a single atempo filter before ffmpeg 4.2 (newer builds report their range)
+DEFAULT_ATEMPO_RANGE = (0.5, 2.0)
+
+MAXIMUM_CACHED_BINARIES = 8
+
+
+def _run(ffmpeg: str, *args):
+    """
+    Runs ffmpeg with arguments and returns its console output
+    :param ffmpeg: Path of the ffmpeg binary
+    :param args: The arguments
+    :return: Console output (stdout and stderr)
+    """
+    return subprocess.run(
+        [ffmpeg, "-hide_banner", *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        errors="replace"
+    ).stdout
+
+
+def _listed_names(console_output: str, flags_pattern: str):
+    """
+    Parses the names of a ffmpeg listing (-filters, -encoders): every entry line starts with its flags and its name
+    :param console_output: The console output of the listing
+    :param flags_pattern: Regex of the flags column
+    :return: Sorted list of names
+    """
+    return sorted(set(re.findall(rf"^\s*{flags_pattern}\s+(\S+)\s", console_output, re.MULTILINE)))
+
+
+def probe_capabilities(ffmpeg: str):
+    """
+    Runs ffmpeg to find out its version, filters and encoders and the speed range of a single atempo filter
+    :param ffmpeg: Path of the ffmpeg binary
+    :return: Capability dict (see ffmpeg_capabilities)
+    """
+    version_output = _run(ffmpeg, "-version")
+
+    version_match = re.search(r"ffmpeg version (\S+)", version_output)
+    libavutil_match = re.search(r"libavutil\s*((?:\d+\.\s*){2}\d+)", version_output)
+
+    libavutil = None
+    if libavutil_match:
+        libavutil = [int(part) for part in "".join(libavutil_match.group(1).split()).split(".")]
+
+    atempo_range = DEFAULT_ATEMPO_RANGE
+    atempo_match = re.search(r"tempo\s.*\(from ([\d.]+) to ([\d.]+)\)", _run(ffmpeg, "-h", "filter=atempo"))
+    if atempo_match:
+        atempo_range = (float(atempo_match.group(1)), float(atempo_match.group(2)))
+
+    return {
+        "probe_version": PROBE_VERSION,
+        "version": version_match.group(1) if version_match else None,
+        "libavutil": libavutil,
+        "filters": _listed_names(_run(ffmpeg, "-filters"), r"[TSC.]{3}"),
+        "encoders": _listed_names(_run(ffmpeg, "-encoders"), r"[VAS][F.][S.][X.][B.][D.]"),
+        "atempo_range": list(atempo_range)
+    }
+
+
+def _cache_key(ffmpeg: str):
+    """
+    Generates the cache key of a ffmpeg binary, it changes when the binary is replaced
+    :param ffmpeg: Path of the ffmpeg binary
+    :return: Cache key
+    """
+    path = os.path.realpath(ffmpeg)
+    stat = os.stat(path)
+
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _load_cache(cache_file: Path):
+    """
+    Loads the capability cache file
+    :param cache_file: The cache file
+    :return: Dict of cache key to capability dict
+    """
+    try:
+        with open(cache_file, "r") as file:
+            entries = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return entries if isinstance(entries, dict) else {}
+
+
+def _save_cache(cache_file: Path, entries: dict):
+    """
+    Replaces the capability cache file (atomically, concurrent processes never read a partial file), errors are ignored
+    because the cache is only an optimization
+    :param cache_file: The cache file
+    :param entries: Dict of cache key to capability dict
+    :return: None
+    """
+    partial_file = cache_file.with_name(f".{cache_file.name}.{uuid.uuid4().hex[:8]}.partial")
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(partial_file, "w+") as file:
+            json.dump(entries, file)
+
+        os.replace(partial_file, cache_file)
+    except OSError:
+        try:
+            partial_file.unlink()
+        except OSError:
+            pass
+
+
+# The installed ffmpeg does not change while the process runs, all instances share the first result
+@functools.lru_cache(maxsize=None)
+def ffmpeg_capabilities(cache_file: Path = None):
+    """
+    Returns the capabilities of the ffmpeg on the PATH. They are probed once per binary and cached on disk, keyed by
+    the path, modification time and size of the binary, so later processes do not start ffmpeg at all
+    :param cache_file: The cache file (default: <user cache dir>/unsilence/ffmpeg_capabilities.json)
+    :return: Capability dict with version, libavutil (list of ints or None), filters, encoders and atempo_range, or
+        None if ffmpeg was not found
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+
+    if cache_file is None:
+        cache_file = default_cache_dir() / "ffmpeg_capabilities.json"
+
+    key = _cache_key(ffmpeg)
+    entries = _load_cache(cache_file)
+    capabilities = entries.get(key, None)
+
+    if capabilities is None or capabilities.get("probe_version", None) != PROBE_VERSION:
+        capabilities = probe_capabilities(ffmpeg)
+
+        entries.pop(key, None)
+        entries[key] = capabilities
+        _save_cache(cache_file, dict(list(entries.items())[-MAXIMUM_CACHED_BINARIES:]))
+
+    return capabilities
+
+
+def has_filter(name: str):
+    """
+    Returns whether the ffmpeg on the PATH has a filter
+    :param name: Name of the filter
+    :return: bool (False if ffmpeg was not found)
+    """
+    capabilities = ffmpeg_capabilities()
+    return capabilities is not None and name in capabilities["filters"]
+
+
+def has_encoder(name: str):
+    """
+    Returns whether the ffmpeg on the PATH has an encoder
+    :param name: Name of the encoder
+    :return: bool (False if ffmpeg was not found)
+    """
+    capabilities = ffmpeg_capabilities()
+    return capabilities is not None and name in capabilities["encoders"]
+
+
+def atempo_filter(speed: float):
+    """
+    Generates the atempo filter for a speed, speeds outside of the range of a single atempo filter are split into a
+    chain of filters
+    :param speed: The speed (tempo factor)
+    :return: Filter string, e.g. "atempo=4" or "atempo=2,atempo=1.5"
+    """
+    capabilities = ffmpeg_capabilities()
+    minimum, maximum = capabilities["atempo_range"] if capabilities is not None else DEFAULT_ATEMPO_RANGE
+
+    factors = []
+    while speed > maximum:
+        factors.append(maximum)
+        speed /= maximum
+
+    while speed < minimum:
+        factors.append(minimum)
+        speed /= minimum
+
+    factors.append(speed)
+
+    return ",".join(f"atempo={round(factor, 4)}" for factor in factors)
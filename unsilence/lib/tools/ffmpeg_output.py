@@ -0,0 +1,134 @@
+import re
+from collections import deque
+from types import SimpleNamespace
+
+# Global options that make ffmpeg write machine readable progress (key=value lines) to stderr instead of its status line
+PROGRESS_OPTIONS = ["-nostats", "-progress", "pipe:2"]
+
+# How many log lines of a render are kept for error messages, the rest of the console output is discarded while read
+LOG_TAIL_LINES = 32
+
+# Messages of a filtergraph that can not be parsed (ffmpeg < 5 and newer builds), the render options are invalid then
+FILTER_ERRORS = ["Error initializing complex filter", "for option 'filter_complex"]
+
+# Output that may be missing from a complete render: ffmpeg reports the timestamp of the last frame instead of its
+# end and every cut can lose a frame (in seconds), plus a share of the expected duration for timestamp corrections
+CUT_TOLERANCE = 0.2
+DURATION_TOLERANCE = 0.01
+
+PROGRESS_LINE = re.compile(r"^([a-z0-9_]+)=(\S*)$")
+
+
+def parse_duration(line: str):
+    """
+    Parses the media duration from an ffmpeg console line
+    :param line: ffmpeg console line that contains "Duration: HH:MM:SS.ms"
+    :return: The duration in seconds or None if the line does not contain a duration
+    """
+    capture = re.search("Duration: ([0-9:]+.?[0-9]*)", line)
+    if capture is None:
+        return None
+
+    hour, minute, second_millisecond = capture[1].split(":")
+    second, millisecond = second_millisecond.split(".")
+    return float(str(int(second) + 60 * (int(minute) + 60 * int(hour))) + "." + millisecond)
+
+
+def with_progress(command: list):
+    """
+    Adds the PROGRESS_OPTIONS to an ffmpeg command
+    :param command: The ffmpeg command
+    :return: New command list
+    """
+    return [command[0], *PROGRESS_OPTIONS, *command[1:]]
+
+
+def output_collector(log_lines: int = LOG_TAIL_LINES):
+    """
+    Creates a line handler for the console output of an ffmpeg command with the PROGRESS_OPTIONS (see with_progress).
+    Of the -progress lines only the latest values are kept, of the other lines only the last log_lines, so the memory
+    used does not grow with the output
+    :param log_lines: How many log lines are kept
+    :return: Tuple of the line handler (called like func(line)) and the collected output (SimpleNamespace with
+        progress (dict of the latest -progress values), log (deque of the last log lines) and returncode (None, set
+        it when the process exited))
+    """
+    output = SimpleNamespace(progress={}, log=deque(maxlen=log_lines), returncode=None)
+
+    def handle_line(line: str):
+        """
+        Nested function that sorts a line of the console output into the progress values or the log
+        :param line: The line
+        :return: None
+        """
+        line = line.rstrip("\r\n")
+        progress_line = PROGRESS_LINE.match(line)
+
+        if progress_line is not None:
+            output.progress[progress_line[1]] = progress_line[2]
+        elif len(line) > 0:
+            output.log.append(line)
+
+    return handle_line, output
+
+
+def is_filter_error(output: SimpleNamespace):
+    """
+    Checks whether a render failed because its filtergraph could not be parsed
+    :param output: The collected output (see output_collector)
+    :return: bool
+    """
+    return output.returncode != 0 and any(error in line for line in output.log for error in FILTER_ERRORS)
+
+
+def output_seconds(output: SimpleNamespace):
+    """
+    Returns how much output an ffmpeg command wrote, by its last -progress values
+    :param output: The collected output (see output_collector)
+    :return: Timestamp of the last written frame or audio sample (in seconds), None if ffmpeg did not report it
+    """
+    try:
+        return int(output.progress["out_time_us"]) / 1000000
+    except (KeyError, ValueError):
+        return None
+
+
+def is_complete_output(output: SimpleNamespace, expected_duration: float, has_video: bool, cuts: int = 1):
+    """
+    Checks whether an ffmpeg command rendered all of its output, without reading the output again: ffmpeg has to exit
+    successfully after writing all streams (progress=end), video frames have to be written and the timestamp of the
+    last frame or audio sample has to reach the expected duration (see CUT_TOLERANCE and DURATION_TOLERANCE). A
+    corrupted part of the input shortens the output, because the frames that could not be decoded are missing
+    :param output: The collected output (see output_collector)
+    :param expected_duration: The duration the output should have (in seconds)
+    :param has_video: Whether the output has a video stream
+    :param cuts: How many intervals were cut from the input for the output
+    :return: bool
+    """
+    if output.returncode != 0 or output.progress.get("progress", None) != "end":
+        return False
+
+    if has_video and output.progress.get("frame", "0") in ("0", "N/A"):
+        return False
+
+    seconds = output_seconds(output)
+
+    if seconds is None:
+        return False
+
+    return seconds >= expected_duration - CUT_TOLERANCE * cuts - DURATION_TOLERANCE * expected_duration
+
+
+def duration_matches(seconds: float, expected_duration: float, cuts: int = 1):
+    """
+    Checks whether a rendered duration matches the expected one, neither shorter nor longer (e.g. a stream copy that
+    started at an earlier keyframe than its cut point), with the tolerance of is_complete_output
+    :param seconds: The rendered duration (in seconds), None if it is unknown
+    :param expected_duration: The duration the output should have (in seconds)
+    :param cuts: How many intervals were cut from the input for the output
+    :return: bool
+    """
+    if seconds is None:
+        return False
+
+    return abs(seconds - expected_duration) <= CUT_TOLERANCE * cuts + DURATION_TOLERANCE * expected_duration
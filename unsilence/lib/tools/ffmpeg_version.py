@@ -1,32 +1,23 @@
-import re
-import subprocess
-from pkg_resources import parse_version
+from unsilence.lib.tools.ffmpeg_capabilities import MINIMUM_LIBAVUTIL, REQUIRED_FILTERS, ffmpeg_capabilities
 
 
 def is_ffmpeg_usable():
-    try:
-        console_output = subprocess.run(
-            ["ffmpeg", "-version"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        ).stdout
-    except FileNotFoundError:
-        return "not_detected"
-
-    console_output = str(console_output)
+    """
+    Checks the ffmpeg on the PATH (see lib.tools.ffmpeg_capabilities, the probe runs once and is cached)
+    :return: "usable", "not_detected", "requirements_unsatisfied" or "unknown_version"
+    """
+    capabilities = ffmpeg_capabilities()
 
-    regex = r"libavutil\s*((?:\d+\.\s*){2}\d+)"
-    match = re.search(regex, str(console_output))
+    if capabilities is None:
+        return "not_detected"
 
-    if match:
-        groups = match.groups()
-        version_string = "".join(groups[0].split())
+    if capabilities["libavutil"] is None:
+        return "unknown_version"
 
-        # Version 56.31.100 is the libavutil version used in the ffmpeg release 4.2.4 "Ada"
-        if parse_version(version_string) >= parse_version("56.31.100"):
-            return "usable"
+    if tuple(capabilities["libavutil"]) < MINIMUM_LIBAVUTIL:
+        return "requirements_unsatisfied"
 
-        else:
-            return "requirements_unsatisfied"
+    if any(name not in capabilities["filters"] for name in REQUIRED_FILTERS):
+        return "requirements_unsatisfied"
 
-    return "unknown_version"
+    return "usable"
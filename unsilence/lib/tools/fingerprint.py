@@ -0,0 +1,28 @@
+import hashlib
+import os
+from pathlib import Path
+
+
+def file_fingerprint(file: Path, sample_count: int = 16, sample_size: int = 64 * 1024):
+    """
+    Generates a cheap content fingerprint of a file, without reading the whole file. The fingerprint is built from the
+    size, the modification time and hashes of blocks sampled evenly across the file
+    :param file: The file that should be fingerprinted
+    :param sample_count: How many blocks should be sampled
+    :param sample_size: The size of a sampled block (in bytes)
+    :return: Fingerprint (hex string)
+    """
+    stat = os.stat(file)
+    file_hash = hashlib.sha1()
+    file_hash.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    with open(file, "rb") as f:
+        if stat.st_size <= sample_count * sample_size:
+            file_hash.update(f.read())
+        else:
+            step = (stat.st_size - sample_size) / (sample_count - 1)
+            for i in range(sample_count):
+                f.seek(int(i * step))
+                file_hash.update(f.read(sample_size))
+
+    return file_hash.hexdigest()
@@ -0,0 +1,171 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+
+def run_process(command: list, metrics=None, stage: str = None, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                universal_newlines=False, input: bytes = None, on_error_line=None):
+    """
+    Runs a process to completion like subprocess.run and records its resource usage
+    :param command: The command that should be run
+    :param metrics: lib.metrics.Metrics.Metrics the process is recorded to (optional)
+    :param stage: Name of the stage the process belongs to
+    :param stdout: subprocess.PIPE to capture stdout, subprocess.DEVNULL otherwise
+    :param stderr: subprocess.STDOUT to capture stderr together with stdout, subprocess.PIPE to capture it separately,
+        subprocess.DEVNULL otherwise
+    :param universal_newlines: Whether the captured output should be decoded to a string
+    :param input: Data that is written to the stdin of the process (optional)
+    :param on_error_line: Function that is called with every decoded line of stderr while the process runs, stderr is
+        not kept then (optional, requires stderr=subprocess.PIPE)
+    :return: subprocess.CompletedProcess
+    """
+    with process_slot(metrics):
+        return _run_process(command, metrics, stage, stdout, stderr, universal_newlines, input, on_error_line)
+
+
+def process_slot(metrics=None):
+    """
+    Returns a context manager that holds a process slot while a process runs, if the job the metrics belong to shares
+    a limit of concurrent processes (see lib.batch.ProcessSlots.ProcessSlots)
+    :param metrics: lib.metrics.Metrics.Metrics or None
+    :return: Context manager
+    """
+    if metrics is None or metrics.process_slots is None:
+        return nullcontext()
+
+    return metrics.process_slots.slot(metrics.priority)
+
+
+def _run_process(command: list, metrics, stage: str, stdout, stderr, universal_newlines: bool, input: bytes,
+                 on_error_line):
+    """
+    Runs a process to completion (see run_process)
+    :return: subprocess.CompletedProcess
+    """
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if input is not None else None, stdout=stdout,
+                               stderr=stderr, universal_newlines=universal_newlines)
+
+    helper_threads = []
+    error_output = []
+
+    if input is not None:
+        helper_threads.append(threading.Thread(target=_write_input, args=(process.stdin, input), daemon=True))
+
+    if process.stderr is not None and on_error_line is not None:
+        helper_threads.append(threading.Thread(target=_read_lines, args=(process.stderr, on_error_line), daemon=True))
+    elif process.stderr is not None:
+        helper_threads.append(threading.Thread(target=_read_output, args=(process.stderr, error_output), daemon=True))
+
+    for thread in helper_threads:
+        thread.start()
+
+    output = None
+    if process.stdout is not None:
+        with process.stdout:
+            output = process.stdout.read()
+
+    for thread in helper_threads:
+        thread.join()
+
+    wait_process(process, start_time, metrics, stage)
+
+    return subprocess.CompletedProcess(command, process.returncode, output,
+                                       error_output[0] if len(error_output) > 0 else None)
+
+
+def wait_process(process: subprocess.Popen, start_time: float, metrics=None, stage: str = None):
+    """
+    Waits for a process and records its wall time, CPU time and peak memory usage (the CPU time and memory usage are
+    only available on systems with os.wait4). Read the output of the process before calling this
+    :param process: The started process
+    :param start_time: time.perf_counter() when the process was started
+    :param metrics: lib.metrics.Metrics.Metrics the process is recorded to (optional)
+    :param stage: Name of the stage the process belongs to
+    :return: Return code of the process
+    """
+    rusage = None
+
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = _exit_code(status)
+    except (AttributeError, ChildProcessError):
+        # No wait4 on this platform, or the process was already reaped
+        process.wait()
+
+    if metrics is not None:
+        metrics.record_process(
+            stage,
+            process.args,
+            wall_time=time.perf_counter() - start_time,
+            user_time=rusage.ru_utime if rusage is not None else None,
+            system_time=rusage.ru_stime if rusage is not None else None,
+            max_rss=_max_rss_bytes(rusage.ru_maxrss) if rusage is not None else None,
+            returncode=process.returncode
+        )
+
+    return process.returncode
+
+
+def _write_input(stream, data):
+    """
+    Writes data to the stdin of a process and closes it (a process that exits early is not an error here)
+    :param stream: stdin of the process
+    :param data: The data
+    :return: None
+    """
+    try:
+        with stream:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+
+
+def _read_output(stream, output: list):
+    """
+    Reads an output stream of a process until it is closed
+    :param stream: stdout or stderr of the process
+    :param output: List the read output is appended to
+    :return: None
+    """
+    with stream:
+        output.append(stream.read())
+
+
+def _read_lines(stream, on_line):
+    """
+    Reads an output stream of a process line by line until it is closed, only the current line is kept in memory
+    :param stream: stderr of the process
+    :param on_line: Function that is called with every decoded line (without line break)
+    :return: None
+    """
+    with stream:
+        for line in stream:
+            if isinstance(line, bytes):
+                line = line.decode(errors="replace")
+
+            on_line(line.rstrip("\r\n"))
+
+
+def _exit_code(status: int):
+    """
+    Converts a wait status to a return code like subprocess uses it (negative signal number if it was killed)
+    :param status: Wait status
+    :return: Return code
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+def _max_rss_bytes(max_rss: int):
+    """
+    Converts ru_maxrss to bytes (it is reported in kilobytes on Linux, in bytes on macOS)
+    :param max_rss: ru_maxrss
+    :return: Peak resident set size in bytes
+    """
+    return max_rss if sys.platform == "darwin" else max_rss * 1024